@@ -1,37 +1,69 @@
-from sys import exception
-from flask import Flask,request,jsonify
+from flask import Blueprint,Flask,request,jsonify,Response
 from flask_cors import CORS
-import bcrypt
+from werkzeug.middleware.proxy_fix import ProxyFix
 import psycopg2
-from datetime import datetime,timedelta
-from dotenv import load_dotenv
+import psycopg2.errors
+from itertools import chain
+import hmac
+import io
 import os
-from psycopg2.extras import RealDictCursor
-import jwt
-from helper.generate_token import generate_refresh_token,decode_token,generate_access_token
-import requests
+import time
+from datetime import date
+from helper.query_profiler import ProfilingDictCursor,query_report
+from helper.statements import execute
+from helper.accounts import DUPLICATE_MESSAGES
+from helper.generate_token import generate_refresh_token,decode_token,generate_access_token,token_cache_stats,get_token_cache,load_keys
+from helper.db_pool import db_connection,pool_stats
+from helper.user_cache import get_user_cache
+from helper.guest_bookings import fetch_guest_bookings,get_guest_bookings_cache
+from helper.dashboard_stats import start_reconciler,read_stats,record_status_change,record_status_changes
+from helper.bookings_query import BOOKING_STATUSES,parse_booking_filters,parse_page_size,decode_cursor,fetch_bookings_page
+from helper.bookings_export import EXPORT_FORMATS,export_fetch_size,stream_bookings
+from helper.booking_status import MAX_BATCH_SIZE,validate_status_updates,apply_status_updates,apply_status_to_filter
+from helper.booking_import import read_csv_rows,read_ndjson_rows,import_bookings
+from helper.availability import UnknownRoomType,get_availability,current_availability,parse_stay
+from helper.room_allocation import NoRoomAvailable,allocate_and_insert
+from helper.hashing import HashingBusy,hash_password,check_password,hashing_stats
+from helper.json_encoder import FastJSONProvider
+from helper.data_version import get_data_version
+from helper.rate_limit import get_login_throttle,login_throttle_stats
+from helper.token_refresh import get_refresh_coalescer,refresh_stats
+from helper.events import Subscription,booking_created_data,status_changed_data,get_broker,publish_event,stream,events_stats
+from helper.metrics import init_metrics,metrics_text
 
-load_dotenv()
+api = Blueprint('api', __name__)
 
-app = Flask(__name__)
-CORS(app, supports_credentials=True)
-app.secret_key = os.getenv("FLASK_SECRET_KEY","THE_SECRET_KEY")
 
+def create_app(config=None):
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+    CORS(app, supports_credentials=True)
+    # behind nginx/a load balancer remote_addr is the proxy; the login throttle needs the client
+    proxies = int(os.getenv("TRUSTED_PROXIES", 0))
+    if proxies:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies)
+    app.secret_key = os.getenv("FLASK_SECRET_KEY","THE_SECRET_KEY")
+    if config:
+        app.config.update(config)
+    init_metrics(app)
+    app.register_blueprint(api)
+    return app
+
+
+def warm_up(app):
+    # everything here is safe to share across fork: no sockets, threads or child processes
+    load_keys()
+    get_token_cache()
+    get_user_cache()
+    app.url_map.update()
+    with app.test_client() as client:
+        # /health would open a database connection in the master
+        client.get('/health/live', environ_base={'hotel.warm_up': True})
 
 
-def database_connection():
-    try:
-        return psycopg2.connect(
-            host = os.getenv('DB_HOST','localhost'),
-            user = os.getenv('DB_USER'),
-            password = os.getenv('DB_PASSWORD'),
-            database = os.getenv('DB_NAME')
-        )
-    except psycopg2.Error as e:
-        print(f"Database connection failed: {e}")
-        raise
-    
-    
 
 def get_cookie_settings():
     is_local = ("localhost" in request.host) or ("127.0.0.1" in request.host)
@@ -40,7 +72,7 @@ def get_cookie_settings():
     domain_cookie = None  
     return secure_cookie, samesite_cookie, domain_cookie    
     
-@app.route('/signup',methods=['POST'])
+@api.route('/signup',methods=['POST'])
 def signup():
     if not request.is_json:
         return jsonify({"message":"Request must be jsonify","status":"error","user":None}),400
@@ -61,22 +93,17 @@ def signup():
         return jsonify({"message":"Length of Password must be more than 6"}),400
     try:
         
-        hashpassword = bcrypt.hashpw(password.encode('utf-8'),bcrypt.gensalt()).decode('utf-8')
-        db = database_connection()
-        cursor = db.cursor(cursor_factory=RealDictCursor)
-        
-        cursor.execute("select email from loginusers where email = %s",(email,))
-        if cursor.fetchone():
-            return jsonify({"message":"Email already exists","status":"error","user":None}),409
-        
-        cursor.execute("select username from loginusers where username = %s",(username,))
-        if cursor.fetchone():
-            return jsonify({"message":"Username already exists","status":"error","user":None}),409
-        
-        cursor.execute("insert into loginusers(firstname,lastname,email,username,passwords) values (%s,%s,%s,%s,%s)",
-        (firstname,lastname,email,username,hashpassword)
-        )
-        db.commit()
+        hashpassword = hash_password(password)
+        # one round trip: the unique indexes on email and username catch a taken account
+        with db_connection(autocommit=True) as db, db.cursor(cursor_factory=ProfilingDictCursor) as cursor:
+            try:
+                execute(cursor,'create_user',(firstname,lastname,email,username,hashpassword))
+            except psycopg2.errors.UniqueViolation as e:
+                message = DUPLICATE_MESSAGES.get(e.diag.constraint_name)
+                if message is None:
+                    raise
+                return jsonify({"message":message,"status":"error","user":None}),409
+        get_user_cache().invalidate(email)
         
         access_token = generate_access_token(email,role='guest')
         refresh_token = generate_refresh_token(email,role='guest')
@@ -109,14 +136,11 @@ def signup():
         return response,200
     except psycopg2.Error as e:
         return jsonify({"message":"Database error","error":str(e),"status":"error","user":None}),500
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
-        if 'db' in locals():
-            db.close()
+    except HashingBusy:
+        return jsonify({"message":"Server busy, please try again","status":"error"}),503,{"Retry-After":"1"}
             
             
-@app.route('/login', methods=['POST'])
+@api.route('/login', methods=['POST'])
 def login():
     data = request.get_json()
     username = data.get('username')
@@ -125,19 +149,24 @@ def login():
     if not all ([username,password]):
         return jsonify({"message":"Both username and password required"}),400
     
+    # before any DB or bcrypt work, so credential stuffing can't eat the hashing workers
+    retry_after = get_login_throttle().check(request.remote_addr,username)
+    if retry_after:
+        return jsonify({"message":"Too many login attempts, try again later","status":"error"}),429,{"Retry-After":str(retry_after)}
+    
     try:
-        db = database_connection()
-        cursor = db.cursor(cursor_factory=RealDictCursor) 
-        cursor.execute("select passwords,role,email,username,firstname,lastname from loginusers where username = %s",(username,))           
-        user = cursor.fetchone()
+        with db_connection(autocommit=True) as db, db.cursor(cursor_factory=ProfilingDictCursor) as cursor:
+            execute(cursor,'user_by_username',(username,))
+            user = cursor.fetchone()
         
         if not user:
+            get_login_throttle().failed(username)
             return jsonify({"message":"User Account not found"}),404
         
-        passwords = user['passwords'].encode('utf-8')
-        
-        if not bcrypt.checkpw(password.encode('utf-8'),passwords):
+        if not check_password(password,user['passwords']):
+            get_login_throttle().failed(username)
             return jsonify({"message":"Incorrect passwords"}),404
+        get_login_throttle().succeeded(username)
         
         role = user.get('role','guest')
         email = user['email']
@@ -145,6 +174,7 @@ def login():
         if role != 'guest':
             return jsonify({"message":"Login unsuccessfull,only for guest"}),403
         
+        get_user_cache().set(user['email'],user)
         access_token = generate_access_token(email,role)
         refresh_token = generate_refresh_token(email,role)
         secure_cookie,samesite_cookie,domain_cookie = get_cookie_settings()
@@ -181,15 +211,12 @@ def login():
         return response,200
     except psycopg2.Error as e:
         return jsonify({"message":"Something Happened,Connection Error","error":str(e)}),500
+    except HashingBusy:
+        return jsonify({"message":"Server busy, please try again","status":"error"}),503,{"Retry-After":"1"}
     
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
-        if 'db' in locals():
-            db.close()
 
 
-@app.route('/adminlogin', methods=['POST'])
+@api.route('/adminlogin', methods=['POST'])
 def adminlogin():
     data = request.get_json()
     email = data.get('email')
@@ -198,19 +225,23 @@ def adminlogin():
     if not all([email,password]):
         return jsonify({"message":"Email and Password required"}),400
     
+    retry_after = get_login_throttle().check(request.remote_addr,email)
+    if retry_after:
+        return jsonify({"message":"Too many login attempts, try again later","status":"error"}),429,{"Retry-After":str(retry_after)}
+    
     try:
-        db = database_connection()
-        cursor = db.cursor(cursor_factory=RealDictCursor)
-        cursor.execute("select passwords,email,role,username,firstname,lastname from loginusers where email = %s",(email,))
-        user = cursor.fetchone()
+        with db_connection(autocommit=True) as db, db.cursor(cursor_factory=ProfilingDictCursor) as cursor:
+            execute(cursor,'user_by_email',(email,))
+            user = cursor.fetchone()
         
         if not user:
+            get_login_throttle().failed(email)
             return jsonify({"message":"Account not found"}),404
         
-        passwords = user['passwords'].encode('utf-8')
-        
-        if not bcrypt.checkpw(password.encode('utf-8'),passwords):
+        if not check_password(password,user['passwords']):
+            get_login_throttle().failed(email)
             return jsonify({"message":"Incorrect Password"}),404
+        get_login_throttle().succeeded(email)
         
         role = user.get('role','admin')
         email = user['email']
@@ -218,6 +249,7 @@ def adminlogin():
         if role != 'admin':
             return jsonify({"message":"Login unsuccessfull,Unauthoised Account"}),403
         
+        get_user_cache().set(user['email'],user)
         access_token = generate_access_token(email,role)
         refresh_token = generate_refresh_token(email,role)
         secure_cookie,samesite_cookie,domain_cookie = get_cookie_settings()        
@@ -255,14 +287,11 @@ def adminlogin():
         return response,200
     except psycopg2.Error as e:
         return jsonify({"message":"Something Happened,Connection Error","error":str(e)}),500
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
-        if 'db' in locals():
-            db.close()
+    except HashingBusy:
+        return jsonify({"message":"Server busy, please try again","status":"error"}),503,{"Retry-After":"1"}
             
             
-@app.route('/superadmin', methods=['POST'])
+@api.route('/superadmin', methods=['POST'])
 def superadmin():
     data = request.get_json()
     email = data.get('email')
@@ -271,19 +300,23 @@ def superadmin():
     if not all ([email,password]):
         return jsonify({"message":"Email and Password required"}),400
     
+    retry_after = get_login_throttle().check(request.remote_addr,email)
+    if retry_after:
+        return jsonify({"message":"Too many login attempts, try again later","status":"error"}),429,{"Retry-After":str(retry_after)}
+    
     try:
-        db = database_connection()
-        cursor = db.cursor(cursor_factory=RealDictCursor)
-        cursor.execute("select passwords,username,role,email,firstname,lastname from loginusers where email = %s",(email,))
-        user = cursor.fetchone()
+        with db_connection(autocommit=True) as db, db.cursor(cursor_factory=ProfilingDictCursor) as cursor:
+            execute(cursor,'user_by_email',(email,))
+            user = cursor.fetchone()
         
         if not user:
+            get_login_throttle().failed(email)
             return jsonify({"message":"Account not Found"}),404
         
-        passwords = user['passwords'].encode('utf-8') if isinstance(user['passwords'],str) else user['passwords']
-        
-        if not bcrypt.checkpw(password.encode('utf-8'),passwords):
+        if not check_password(password,user['passwords']):
+            get_login_throttle().failed(email)
             return jsonify({"message":"Incorrect Password"}),404
+        get_login_throttle().succeeded(email)
         
         role = user.get('role','superadmin')
         
@@ -291,6 +324,7 @@ def superadmin():
             return jsonify({"message":"Unauthorised Access"}),403
         
         
+        get_user_cache().set(user['email'],user)
         access_token = generate_access_token(email,role)
         refresh_token = generate_refresh_token(email,role)
         secure_cookie,samesite_cookie,domain_cookie = get_cookie_settings()
@@ -328,14 +362,11 @@ def superadmin():
         return response,200             
     except psycopg2.Error as e:
         return jsonify({"message":"Something Happened,Connection Error","error":str(e)}),500
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
-        if 'db' in locals():
-            db.close()
+    except HashingBusy:
+        return jsonify({"message":"Server busy, please try again","status":"error"}),503,{"Retry-After":"1"}
             
          
-@app.route('/stafflogin', methods=['POST'])
+@api.route('/stafflogin', methods=['POST'])
 def stafflogin():
     data = request.get_json()
     email = data.get('email') 
@@ -344,19 +375,23 @@ def stafflogin():
     if not all ([email,password]) :
         return jsonify({"message":"Email and Password required"}),400
     
+    retry_after = get_login_throttle().check(request.remote_addr,email)
+    if retry_after:
+        return jsonify({"message":"Too many login attempts, try again later","status":"error"}),429,{"Retry-After":str(retry_after)}
+    
     try:
-        db = database_connection()
-        cursor = db.cursor(cursor_factory=RealDictCursor)
-        cursor.execute("select email,passwords,username,role,firstname,lastname from loginusers where email = %s",(email,))
-        user = cursor.fetchone()
+        with db_connection(autocommit=True) as db, db.cursor(cursor_factory=ProfilingDictCursor) as cursor:
+            execute(cursor,'user_by_email',(email,))
+            user = cursor.fetchone()
         
         if not user:
+            get_login_throttle().failed(email)
             return jsonify({"message":"Account not Found"}),404
         
-        passwords = user['passwords'].encode('utf-8')
-        
-        if not bcrypt.checkpw(password.encode('utf-8'),passwords):
+        if not check_password(password,user['passwords']):
+            get_login_throttle().failed(email)
             return jsonify({"message":"Incorrect Password"}),404
+        get_login_throttle().succeeded(email)
         
         role = user.get('role','staff')
         email = user['email']
@@ -364,6 +399,7 @@ def stafflogin():
         if role != 'staff':
             return jsonify({"message":"Unauthorised"}),403
         
+        get_user_cache().set(user['email'],user)
         access_token = generate_access_token(email,role)
         refresh_token = generate_refresh_token(email,role)
         secure_cookie,samesite_cookie,domain_cookie = get_cookie_settings()        
@@ -401,14 +437,11 @@ def stafflogin():
         return response,200    
     except psycopg2.Error as e:
         return jsonify({"message":"Something Happened,Connection Error","error":str(e)}),500
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
-        if 'db' in locals():
-            db.close()
+    except HashingBusy:
+        return jsonify({"message":"Server busy, please try again","status":"error"}),503,{"Retry-After":"1"}
             
 
-@app.route('/me', methods=['GET'])
+@api.route('/me', methods=['GET'])
 def get_current_user():
     access_token = request.cookies.get('access_token')
     
@@ -425,10 +458,13 @@ def get_current_user():
         
         
         try:
-            db = database_connection()
-            cursor = db.cursor(cursor_factory=RealDictCursor)
-            cursor.execute("SELECT firstname, lastname, username, email, role FROM loginusers WHERE email = %s", (email,))
-            user = cursor.fetchone()
+            user = get_user_cache().get(email)
+            if user is None:
+                with db_connection(autocommit=True) as db, db.cursor(cursor_factory=ProfilingDictCursor) as cursor:
+                    execute(cursor,'profile_by_email',(email,))
+                    user = cursor.fetchone()
+                if user:
+                    get_user_cache().set(email, user)
             
             if not user:
                 return jsonify({"message": "User not found", "user": None}), 404
@@ -458,14 +494,41 @@ def get_current_user():
         
     except Exception as e:
         return jsonify({"message": "Token validation failed", "error": str(e), "user": None}), 401
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
-        if 'db' in locals():
-            db.close()
 
 
-@app.route('/refresh', methods=['POST'])
+@api.route('/me/bookings', methods=['GET'])
+def get_my_bookings():
+    access_token = request.cookies.get('access_token')
+    if not access_token:
+        return jsonify({"message": "No access token provided"}), 401
+
+    decoded = decode_token(access_token)
+    if not decoded or not decoded.get('email'):
+        return jsonify({"message": "Invalid or expired token"}), 401
+
+    try:
+        limit = parse_page_size(request.args.get('limit'))
+        after = decode_cursor(request.args['after'], date.fromisoformat) if request.args.get('after') else None
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    # repeat dashboard views come from the cache; booking and status writes drop the guest's entry
+    email = decoded['email']
+    page = f"{limit}:{request.args.get('after') or ''}"
+    cache = get_guest_bookings_cache()
+    body = cache.get(email, page)
+    if body is None:
+        try:
+            with db_connection(autocommit=True) as db, db.cursor(cursor_factory=ProfilingDictCursor) as cursor:
+                body = fetch_guest_bookings(cursor, email, limit, after=after)
+        except Exception as e:
+            print(f"Error fetching guest bookings: {str(e)}")
+            return jsonify({"message": "Failed to fetch bookings"}), 500
+        cache.set(email, page, body)
+    return Response(body, mimetype='application/json'), 200
+
+
+@api.route('/refresh', methods=['POST'])
 def refresh_token():
     refresh_token = request.cookies.get('refresh_token')
     
@@ -477,11 +540,9 @@ def refresh_token():
         if not payload:
             return jsonify({"message": "Invalid refresh token"}), 401
         
-        email = payload.get('email')
-        role = payload.get('role', 'guest')
-        
-        
-        new_access_token = generate_access_token(email, role)
+        # concurrent refreshes with this token share one access token, and the same cookie expiry
+        minted = get_refresh_coalescer().access_token(refresh_token, payload)
+        new_access_token = minted['access_token']
         secure_cookie, samesite_cookie, domain_cookie = get_cookie_settings()
         
         response = jsonify({"message": "Token refreshed", "access_token": new_access_token})
@@ -492,7 +553,8 @@ def refresh_token():
             secure=secure_cookie,
             samesite=samesite_cookie,
             domain=domain_cookie,
-            max_age=15*60,
+            max_age=max(0, minted['expires_at'] - int(time.time())),
+            expires=minted['expires_at'],
             path='/'
         )
         
@@ -502,12 +564,36 @@ def refresh_token():
         return jsonify({"message": "Token refresh failed", "error": str(e)}), 401
 
 
-@app.route('/health', methods=['GET'])
-def health_check():
+@api.route('/health/live', methods=['GET'])
+def liveness_check():
     return jsonify({"message": "Server is running", "status": "success"}), 200
 
 
-@app.route('/logout', methods=['POST'])
+@api.route('/health', methods=['GET'])
+def health_check():
+    # readiness: this worker can get a pooled connection and run a query on it
+    started = time.perf_counter()
+    try:
+        with db_connection(autocommit=True) as db, db.cursor() as cursor:
+            cursor.execute("SELECT 1")
+    except Exception as e:
+        print(f"Health check failed: {e}")
+        return jsonify({"status": "unhealthy", "database": "unavailable"}), 503
+    return jsonify({"message": "Server is running", "status": "success",
+                    "database": {"latency_ms": round((time.perf_counter() - started) * 1000, 3),
+                                 "pool": pool_stats()}}), 200
+
+
+@api.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    # Prometheus scrapers don't carry the admin cookie; set METRICS_TOKEN to require a bearer token
+    token = os.getenv("METRICS_TOKEN")
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {token}"):
+        return jsonify({"message": "Unauthorized"}), 401
+    return Response(metrics_text(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@api.route('/logout', methods=['POST'])
 def logout():
     response = jsonify({"message": "Logged out", "status": "success"})
     response.set_cookie('refresh_token', '', expires=0, path='/')
@@ -515,7 +601,7 @@ def logout():
     return response, 200
 
             
-@app.route('/hotel_booking', methods=['POST'])
+@api.route('/hotel_booking', methods=['POST'])
 def hotel_booking():
     access_token = request.cookies.get('access_token')
     if not access_token:
@@ -543,43 +629,73 @@ def hotel_booking():
         return jsonify({"message": "All fields are required"}), 400
 
     try:
-        db = database_connection()
-        cursor = db.cursor(cursor_factory=RealDictCursor)
-        
-        
-        query = """
-            INSERT INTO bookings 
-            (first_name, last_name, email, phone, room_type, people, check_in, duration, status, user_email)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, 'pending', %s)
-            RETURNING id, check_in + (duration || ' days')::interval as check_out
-        """
-        cursor.execute(query, (
-            first_name, last_name, email, phone, room_type, people, 
-            check_in, duration, user_email
-        ))
-        
-        booking = cursor.fetchone()
-        db.commit()
+        stay_start, stay_end = parse_stay(check_in, duration=duration)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    reserved = False
+    try:
+        availability = get_availability()
+        try:
+            reserved = availability.reserve(room_type, stay_start, stay_end)
+        except UnknownRoomType:
+            return jsonify({"message": "Unknown room type"}), 400
+        if not reserved:
+            return jsonify({"message": f"No {room_type} rooms available for those dates"}), 409
+        
+        fields = {
+            "first_name": first_name, "last_name": last_name, "email": email, "phone": phone,
+            "room_type": room_type, "people": people, "user_email": user_email
+        }
+        with db_connection() as db, db.cursor(cursor_factory=ProfilingDictCursor) as cursor:
+            booking = allocate_and_insert(cursor, fields, stay_start, stay_end)
+            db.commit()
+        get_guest_bookings_cache().invalidate(user_email)
+        get_data_version().bump()
+        publish_event('booking.created', booking_created_data(booking, fields, stay_start, stay_end))
         
         return jsonify({
             "message": "Booking created successfully",
             "booking_id": booking['id'],
-            "check_out": booking['check_out'].strftime('%Y-%m-%d')
+            "check_out": booking['check_out'],
+            "room_id": booking['room_id']
         }), 201
         
+    except NoRoomAvailable:
+        # the database disagrees with this worker's index, so rebuild it on the next request
+        availability.release(room_type, stay_start, stay_end)
+        availability.invalidate()
+        return jsonify({"message": f"No {room_type} rooms available for those dates"}), 409
     except Exception as e:
-        db.rollback()
+        if reserved:
+            availability.release(room_type, stay_start, stay_end)
         print(f"Error creating booking: {str(e)}")
         return jsonify({"message": "Failed to create booking"}), 500
         
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
-        if 'db' in locals():
-            db.close()
 
 
-@app.route('/admin/dashboard/stats', methods=['GET'])
+@api.route('/availability', methods=['GET'])
+def search_availability():
+    try:
+        stay_start, stay_end = parse_stay(request.args.get('check_in'),
+                                          check_out=request.args.get('check_out'),
+                                          duration=request.args.get('duration'))
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    
+    try:
+        room_types = get_availability().search(stay_start, stay_end, request.args.get('room_type'))
+        return jsonify({
+            "check_in": stay_start,
+            "check_out": stay_end,
+            "room_types": room_types
+        }), 200
+    except Exception as e:
+        print(f"Error searching availability: {str(e)}")
+        return jsonify({"message": "Failed to search availability"}), 500
+
+
+@api.route('/admin/dashboard/stats', methods=['GET'])
 def get_dashboard_stats():
     # Verify admin access
     access_token = request.cookies.get('access_token')
@@ -590,57 +706,35 @@ def get_dashboard_stats():
     if not decoded or decoded.get('role') != 'admin':
         return jsonify({"message": "Unauthorized access"}), 403
 
+    start_reconciler()
+    # weak: asOf differs between responses that are otherwise the same
+    version = get_data_version()
+    etag, headers = version.validators(request.path, weak=True)
+    if version.is_fresh(request.headers.get('If-None-Match'), etag):
+        return '', 304, headers
+
     try:
-        db = database_connection()
-        cursor = db.cursor(cursor_factory=RealDictCursor)
-        
-        # Get total bookings count
-        cursor.execute("""
-            SELECT COUNT(*) as total_bookings,
-                   SUM(CASE WHEN status = 'confirmed' THEN 1 ELSE 0 END) as confirmed_bookings,
-                   SUM(CASE WHEN status = 'pending' THEN 1 ELSE 0 END) as pending_bookings
-            FROM bookings
-        """)
-        booking_stats = cursor.fetchone()
-        
-        # Get active guests count (bookings that are currently active)
-        cursor.execute("""
-            SELECT COUNT(DISTINCT email) as active_guests
-            FROM bookings
-            WHERE check_in <= CURRENT_DATE 
-            AND (check_in + (duration || ' days')::interval) >= CURRENT_DATE
-            AND status = 'confirmed'
-        """)
-        guest_stats = cursor.fetchone()
-        
-        
-        cursor.execute("""
-            SELECT 
-                (SELECT COUNT(*) FROM rooms WHERE status = 'available') as available_rooms,
-                (SELECT COUNT(*) FROM rooms) as total_rooms
-        """)
-        room_stats = cursor.fetchone()
+        with db_connection(autocommit=True) as db, db.cursor(cursor_factory=ProfilingDictCursor) as cursor:
+            # Counters are kept current by the booking writes, the rest comes from the last reconciliation
+            stats = read_stats(cursor)
         
         return jsonify({
-            "totalBookings": booking_stats['total_bookings'],
-            "confirmedBookings": booking_stats['confirmed_bookings'],
-            "pendingBookings": booking_stats['pending_bookings'],
-            "activeGuests": guest_stats['active_guests'],
-            "availableRooms": room_stats['available_rooms'],
-            "totalRooms": room_stats['total_rooms']
-        })
+            "totalBookings": stats['total_bookings'],
+            "confirmedBookings": stats['confirmed_bookings'],
+            "pendingBookings": stats['pending_bookings'],
+            "activeGuests": stats['active_guests'],
+            "availableRooms": stats['available_rooms'],
+            "totalRooms": stats['total_rooms'],
+            "asOf": stats['as_of'],
+            "reconciledAt": stats['reconciled_at']
+        }), 200, headers
         
     except Exception as e:
         print(f"Error fetching dashboard stats: {str(e)}")
         return jsonify({"message": "Failed to fetch dashboard stats"}), 500
         
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
-        if 'db' in locals():
-            db.close()
 
-@app.route('/admin/bookings', methods=['GET'])
+@api.route('/admin/bookings', methods=['GET'])
 def get_all_bookings():
     
     access_token = request.cookies.get('access_token')
@@ -652,49 +746,71 @@ def get_all_bookings():
         return jsonify({"message": "Unauthorized access"}), 403
         
     try:
-        db = database_connection()
-        cursor = db.cursor(cursor_factory=RealDictCursor)
-        
-        
-        cursor.execute("""
-            SELECT 
-                b.id, 
-                b.first_name || ' ' || b.last_name as guest_name,
-                b.email,
-                b.phone,
-                b.room_type,
-                b.people,
-                b.check_in,
-                b.duration,
-                (b.check_in + (b.duration || ' days')::interval)::date as check_out,
-                b.status,
-                b.created_at
-            FROM bookings b
-            ORDER BY b.created_at DESC
-            LIMIT 10  # Return only the 10 most recent bookings for the dashboard
-        """)
-        
-        bookings = cursor.fetchall()
-        
-        
-        for booking in bookings:
-            booking['check_in'] = booking['check_in'].strftime('%Y-%m-%d')
-            booking['check_out'] = booking['check_out'].strftime('%Y-%m-%d')
-            booking['created_at'] = booking['created_at'].isoformat()
-        
-        return jsonify(bookings)
+        filters = parse_booking_filters(request.args)
+        limit = parse_page_size(request.args.get('limit'))
+        if request.args.get('after') and request.args.get('before'):
+            raise ValueError("Use either after or before, not both")
+        after = decode_cursor(request.args['after']) if request.args.get('after') else None
+        before = decode_cursor(request.args['before']) if request.args.get('before') else None
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    
+    version = get_data_version()
+    etag, headers = version.validators(request.full_path)
+    if version.is_fresh(request.headers.get('If-None-Match'), etag):
+        return '', 304, headers
+        
+    try:
+        with db_connection() as db, db.cursor(cursor_factory=ProfilingDictCursor) as cursor:
+            bookings, next_cursor, prev_cursor = fetch_bookings_page(cursor, filters, limit, after=after, before=before)
+        
+        return jsonify({
+            "bookings": bookings,
+            "next_cursor": next_cursor,
+            "prev_cursor": prev_cursor,
+            "limit": limit
+        }), 200, headers
         
     except Exception as e:
         print(f"Error fetching bookings: {str(e)}")
         return jsonify({"message": "Failed to fetch bookings"}), 500
         
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
-        if 'db' in locals():
-            db.close()
 
-@app.route('/admin/bookings/<int:booking_id>/status', methods=['PUT'])
+@api.route('/admin/bookings/export', methods=['GET'])
+def export_bookings():
+    access_token = request.cookies.get('access_token')
+    if not access_token:
+        return jsonify({"message": "No access token provided"}), 401
+        
+    decoded = decode_token(access_token)
+    if not decoded or decoded.get('role') != 'admin':
+        return jsonify({"message": "Unauthorized access"}), 403
+    
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"message": "format must be csv or ndjson"}), 400
+    compress = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+    try:
+        filters = parse_booking_filters(request.args)
+        fetch_size = export_fetch_size(request.args.get('fetch_size'))
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    
+    chunks = stream_bookings(filters, fmt, fetch_size, compress)
+    try:
+        # pull the first chunk here so connection and query errors still get a proper 500
+        first = next(chunks, b'')
+    except Exception as e:
+        print(f"Error exporting bookings: {str(e)}")
+        return jsonify({"message": "Failed to export bookings"}), 500
+    
+    response = Response(chain([first], chunks), mimetype=EXPORT_FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename=bookings.{fmt}'
+    if compress:
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+@api.route('/admin/bookings/<int:booking_id>/status', methods=['PUT'])
 def update_booking_status(booking_id):
     # Verify admin access
     access_token = request.cookies.get('access_token')
@@ -708,27 +824,28 @@ def update_booking_status(booking_id):
     data = request.get_json()
     new_status = data.get('status')
     
-    if not new_status or new_status not in ['pending', 'confirmed', 'cancelled', 'completed']:
+    if not new_status or new_status not in BOOKING_STATUSES:
         return jsonify({"message": "Invalid status provided"}), 400
         
     try:
-        db = database_connection()
-        cursor = db.cursor(cursor_factory=RealDictCursor)
+        with db_connection() as db, db.cursor(cursor_factory=ProfilingDictCursor) as cursor:
         
         
-        cursor.execute("""
-            UPDATE bookings 
-            SET status = %s 
-            WHERE id = %s
-            RETURNING id, status
-        """, (new_status, booking_id))
+            execute(cursor, 'update_booking_status', (new_status, booking_id))
         
-        updated_booking = cursor.fetchone()
+            updated_booking = cursor.fetchone()
         
-        if not updated_booking:
-            return jsonify({"message": "Booking not found"}), 404
+            if not updated_booking:
+                return jsonify({"message": "Booking not found"}), 404
             
-        db.commit()
+            record_status_change(cursor, updated_booking['id'], updated_booking['old_status'], updated_booking['status'])
+            db.commit()
+        get_guest_bookings_cache().invalidate(updated_booking['user_email'])
+        get_data_version().bump()
+        publish_event('booking.status_changed', status_changed_data(updated_booking))
+        availability = current_availability()
+        if availability:
+            availability.record_status_changes([updated_booking])
         
         return jsonify({
             "message": "Booking status updated successfully",
@@ -736,16 +853,235 @@ def update_booking_status(booking_id):
             "new_status": updated_booking['status']
         })
         
+    except psycopg2.errors.ExclusionViolation:
+        return jsonify({"message": "The booking's room is no longer free for those dates"}), 409
     except Exception as e:
-        db.rollback()
         print(f"Error updating booking status: {str(e)}")
         return jsonify({"message": "Failed to update booking status"}), 500
         
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
-        if 'db' in locals():
-            db.close()
+
+@api.route('/admin/bookings/import', methods=['POST'])
+def import_bookings_file():
+    access_token = request.cookies.get('access_token')
+    if not access_token:
+        return jsonify({"message": "No access token provided"}), 401
+        
+    decoded = decode_token(access_token)
+    if not decoded or decoded.get('role') != 'admin':
+        return jsonify({"message": "Unauthorized access"}), 403
+    
+    fmt = request.args.get('format') or ('ndjson' if 'json' in (request.content_type or '') else 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"message": "format must be csv or ndjson"}), 400
+    
+    stream = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+    rows = read_csv_rows(stream) if fmt == 'csv' else read_ndjson_rows(stream)
+    try:
+        with db_connection() as db:
+            report = import_bookings(db, rows, decoded.get('email'))
+        availability = current_availability()
+        if report['inserted'] and availability:
+            availability.invalidate()
+        if report['inserted']:
+            get_data_version().bump()
+            publish_event('bookings.changed', {"count": report['inserted']})
+        
+        status_code = 201 if report['inserted'] else 200
+        return jsonify({"message": "Import finished", **report}), status_code
+        
+    except Exception as e:
+        print(f"Error importing bookings: {str(e)}")
+        # rooms are committed layer by layer, so part of the file may already be in
+        availability = current_availability()
+        if availability:
+            availability.invalidate()
+        get_data_version().bump()
+        publish_event('bookings.changed', {"count": None})
+        return jsonify({"message": "Failed to import bookings; re-send the file with external_ref to finish it"}), 500
+        
+
+@api.route('/admin/bookings/status', methods=['PUT'])
+def update_booking_statuses():
+    access_token = request.cookies.get('access_token')
+    if not access_token:
+        return jsonify({"message": "No access token provided"}), 401
+        
+    decoded = decode_token(access_token)
+    if not decoded or decoded.get('role') != 'admin':
+        return jsonify({"message": "Unauthorized access"}), 403
+    
+    data = request.get_json(silent=True) or {}
+    updates = data.get('updates')
+    filter_args = data.get('filter')
+    
+    if updates is not None:
+        if not isinstance(updates, list) or not updates:
+            return jsonify({"message": "updates must be a non-empty list of {id, status}"}), 400
+        if len(updates) > MAX_BATCH_SIZE:
+            return jsonify({"message": f"At most {MAX_BATCH_SIZE} updates per request"}), 400
+        valid, results = validate_status_updates(updates)
+    elif filter_args is not None:
+        new_status = data.get('status')
+        if new_status not in BOOKING_STATUSES:
+            return jsonify({"message": "Invalid status provided"}), 400
+        try:
+            filters = parse_booking_filters(filter_args) if isinstance(filter_args, dict) else {}
+        except ValueError as e:
+            return jsonify({"message": str(e)}), 400
+        if not filters:
+            return jsonify({"message": "filter must narrow the bookings to update"}), 400
+        valid, results = None, []
+    else:
+        return jsonify({"message": "Provide either updates or filter with status"}), 400
+        
+    try:
+        with db_connection() as db, db.cursor(cursor_factory=ProfilingDictCursor) as cursor:
+            if valid is None:
+                updated = apply_status_to_filter(cursor, filters, new_status)
+                if len(updated) > MAX_BATCH_SIZE:
+                    db.rollback()
+                    return jsonify({"message": f"filter matches more than {MAX_BATCH_SIZE} bookings, narrow it"}), 400
+            else:
+                updated = apply_status_updates(cursor, valid) if valid else []
+            record_status_changes(cursor, [(row['id'], row['old_status'], row['status']) for row in updated])
+            db.commit()
+        if updated:
+            get_guest_bookings_cache().invalidate(*(row['user_email'] for row in updated))
+            get_data_version().bump()
+            # too many rows for one event each, dashboards refetch instead
+            publish_event('bookings.changed', {"count": len(updated)})
+        availability = current_availability()
+        if availability:
+            availability.record_status_changes(updated)
+        
+        found = set()
+        for row in updated:
+            found.add(row['id'])
+            results.append({"id": row['id'], "result": "updated", "status": row['status']})
+        for booking_id in (valid or {}):
+            if booking_id not in found:
+                results.append({"id": booking_id, "result": "not_found"})
+        
+        return jsonify({
+            "message": "Booking statuses updated",
+            "updated": len(updated),
+            "not_found": sum(1 for r in results if r['result'] == 'not_found'),
+            "invalid": sum(1 for r in results if r['result'] == 'invalid'),
+            "results": results
+        })
+        
+    except psycopg2.errors.ExclusionViolation:
+        return jsonify({"message": "A reactivated booking's room is no longer free for those dates, nothing was updated"}), 409
+    except Exception as e:
+        print(f"Error updating booking statuses: {str(e)}")
+        return jsonify({"message": "Failed to update booking statuses"}), 500
+        
+
+@api.route('/admin/events', methods=['GET'])
+def stream_booking_events():
+    access_token = request.cookies.get('access_token')
+    if not access_token:
+        return jsonify({"message": "No access token provided"}), 401
+        
+    decoded = decode_token(access_token)
+    if not decoded or decoded.get('role') != 'admin':
+        return jsonify({"message": "Unauthorized access"}), 403
+    
+    broker = get_broker()
+    subscription = Subscription(broker.queue_size)
+    # EventSource sends Last-Event-ID itself when it reconnects
+    backlog = broker.subscribe(subscription, request.headers.get('Last-Event-ID'))
+    if backlog is None:
+        return jsonify({"message": "Too many event streams open, try again later"}), 503, {"Retry-After": "10"}
+    
+    return Response(stream(broker, subscription, backlog, decoded['exp']), mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@api.route('/admin/events/stats', methods=['GET'])
+def get_events_stats():
+    access_token = request.cookies.get('access_token')
+    if not access_token:
+        return jsonify({"message": "No access token provided"}), 401
+        
+    decoded = decode_token(access_token)
+    if not decoded or decoded.get('role') != 'admin':
+        return jsonify({"message": "Unauthorized access"}), 403
+    
+    return jsonify({"events": events_stats()}), 200
+
+@api.route('/admin/db/pool', methods=['GET'])
+def get_pool_stats():
+    access_token = request.cookies.get('access_token')
+    if not access_token:
+        return jsonify({"message": "No access token provided"}), 401
+        
+    decoded = decode_token(access_token)
+    if not decoded or decoded.get('role') != 'admin':
+        return jsonify({"message": "Unauthorized access"}), 403
+    
+    return jsonify({"pool": pool_stats()}), 200
+
+@api.route('/admin/db/queries', methods=['GET'])
+def get_query_stats():
+    access_token = request.cookies.get('access_token')
+    if not access_token:
+        return jsonify({"message": "No access token provided"}), 401
+
+    decoded = decode_token(access_token)
+    if not decoded or decoded.get('role') != 'admin':
+        return jsonify({"message": "Unauthorized access"}), 403
+
+    sort = request.args.get('sort', 'total')
+    if sort not in ('total', 'avg', 'max', 'p95', 'count'):
+        return jsonify({"message": "sort must be one of total, avg, max, p95, count"}), 400
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 200)
+    except ValueError:
+        return jsonify({"message": "limit must be an integer"}), 400
+
+    # per worker, like the other /admin stats endpoints
+    queries, profile = query_report(limit=limit, sort=sort)
+    return jsonify({"queries": queries, "profile": profile}), 200
+
+@api.route('/admin/hashing', methods=['GET'])
+def get_hashing_stats():
+    access_token = request.cookies.get('access_token')
+    if not access_token:
+        return jsonify({"message": "No access token provided"}), 401
+        
+    decoded = decode_token(access_token)
+    if not decoded or decoded.get('role') != 'admin':
+        return jsonify({"message": "Unauthorized access"}), 403
+    
+    return jsonify({"hashing": hashing_stats()}), 200
+
+@api.route('/admin/cache', methods=['GET'])
+def get_cache_stats():
+    access_token = request.cookies.get('access_token')
+    if not access_token:
+        return jsonify({"message": "No access token provided"}), 401
+        
+    decoded = decode_token(access_token)
+    if not decoded or decoded.get('role') != 'admin':
+        return jsonify({"message": "Unauthorized access"}), 403
+    
+    return jsonify({"token_cache": token_cache_stats(),
+                    "user_cache": get_user_cache().stats(),
+                    "guest_bookings_cache": get_guest_bookings_cache().stats(),
+                    "data_version": get_data_version().stats(),
+                    "refresh": refresh_stats()}), 200
+
+@api.route('/admin/rate_limits', methods=['GET'])
+def get_rate_limit_stats():
+    access_token = request.cookies.get('access_token')
+    if not access_token:
+        return jsonify({"message": "No access token provided"}), 401
+        
+    decoded = decode_token(access_token)
+    if not decoded or decoded.get('role') != 'admin':
+        return jsonify({"message": "Unauthorized access"}), 403
+    
+    return jsonify({"login": login_throttle_stats()}), 200
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    create_app().run(debug=True)
@@ -0,0 +1,704 @@
+# Async serving mode: the same API as app.py on an ASGI server.
+#
+#     uvicorn asgi:app --workers 4 --timeout-keep-alive 75
+#
+# Request-path routes run natively on asyncpg; bcrypt goes to the hashing process pool
+# without blocking the event loop. The bulk admin endpoints (export, import, batch status)
+# fall through to the Flask app, which runs them in a worker thread.
+import hmac
+import os
+import time
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timezone
+
+import asyncpg
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse as StarletteJSONResponse
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Mount, Route
+
+try:
+    from a2wsgi import WSGIMiddleware
+except ImportError:
+    from starlette.middleware.wsgi import WSGIMiddleware
+
+from app import create_app
+from helper.accounts import CREATE_USER, DUPLICATE_MESSAGES, PROFILE_BY_EMAIL, USER_BY_EMAIL, USER_BY_USERNAME
+from helper.async_db import (allocate_and_insert, fetch_bookings_page, fetch_guest_bookings, fetch_stats,
+                             get_async_pool, to_asyncpg, update_status)
+from helper.availability import UnknownRoomType, current_availability, get_availability, parse_stay
+from helper.bookings_query import BOOKING_STATUSES, decode_cursor, parse_booking_filters, parse_page_size
+from helper.dashboard_stats import start_reconciler
+from helper.events import (AsyncSubscription, booking_created_data, events_stats, get_broker, publish_event,
+                           status_changed_data, stream_async)
+from helper.data_version import get_data_version
+from helper.db_pool import pool_stats
+from helper.generate_token import decode_token, generate_access_token, generate_refresh_token, token_cache_stats
+from helper.guest_bookings import get_guest_bookings_cache
+from helper.hashing import HashingBusy, check_password_async, hash_password_async, hashing_stats
+from helper.json_encoder import dumps
+from helper.metrics import add_gauge_source, get_metrics, metrics_text, start_request
+from helper.rate_limit import get_login_throttle, login_throttle_stats
+from helper.token_refresh import get_refresh_coalescer, refresh_stats
+from helper.room_allocation import NoRoomAvailable
+from helper.user_cache import get_user_cache
+
+DB_ERRORS = (asyncpg.PostgresError, OSError, TimeoutError)
+
+
+class JSONResponse(StarletteJSONResponse):
+    def render(self, content):
+        return dumps(content)
+
+USER_LOOKUPS = {'email': USER_BY_EMAIL, 'username': USER_BY_USERNAME}
+
+# field looked up, role allowed in, then the messages each login route has always answered with
+LOGINS = {
+    'guest': ('username', "Both username and password required", "User Account not found",
+              "Incorrect passwords", "Login unsuccessfull,only for guest", "Login successful"),
+    'admin': ('email', "Email and Password required", "Account not found",
+              "Incorrect Password", "Login unsuccessfull,Unauthoised Account", "Login Successfull"),
+    'superadmin': ('email', "Email and Password required", "Account not Found",
+                   "Incorrect Password", "Unauthorised Access", "Login successful"),
+    'staff': ('email', "Email and Password required", "Account not Found",
+              "Incorrect Password", "Unauthorised", "Login Successfull"),
+}
+
+
+def get_cookie_settings(request):
+    host = request.headers.get('host', '')
+    is_local = ("localhost" in host) or ("127.0.0.1" in host)
+    secure_cookie = False if is_local else True
+    samesite_cookie = "lax" if is_local else "none"
+    domain_cookie = None
+    return secure_cookie, samesite_cookie, domain_cookie
+
+
+def set_auth_cookies(response, request, access_token, refresh_token=None, access_expires_at=None):
+    secure_cookie, samesite_cookie, domain_cookie = get_cookie_settings(request)
+    if refresh_token is not None:
+        response.set_cookie('refresh_token', refresh_token, max_age=7*24*60*60, path='/',
+                            domain=domain_cookie, secure=secure_cookie, httponly=True, samesite=samesite_cookie)
+    max_age, expires = 15*60, None
+    if access_expires_at is not None:
+        max_age = max(0, access_expires_at - int(time.time()))
+        expires = datetime.fromtimestamp(access_expires_at, timezone.utc)
+    response.set_cookie('access_token', access_token, max_age=max_age, expires=expires, path='/',
+                        domain=domain_cookie, secure=secure_cookie, httponly=True, samesite=samesite_cookie)
+
+
+async def read_json(request):
+    try:
+        data = await request.json()
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def require_admin(request):
+    access_token = request.cookies.get('access_token')
+    if not access_token:
+        return None, JSONResponse({"message": "No access token provided"}, 401)
+    decoded = decode_token(access_token)
+    if not decoded or decoded.get('role') != 'admin':
+        return None, JSONResponse({"message": "Unauthorized access"}, 403)
+    return decoded, None
+
+
+async def publish(event_type, data):
+    # in notify mode publishing borrows a connection from the sync pool
+    if get_broker().notify:
+        await run_in_threadpool(publish_event, event_type, data)
+    else:
+        publish_event(event_type, data)
+
+
+async def loaded_availability():
+    # the index reloads through the sync pool; keep that off the event loop
+    availability = current_availability()
+    if availability is None or not availability.is_fresh():
+        availability = await run_in_threadpool(get_availability)
+    return availability
+
+
+async def signup(request):
+    if 'application/json' not in request.headers.get('content-type', ''):
+        return JSONResponse({"message": "Request must be jsonify", "status": "error", "user": None}, 400)
+
+    data = await read_json(request)
+    firstname = data.get('firstname')
+    lastname = data.get('lastname')
+    username = data.get('username')
+    email = data.get('email')
+    password = data.get('password')
+    confirmpassword = data.get('confirmpassword')
+
+    if not all([firstname, lastname, email, username, password, confirmpassword]):
+        return JSONResponse({"message": "All fields are required"}, 400)
+    if password != confirmpassword:
+        return JSONResponse({"message": "Passwords do not match"}, 400)
+    if len(password) < 6:
+        return JSONResponse({"message": "Length of Password must be more than 6"}, 400)
+    try:
+        hashpassword = await hash_password_async(password)
+        async with get_async_pool().connection() as conn:
+            try:
+                await conn.execute(to_asyncpg(CREATE_USER), firstname, lastname, email, username, hashpassword)
+            except asyncpg.UniqueViolationError as e:
+                message = DUPLICATE_MESSAGES.get(e.constraint_name)
+                if message is None:
+                    raise
+                return JSONResponse({"message": message, "status": "error", "user": None}, 409)
+        get_user_cache().invalidate(email)
+
+        response = JSONResponse({"message": "Signup succesfull", "status": "succes",
+                                 "user": {"firstname": firstname, "lastname": lastname, "email": email}})
+        set_auth_cookies(response, request, generate_access_token(email, role='guest'),
+                         generate_refresh_token(email, role='guest'))
+        return response
+    except DB_ERRORS as e:
+        return JSONResponse({"message": "Database error", "error": str(e), "status": "error", "user": None}, 500)
+    except HashingBusy:
+        return JSONResponse({"message": "Server busy, please try again", "status": "error"}, 503,
+                            headers={"Retry-After": "1"})
+
+
+def login_route(allowed_role):
+    field, missing, not_found, wrong_password, forbidden, success = LOGINS[allowed_role]
+
+    async def login(request):
+        data = await read_json(request)
+        identifier = data.get(field)
+        password = data.get('password')
+        if not all([identifier, password]):
+            return JSONResponse({"message": missing}, 400)
+
+        throttle = get_login_throttle()
+        retry_after = throttle.check(request.client.host if request.client else None, identifier)
+        if retry_after:
+            return JSONResponse({"message": "Too many login attempts, try again later", "status": "error"}, 429,
+                                headers={"Retry-After": str(retry_after)})
+
+        try:
+            async with get_async_pool().connection() as conn:
+                user = await conn.fetchrow(to_asyncpg(USER_LOOKUPS[field]), identifier)
+            if not user:
+                throttle.failed(identifier)
+                return JSONResponse({"message": not_found}, 404)
+            user = dict(user)
+
+            if not await check_password_async(password, user['passwords']):
+                throttle.failed(identifier)
+                return JSONResponse({"message": wrong_password}, 404)
+            throttle.succeeded(identifier)
+
+            role = user.get('role', allowed_role)
+            if role != allowed_role:
+                return JSONResponse({"message": forbidden}, 403)
+
+            get_user_cache().set(user['email'], user)
+            access_token = generate_access_token(user['email'], role)
+            response = JSONResponse({"message": success,
+                                     "status": "success",
+                                     "access_token": access_token,
+                                     "user": {
+                                         "username": user.get("username"),
+                                         "email": user["email"],
+                                         "role": role,
+                                         "firstname": user.get("firstname"),
+                                         "lastname": user.get("lastname")
+                                     }})
+            set_auth_cookies(response, request, access_token, generate_refresh_token(user['email'], role))
+            return response
+        except DB_ERRORS as e:
+            return JSONResponse({"message": "Something Happened,Connection Error", "error": str(e)}, 500)
+        except HashingBusy:
+            return JSONResponse({"message": "Server busy, please try again", "status": "error"}, 503,
+                                headers={"Retry-After": "1"})
+
+    return login
+
+
+async def get_current_user(request):
+    access_token = request.cookies.get('access_token')
+    if not access_token:
+        return JSONResponse({"message": "No token provided", "user": None}, 401)
+
+    payload = decode_token(access_token, is_refresh=False)
+    if not payload:
+        return JSONResponse({"message": "Invalid token", "user": None}, 401)
+
+    email = payload.get('email')
+    role = payload.get('role', 'guest')
+    try:
+        user = get_user_cache().get(email)
+        if user is None:
+            async with get_async_pool().connection() as conn:
+                user = await conn.fetchrow(to_asyncpg(PROFILE_BY_EMAIL), email)
+            if user:
+                user = dict(user)
+                get_user_cache().set(email, user)
+
+        if not user:
+            return JSONResponse({"message": "User not found", "user": None}, 404)
+
+        return JSONResponse({
+            "message": "User found",
+            "user": {
+                "firstname": user.get('firstname'),
+                "lastname": user.get('lastname'),
+                "username": user.get('username'),
+                "email": user['email'],
+                "role": user.get('role', 'guest')
+            }
+        })
+    except DB_ERRORS:
+        return JSONResponse({
+            "message": "User found (from token)",
+            "user": {
+                "email": email,
+                "role": role,
+                "firstname": "User",
+                "lastname": "",
+                "username": email.split('@')[0]
+            }
+        })
+
+
+async def get_my_bookings(request):
+    access_token = request.cookies.get('access_token')
+    if not access_token:
+        return JSONResponse({"message": "No access token provided"}, 401)
+
+    decoded = decode_token(access_token)
+    if not decoded or not decoded.get('email'):
+        return JSONResponse({"message": "Invalid or expired token"}, 401)
+
+    args = request.query_params
+    try:
+        limit = parse_page_size(args.get('limit'))
+        after = decode_cursor(args['after'], date.fromisoformat) if args.get('after') else None
+    except ValueError as e:
+        return JSONResponse({"message": str(e)}, 400)
+
+    email = decoded['email']
+    page = f"{limit}:{args.get('after') or ''}"
+    cache = get_guest_bookings_cache()
+    body = cache.get(email, page)
+    if body is None:
+        try:
+            async with get_async_pool().connection() as conn:
+                body = await fetch_guest_bookings(conn, email, limit, after=after)
+        except Exception as e:
+            print(f"Error fetching guest bookings: {str(e)}")
+            return JSONResponse({"message": "Failed to fetch bookings"}, 500)
+        cache.set(email, page, body)
+    return Response(body, media_type='application/json')
+
+
+async def refresh_token(request):
+    token = request.cookies.get('refresh_token')
+    if not token:
+        return JSONResponse({"message": "No refresh token provided"}, 401)
+
+    payload = decode_token(token, is_refresh=True)
+    if not payload:
+        return JSONResponse({"message": "Invalid refresh token"}, 401)
+
+    # the coalescer can block on another thread's mint, so keep it off the event loop
+    minted = await run_in_threadpool(get_refresh_coalescer().access_token, token, payload)
+    response = JSONResponse({"message": "Token refreshed", "access_token": minted['access_token']})
+    set_auth_cookies(response, request, minted['access_token'], access_expires_at=minted['expires_at'])
+    return response
+
+
+async def liveness_check(request):
+    return JSONResponse({"message": "Server is running", "status": "success"})
+
+
+async def health_check(request):
+    # readiness: the asyncpg pool can hand out a connection that answers
+    started = time.perf_counter()
+    try:
+        async with get_async_pool().connection() as conn:
+            await conn.fetchval("SELECT 1")
+    except Exception as e:
+        print(f"Health check failed: {e}")
+        return JSONResponse({"status": "unhealthy", "database": "unavailable"}, 503)
+    return JSONResponse({"message": "Server is running", "status": "success",
+                         "database": {"latency_ms": round((time.perf_counter() - started) * 1000, 3),
+                                      "pool": get_async_pool().stats()}})
+
+
+async def prometheus_metrics(request):
+    token = os.getenv("METRICS_TOKEN")
+    if token and not hmac.compare_digest(request.headers.get('authorization', ''), f"Bearer {token}"):
+        return JSONResponse({"message": "Unauthorized"}, 401)
+    # reads the other workers' snapshot files when METRICS_DIR is set
+    text = await run_in_threadpool(metrics_text)
+    return Response(text, media_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+async def logout(request):
+    response = JSONResponse({"message": "Logged out", "status": "success"})
+    response.set_cookie('refresh_token', '', expires=0, path='/')
+    response.set_cookie('access_token', '', expires=0, path='/')
+    return response
+
+
+async def hotel_booking(request):
+    access_token = request.cookies.get('access_token')
+    if not access_token:
+        return JSONResponse({"message": "No access token provided"}, 401)
+
+    decoded = decode_token(access_token)
+    if not decoded:
+        return JSONResponse({"message": "Invalid or expired token"}, 401)
+
+    user_email = decoded.get('email')
+    if not user_email:
+        return JSONResponse({"message": "Invalid Data"}, 401)
+
+    data = await read_json(request)
+    fields = [data.get(name) for name in
+              ('first_name', 'last_name', 'email', 'phone', 'room_type', 'people', 'check_in', 'duration')]
+    if not all(fields):
+        return JSONResponse({"message": "All fields are required"}, 400)
+    first_name, last_name, email, phone, room_type, people, check_in, duration = fields
+
+    try:
+        stay_start, stay_end = parse_stay(check_in, duration=duration)
+    except ValueError as e:
+        return JSONResponse({"message": str(e)}, 400)
+    try:
+        # asyncpg binds typed parameters, so coerce what psycopg2 would have let Postgres cast
+        people = int(people)
+    except (TypeError, ValueError):
+        return JSONResponse({"message": "people must be a number"}, 400)
+
+    reserved = False
+    availability = None
+    try:
+        availability = await loaded_availability()
+        try:
+            reserved = availability.reserve(room_type, stay_start, stay_end)
+        except UnknownRoomType:
+            return JSONResponse({"message": "Unknown room type"}, 400)
+        if not reserved:
+            return JSONResponse({"message": f"No {room_type} rooms available for those dates"}, 409)
+
+        fields = {
+            "first_name": str(first_name), "last_name": str(last_name), "email": str(email),
+            "phone": str(phone), "room_type": room_type, "people": people, "user_email": user_email
+        }
+        async with get_async_pool().connection() as conn:
+            async with conn.transaction():
+                booking = await allocate_and_insert(conn, fields, stay_start, stay_end)
+        get_guest_bookings_cache().invalidate(user_email)
+        get_data_version().bump()
+        await publish('booking.created', booking_created_data(booking, fields, stay_start, stay_end))
+
+        return JSONResponse({
+            "message": "Booking created successfully",
+            "booking_id": booking['id'],
+            "check_out": booking['check_out'],
+            "room_id": booking['room_id']
+        }, 201)
+
+    except NoRoomAvailable:
+        availability.release(room_type, stay_start, stay_end)
+        availability.invalidate()
+        return JSONResponse({"message": f"No {room_type} rooms available for those dates"}, 409)
+    except Exception as e:
+        if reserved:
+            availability.release(room_type, stay_start, stay_end)
+        print(f"Error creating booking: {str(e)}")
+        return JSONResponse({"message": "Failed to create booking"}, 500)
+
+
+async def search_availability(request):
+    args = request.query_params
+    try:
+        stay_start, stay_end = parse_stay(args.get('check_in'), check_out=args.get('check_out'),
+                                          duration=args.get('duration'))
+    except ValueError as e:
+        return JSONResponse({"message": str(e)}, 400)
+
+    try:
+        availability = await loaded_availability()
+        return JSONResponse({
+            "check_in": stay_start,
+            "check_out": stay_end,
+            "room_types": availability.search(stay_start, stay_end, args.get('room_type'))
+        })
+    except Exception as e:
+        print(f"Error searching availability: {str(e)}")
+        return JSONResponse({"message": "Failed to search availability"}, 500)
+
+
+async def get_dashboard_stats(request):
+    decoded, error = require_admin(request)
+    if error:
+        return error
+
+    start_reconciler()
+    version = get_data_version()
+    etag, headers = version.validators(request.url.path, weak=True)
+    if version.is_fresh(request.headers.get('if-none-match'), etag):
+        return Response(status_code=304, headers=headers)
+
+    try:
+        async with get_async_pool().connection() as conn:
+            stats = await fetch_stats(conn)
+
+        return JSONResponse({
+            "totalBookings": stats['total_bookings'],
+            "confirmedBookings": stats['confirmed_bookings'],
+            "pendingBookings": stats['pending_bookings'],
+            "activeGuests": stats['active_guests'],
+            "availableRooms": stats['available_rooms'],
+            "totalRooms": stats['total_rooms'],
+            "asOf": stats['as_of'],
+            "reconciledAt": stats['reconciled_at']
+        }, headers=headers)
+    except Exception as e:
+        print(f"Error fetching dashboard stats: {str(e)}")
+        return JSONResponse({"message": "Failed to fetch dashboard stats"}, 500)
+
+
+async def get_all_bookings(request):
+    decoded, error = require_admin(request)
+    if error:
+        return error
+
+    args = request.query_params
+    try:
+        filters = parse_booking_filters(args)
+        limit = parse_page_size(args.get('limit'))
+        if args.get('after') and args.get('before'):
+            raise ValueError("Use either after or before, not both")
+        after = decode_cursor(args['after']) if args.get('after') else None
+        before = decode_cursor(args['before']) if args.get('before') else None
+    except ValueError as e:
+        return JSONResponse({"message": str(e)}, 400)
+
+    version = get_data_version()
+    etag, headers = version.validators(f"{request.url.path}?{request.url.query}")
+    if version.is_fresh(request.headers.get('if-none-match'), etag):
+        return Response(status_code=304, headers=headers)
+
+    try:
+        async with get_async_pool().connection() as conn:
+            bookings, next_cursor, prev_cursor = await fetch_bookings_page(conn, filters, limit,
+                                                                           after=after, before=before)
+
+        return JSONResponse({
+            "bookings": bookings,
+            "next_cursor": next_cursor,
+            "prev_cursor": prev_cursor,
+            "limit": limit
+        }, headers=headers)
+    except Exception as e:
+        print(f"Error fetching bookings: {str(e)}")
+        return JSONResponse({"message": "Failed to fetch bookings"}, 500)
+
+
+async def update_booking_status(request):
+    decoded, error = require_admin(request)
+    if error:
+        return error
+
+    data = await read_json(request)
+    new_status = data.get('status')
+    if not new_status or new_status not in BOOKING_STATUSES:
+        return JSONResponse({"message": "Invalid status provided"}, 400)
+
+    try:
+        async with get_async_pool().connection() as conn:
+            async with conn.transaction():
+                updated_booking = await update_status(conn, request.path_params['booking_id'], new_status)
+        if not updated_booking:
+            return JSONResponse({"message": "Booking not found"}, 404)
+        get_guest_bookings_cache().invalidate(updated_booking['user_email'])
+        get_data_version().bump()
+        await publish('booking.status_changed', status_changed_data(updated_booking))
+
+        availability = current_availability()
+        if availability:
+            availability.record_status_changes([updated_booking])
+
+        return JSONResponse({
+            "message": "Booking status updated successfully",
+            "booking_id": updated_booking['id'],
+            "new_status": updated_booking['status']
+        })
+    except asyncpg.exceptions.ExclusionViolationError:
+        return JSONResponse({"message": "The booking's room is no longer free for those dates"}, 409)
+    except Exception as e:
+        print(f"Error updating booking status: {str(e)}")
+        return JSONResponse({"message": "Failed to update booking status"}, 500)
+
+
+async def stream_booking_events(request):
+    decoded, error = require_admin(request)
+    if error:
+        return error
+
+    broker = get_broker()
+    subscription = AsyncSubscription(broker.queue_size)
+    backlog = broker.subscribe(subscription, request.headers.get('last-event-id'))
+    if backlog is None:
+        return JSONResponse({"message": "Too many event streams open, try again later"}, 503,
+                            headers={"Retry-After": "10"})
+    return StreamingResponse(stream_async(broker, subscription, backlog, decoded['exp']),
+                             media_type='text/event-stream',
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+async def get_events_stats(request):
+    decoded, error = require_admin(request)
+    if error:
+        return error
+    return JSONResponse({"events": events_stats()})
+
+
+async def get_pool_stats(request):
+    decoded, error = require_admin(request)
+    if error:
+        return error
+    # the bulk endpoints served by the Flask fallback still borrow from the sync pool
+    return JSONResponse({"pool": get_async_pool().stats(), "wsgi_pool": pool_stats()})
+
+
+async def get_hashing_stats(request):
+    decoded, error = require_admin(request)
+    if error:
+        return error
+    return JSONResponse({"hashing": hashing_stats()})
+
+
+async def get_cache_stats(request):
+    decoded, error = require_admin(request)
+    if error:
+        return error
+    return JSONResponse({"token_cache": token_cache_stats(), "user_cache": get_user_cache().stats(),
+                         "guest_bookings_cache": get_guest_bookings_cache().stats(),
+                         "data_version": get_data_version().stats(), "refresh": refresh_stats()})
+
+
+async def get_rate_limit_stats(request):
+    decoded, error = require_admin(request)
+    if error:
+        return error
+    return JSONResponse({"login": login_throttle_stats()})
+
+
+def without_cors_headers(wsgi_app):
+    # CORSMiddleware answers for the whole ASGI app; drop flask_cors' copies so browsers
+    # don't see the Access-Control headers twice
+    def wrapped(environ, start_response):
+        def strip(status, headers, exc_info=None):
+            headers = [(name, value) for name, value in headers
+                       if not name.lower().startswith('access-control-')]
+            return start_response(status, headers, exc_info)
+        return wsgi_app(environ, strip)
+    return wrapped
+
+
+class RequestMetrics:
+    # times the native routes up to the start of the response, like the Flask hooks do;
+    # requests that fall through to the Flask app are recorded by its own hooks
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        db_time = start_request()
+        recorded = False
+
+        def record(status):
+            nonlocal recorded
+            recorded = True
+            route = scope.get('route')
+            if isinstance(route, Mount):
+                return
+            get_metrics().observe_request(scope['method'], route.path if route else 'unmatched', status,
+                                          time.perf_counter() - started, db_time[0])
+
+        async def timed_send(message):
+            if message['type'] == 'http.response.start' and not recorded:
+                record(message['status'])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            if not recorded:
+                record(500)
+
+
+def async_pool_gauges():
+    stats = get_async_pool().stats()
+    return {f"async_db_pool_{field}": stats[field] for field in ('size', 'in_use', 'idle', 'timeouts')}
+
+
+add_gauge_source(async_pool_gauges)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    pool = await get_async_pool().open()
+    try:
+        yield
+    finally:
+        await pool.close()
+
+
+flask_app = create_app()
+
+routes = [
+    Route('/signup', signup, methods=['POST']),
+    Route('/login', login_route('guest'), methods=['POST']),
+    Route('/adminlogin', login_route('admin'), methods=['POST']),
+    Route('/superadmin', login_route('superadmin'), methods=['POST']),
+    Route('/stafflogin', login_route('staff'), methods=['POST']),
+    Route('/me', get_current_user, methods=['GET']),
+    Route('/me/bookings', get_my_bookings, methods=['GET']),
+    Route('/refresh', refresh_token, methods=['POST']),
+    Route('/health', health_check, methods=['GET']),
+    Route('/health/live', liveness_check, methods=['GET']),
+    Route('/metrics', prometheus_metrics, methods=['GET']),
+    Route('/logout', logout, methods=['POST']),
+    Route('/hotel_booking', hotel_booking, methods=['POST']),
+    Route('/availability', search_availability, methods=['GET']),
+    Route('/admin/dashboard/stats', get_dashboard_stats, methods=['GET']),
+    Route('/admin/bookings', get_all_bookings, methods=['GET']),
+    Route('/admin/bookings/{booking_id:int}/status', update_booking_status, methods=['PUT']),
+    Route('/admin/events', stream_booking_events, methods=['GET']),
+    Route('/admin/events/stats', get_events_stats, methods=['GET']),
+    Route('/admin/db/pool', get_pool_stats, methods=['GET']),
+    Route('/admin/hashing', get_hashing_stats, methods=['GET']),
+    Route('/admin/cache', get_cache_stats, methods=['GET']),
+    Route('/admin/rate_limits', get_rate_limit_stats, methods=['GET']),
+    # everything else (export, import, batch status) is served by the Flask app
+    Mount('/', app=WSGIMiddleware(without_cors_headers(flask_app.wsgi_app))),
+]
+
+app = Starlette(
+    routes=routes,
+    lifespan=lifespan,
+    middleware=[Middleware(CORSMiddleware, allow_origin_regex='.*', allow_credentials=True,
+                           allow_methods=['*'], allow_headers=['*']),
+                Middleware(RequestMetrics)],
+)
+
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run("asgi:app", host="127.0.0.1", port=8000)
@@ -0,0 +1,88 @@
+# Pre-fork launcher for the Flask app:
+#
+#     gunicorn -c gunicorn.conf.py
+#
+# The master imports and warms the app once (preload_app), then forks the workers.
+# Database pools, the hashing process pool and the stats reconciler are created lazily in
+# each worker, so nothing with a socket, thread or child process is shared across fork.
+import os
+import shutil
+import tempfile
+import time
+
+# this file is read as the master starts, so cold start is measured from here
+_started = time.monotonic()
+
+
+def _flag(name, default):
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+
+wsgi_app = "wsgi:app"
+bind = os.getenv("BIND", "127.0.0.1:5000")
+workers = int(os.getenv("WEB_CONCURRENCY", (os.cpu_count() or 1) * 2 + 1))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", 8))
+# every open /admin/events stream holds a thread, so leave at least half of them for requests
+os.environ.setdefault("EVENTS_MAX_SUBSCRIBERS", str(max(1, threads // 2)))
+preload_app = _flag("GUNICORN_PRELOAD", "true")
+# workers leave metrics snapshots here so /metrics on any of them reports the whole server
+_own_metrics_dir = "METRICS_DIR" not in os.environ
+os.environ.setdefault("METRICS_DIR", os.path.join(tempfile.gettempdir(), f"hotel-metrics-{os.getpid()}"))
+
+# recycle workers so slow leaks can't build up; jitter keeps them from restarting together
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 2000))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 200))
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+
+
+def on_starting(server):
+    # counters left by a previous run would be added to this one's
+    directory = os.environ["METRICS_DIR"]
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        if name.endswith('.json'):
+            os.remove(os.path.join(directory, name))
+
+
+def on_exit(server):
+    if _own_metrics_dir:
+        shutil.rmtree(os.environ["METRICS_DIR"], ignore_errors=True)
+
+
+def when_ready(server):
+    server.log.info("Master ready %.1fms after start (preload_app=%s)",
+                    (time.monotonic() - _started) * 1000, server.cfg.preload_app)
+
+
+def post_fork(server, worker):
+    worker.forked_at = time.monotonic()
+    worker.first_request_seen = False
+
+
+def pre_request(worker, req):
+    if not worker.first_request_seen:
+        worker.first_request_seen = True
+        now = time.monotonic()
+        worker.log.info("Worker %s first request %s %s: %.1fms after fork, %.1fms after master start",
+                        worker.pid, req.method, req.path,
+                        (now - worker.forked_at) * 1000, (now - _started) * 1000)
+
+
+def worker_exit(server, worker):
+    # in-flight requests have finished (or graceful_timeout ran out); close what this worker opened
+    from helper.db_pool import close_pool
+    from helper.hashing import shutdown_hasher
+    from helper.metrics import get_metrics
+    close_pool()
+    shutdown_hasher()
+    get_metrics().flush()
+
+
+def child_exit(server, worker):
+    # in the master, also after a worker was killed without reaching worker_exit
+    from helper.metrics import retire_worker
+    retire_worker(os.environ["METRICS_DIR"], worker.pid)
@@ -0,0 +1,23 @@
+from helper.statements import register
+
+CREATE_USER = register('create_user', """
+    insert into loginusers(firstname,lastname,email,username,passwords) values (%s,%s,%s,%s,%s)
+""")
+
+USER_BY_EMAIL = register('user_by_email', """
+    select passwords,role,email,username,firstname,lastname from loginusers where email = %s
+""")
+
+USER_BY_USERNAME = register('user_by_username', """
+    select passwords,role,email,username,firstname,lastname from loginusers where username = %s
+""")
+
+PROFILE_BY_EMAIL = register('profile_by_email', """
+    SELECT firstname, lastname, username, email, role FROM loginusers WHERE email = %s
+""")
+
+# signup inserts straight away and lets these unique indexes (migrations/0007) report the clash
+DUPLICATE_MESSAGES = {
+    'loginusers_email_key': "Email already exists",
+    'loginusers_username_key': "Username already exists",
+}
@@ -0,0 +1,198 @@
+import os
+import time
+from functools import lru_cache
+
+import asyncpg
+
+from helper.booking_status import UPDATE_STATUS
+from helper.bookings_query import build_page_query, page_results
+from helper.dashboard_stats import BOOKING_CREATED, COUNTER_SHARDS, STATS_QUERY, counter_deltas
+from helper.guest_bookings import guest_page_query, page_body
+from helper.room_allocation import (INSERT_BOOKING, MAX_ALLOCATION_ATTEMPTS, NoRoomAvailable,
+                                    candidate_room_params, candidate_room_query, insert_params)
+from helper.metrics import add_db_time
+from helper.query_profiler import get_profiler, record_asyncpg_query
+from helper.statements import numbered
+
+COUNTER_DELTA = """
+    INSERT INTO booking_counters (status, shard, n) VALUES (%s, %s, %s)
+    ON CONFLICT (status, shard) DO UPDATE SET n = booking_counters.n + EXCLUDED.n
+"""
+
+
+@lru_cache(maxsize=256)
+def to_asyncpg(sql):
+    # the shared queries use psycopg2's %s placeholders; asyncpg wants $1, $2, ...
+    # the text must come out identical every time so asyncpg's statement cache keeps hitting
+    return numbered(sql)
+
+
+class AsyncPool:
+    def __init__(self, minconn=2, maxconn=20, timeout=5.0, max_lifetime=1800.0, max_idle=300.0):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self._pool = None
+        # server pid -> when the connection was opened; asyncpg has no age limit of its own
+        self._born = {}
+        self._acquires = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    async def open(self):
+        if self._pool is None:
+            self._pool = await asyncpg.create_pool(
+                host=os.getenv("DB_HOST"),
+                user=os.getenv("DB_USER"),
+                password=os.getenv("DB_PASSWORD"),
+                database=os.getenv("DB_NAME"),
+                min_size=self.minconn,
+                max_size=self.maxconn,
+                max_inactive_connection_lifetime=self.max_idle or 0,
+                init=self._init_connection,
+            )
+        return self
+
+    async def close(self):
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    async def _init_connection(self, conn):
+        self._born[conn.get_server_pid()] = time.monotonic()
+        if get_profiler().enabled:
+            conn.add_query_logger(record_asyncpg_query)
+
+    def _expired(self, conn):
+        if not self.max_lifetime:
+            return False
+        born = self._born.get(conn.get_server_pid(), 0)
+        return time.monotonic() - born > self.max_lifetime
+
+    async def release(self, conn):
+        if self._expired(conn):
+            # closing a pooled connection hands its slot back; the next acquire opens a fresh one
+            self._born.pop(conn.get_server_pid(), None)
+            await conn.close(timeout=self.timeout)
+        await self._pool.release(conn)
+
+    def connection(self):
+        return _Borrowed(self)
+
+    def stats(self):
+        pool = self._pool
+        size = pool.get_size() if pool else 0
+        idle = pool.get_idle_size() if pool else 0
+        return {
+            "min_size": self.minconn,
+            "max_size": self.maxconn,
+            "size": size,
+            "idle": idle,
+            "in_use": size - idle,
+            "checkouts": self._acquires,
+            "timeouts": self._timeouts,
+            "wait_avg_ms": round(self._wait_total / self._acquires * 1000, 3) if self._acquires else 0.0,
+            "wait_max_ms": round(self._wait_max * 1000, 3),
+        }
+
+
+class _Borrowed:
+    def __init__(self, pool):
+        self.pool = pool
+        self.conn = None
+
+    async def __aenter__(self):
+        pool = self.pool
+        start = time.perf_counter()
+        try:
+            self.conn = await pool._pool.acquire(timeout=pool.timeout)
+        except TimeoutError:
+            pool._timeouts += 1
+            raise
+        waited = time.perf_counter() - start
+        pool._acquires += 1
+        pool._wait_total += waited
+        pool._wait_max = max(pool._wait_max, waited)
+        self.borrowed = time.perf_counter()
+        return self.conn
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.pool.release(self.conn)
+        add_db_time(time.perf_counter() - self.borrowed)
+
+
+_pool = None
+
+
+def get_async_pool():
+    global _pool
+    if _pool is None:
+        _pool = AsyncPool(
+            minconn=int(os.getenv("ASYNC_DB_POOL_MIN", 2)),
+            maxconn=int(os.getenv("ASYNC_DB_POOL_MAX", 20)),
+            timeout=float(os.getenv("DB_POOL_TIMEOUT", 5)),
+            max_lifetime=float(os.getenv("DB_POOL_MAX_LIFETIME", 1800)),
+            max_idle=float(os.getenv("DB_POOL_MAX_IDLE", 300)),
+        )
+    return _pool
+
+
+async def fetch_stats(conn):
+    return await conn.fetchrow(to_asyncpg(STATS_QUERY))
+
+
+async def fetch_bookings_page(conn, filters, limit, after=None, before=None):
+    sql, params = build_page_query(filters, limit, after=after, before=before)
+    rows = [dict(row) for row in await conn.fetch(to_asyncpg(sql), *params)]
+    return page_results(rows, limit, after=after, before=before)
+
+
+async def fetch_guest_bookings(conn, email, limit, after=None):
+    _, sql, params = guest_page_query(email, limit, after=after)
+    return page_body([dict(row) for row in await conn.fetch(to_asyncpg(sql), *params)], limit)
+
+
+async def record_status_changes(conn, changes):
+    rows = counter_deltas(changes)
+    if rows:
+        await conn.executemany(to_asyncpg(COUNTER_DELTA), rows)
+
+
+async def update_status(conn, booking_id, new_status):
+    row = await conn.fetchrow(to_asyncpg(UPDATE_STATUS), new_status, booking_id)
+    if row is None:
+        return None
+    row = dict(row)
+    await record_status_changes(conn, [(row['id'], row['old_status'], row['status'])])
+    return row
+
+
+async def _candidate_room(conn, room_type, check_in, check_out, skip_locked, tried):
+    return await conn.fetchval(to_asyncpg(candidate_room_query(skip_locked)),
+                               *candidate_room_params(room_type, tried, check_in, check_out))
+
+
+async def allocate_and_insert(conn, booking, check_in, check_out):
+    # same allocation as helper.room_allocation, run inside the caller's transaction
+    tried = set()
+    for _ in range(MAX_ALLOCATION_ATTEMPTS):
+        room_id = await _candidate_room(conn, booking['room_type'], check_in, check_out, True, tried)
+        if room_id is None:
+            room_id = await _candidate_room(conn, booking['room_type'], check_in, check_out, False, tried)
+        if room_id is None:
+            raise NoRoomAvailable(booking['room_type'])
+
+        try:
+            # a nested transaction is a savepoint in asyncpg
+            async with conn.transaction():
+                row = await conn.fetchrow(to_asyncpg(INSERT_BOOKING),
+                                          *insert_params(booking, room_id, check_in, check_out))
+        except asyncpg.exceptions.ExclusionViolationError:
+            tried.add(room_id)
+            continue
+        await conn.execute(to_asyncpg(BOOKING_CREATED), 'pending', row['id'] % COUNTER_SHARDS)
+        return dict(row)
+    raise NoRoomAvailable(booking['room_type'])
@@ -0,0 +1,180 @@
+import os
+import threading
+import time
+from datetime import date, timedelta
+
+from helper.db_pool import db_connection
+from helper.query_profiler import ProfilingDictCursor
+
+# bookings in these states hold their room for every night in [check_in, check_out)
+ACTIVE_STATUSES = ('pending', 'confirmed')
+MAX_STAY_NIGHTS = 365
+
+
+class UnknownRoomType(Exception):
+    pass
+
+
+class RoomTypeNights:
+    def __init__(self, capacity=0):
+        self.capacity = capacity
+        self.booked = {}
+
+    def add(self, first_night, last_night, delta):
+        booked = self.booked
+        for night in range(first_night, last_night):
+            count = booked.get(night, 0) + delta
+            if count:
+                booked[night] = count
+            else:
+                booked.pop(night, None)
+
+    def peak(self, first_night, last_night):
+        booked = self.booked
+        if not booked:
+            return 0
+        return max(booked.get(night, 0) for night in range(first_night, last_night))
+
+
+class AvailabilityIndex:
+    def __init__(self, refresh_seconds=60.0):
+        self.refresh_seconds = refresh_seconds
+        self._types = {}
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._loaded_at = None
+
+    def load(self, cursor):
+        cursor.execute("""
+            SELECT room_type, COUNT(*) AS capacity
+            FROM rooms
+            WHERE status IS DISTINCT FROM 'maintenance'
+            GROUP BY room_type
+        """)
+        types = {row['room_type']: RoomTypeNights(row['capacity']) for row in cursor.fetchall()}
+        cursor.execute("""
+            SELECT room_type, check_in, check_out
+            FROM bookings
+            WHERE status = ANY(%s) AND check_out > CURRENT_DATE
+        """, (list(ACTIVE_STATUSES),))
+        for row in cursor.fetchall():
+            nights = types.setdefault(row['room_type'], RoomTypeNights())
+            nights.add(row['check_in'].toordinal(), row['check_out'].toordinal(), 1)
+        with self._lock:
+            self._types = types
+            self._loaded_at = time.monotonic()
+
+    def is_fresh(self):
+        loaded_at = self._loaded_at
+        return loaded_at is not None and time.monotonic() - loaded_at < self.refresh_seconds
+
+    def ensure_loaded(self):
+        loaded_at = self._loaded_at
+        if self.is_fresh():
+            return
+        # other workers write bookings too, so rebuild from the database every refresh_seconds;
+        # one thread reloads while the rest keep answering from the current index
+        if not self._reload_lock.acquire(blocking=loaded_at is None):
+            return
+        try:
+            if self._loaded_at == loaded_at:
+                with db_connection() as db, db.cursor(cursor_factory=ProfilingDictCursor) as cursor:
+                    self.load(cursor)
+        finally:
+            self._reload_lock.release()
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def available(self, room_type, check_in, check_out):
+        with self._lock:
+            nights = self._types.get(room_type)
+            if nights is None or not nights.capacity:
+                return 0
+            return max(0, nights.capacity - nights.peak(check_in.toordinal(), check_out.toordinal()))
+
+    def search(self, check_in, check_out, room_type=None):
+        first, last = check_in.toordinal(), check_out.toordinal()
+        with self._lock:
+            types = [room_type] if room_type else sorted(self._types)
+            results = []
+            for name in types:
+                nights = self._types.get(name)
+                if nights is None or not nights.capacity:
+                    continue
+                results.append({
+                    "room_type": name,
+                    "available": max(0, nights.capacity - nights.peak(first, last)),
+                    "total": nights.capacity,
+                })
+            return results
+
+    def reserve(self, room_type, check_in, check_out):
+        # check and claim in one step so two requests in this process can't both take the last room
+        first, last = check_in.toordinal(), check_out.toordinal()
+        with self._lock:
+            nights = self._types.get(room_type)
+            if nights is None or not nights.capacity:
+                raise UnknownRoomType(room_type)
+            if nights.peak(first, last) >= nights.capacity:
+                return False
+            nights.add(first, last, 1)
+            return True
+
+    def release(self, room_type, check_in, check_out):
+        self.apply(room_type, check_in, check_out, -1)
+
+    def apply(self, room_type, check_in, check_out, delta):
+        with self._lock:
+            nights = self._types.setdefault(room_type, RoomTypeNights())
+            nights.add(check_in.toordinal(), check_out.toordinal(), delta)
+
+    def record_status_changes(self, rows):
+        for row in rows:
+            was_active = row['old_status'] in ACTIVE_STATUSES
+            is_active = row['status'] in ACTIVE_STATUSES
+            if was_active != is_active:
+                self.apply(row['room_type'], row['check_in'], row['check_out'], 1 if is_active else -1)
+
+
+def parse_stay(check_in, check_out=None, duration=None):
+    try:
+        check_in = date.fromisoformat(str(check_in))
+    except ValueError:
+        raise ValueError("check_in must be a YYYY-MM-DD date")
+    if check_out is not None:
+        try:
+            check_out = date.fromisoformat(str(check_out))
+        except ValueError:
+            raise ValueError("check_out must be a YYYY-MM-DD date")
+    else:
+        try:
+            nights = int(duration)
+        except (TypeError, ValueError):
+            raise ValueError("duration must be a number of nights")
+        check_out = check_in + timedelta(days=nights)
+    if check_out <= check_in:
+        raise ValueError("check_out must be after check_in")
+    if (check_out - check_in).days > MAX_STAY_NIGHTS:
+        raise ValueError(f"Stays are limited to {MAX_STAY_NIGHTS} nights")
+    return check_in, check_out
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_availability():
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = AvailabilityIndex(refresh_seconds=float(os.getenv("AVAILABILITY_REFRESH_SECONDS", 60)))
+    _index.ensure_loaded()
+    return _index
+
+
+def current_availability():
+    # incremental updates go to whatever index is loaded; a fresh load already reflects committed writes
+    return _index
@@ -0,0 +1,371 @@
+import csv
+import io
+import heapq
+import json
+from datetime import date
+
+from helper.availability import ACTIVE_STATUSES
+from helper.bookings_query import BOOKING_STATUSES
+from helper.dashboard_stats import COUNTER_SHARDS
+
+# same rule as hotel_booking: every one of these must be present and non-empty
+REQUIRED_FIELDS = ('first_name', 'last_name', 'email', 'phone', 'room_type', 'people', 'check_in', 'duration')
+STAGING_COLUMNS = REQUIRED_FIELDS + ('status', 'user_email', 'external_ref', 'line')
+
+MAX_REPORTED_ERRORS = 1000
+
+IMPORTED_COLUMNS = ('id',) + REQUIRED_FIELDS + ('status', 'user_email', 'external_ref')
+
+# shared tail of the insert statements: counts what the "inserted" CTE added
+COUNT_INSERTED = f"""
+    counted AS (
+        INSERT INTO booking_counters (status, shard, n)
+        SELECT status, id % {COUNTER_SHARDS}, COUNT(*) FROM inserted
+        GROUP BY status, id % {COUNTER_SHARDS}
+        ORDER BY 1, 2
+        ON CONFLICT (status, shard) DO UPDATE SET n = booking_counters.n + EXCLUDED.n
+    )
+"""
+
+# cancelled/completed rows hold no room and go in with one statement
+INSERT_INACTIVE = f"""
+    WITH inserted AS (
+        INSERT INTO bookings ({', '.join(IMPORTED_COLUMNS)})
+        SELECT {', '.join(IMPORTED_COLUMNS)}
+        FROM booking_import
+        WHERE status <> ALL(%(active)s)
+        ORDER BY line
+        ON CONFLICT (external_ref) DO NOTHING
+        RETURNING id, status
+    ),
+    {COUNT_INSERTED.replace('%', '%%')},
+    resolved AS (
+        DELETE FROM booking_import s
+        WHERE s.status <> ALL(%(active)s)
+        RETURNING s.id, s.line, s.external_ref
+    )
+    SELECT r.line, r.external_ref
+    FROM resolved r
+    WHERE NOT EXISTS (SELECT 1 FROM inserted i WHERE i.id = r.id)
+"""
+
+# Rooms for one layer of stays (see _layers) in a single statement: within a stay the staged
+# rows are ranked by line and matched with the stay's free rooms ranked by id, the same order
+# POST /hotel_booking hands them out in. Active bookings without a room hold the first rooms
+# of their type, as in room_allocation.candidate_room_query. Rows that got no room come back
+# and leave the staging table; rows whose room was taken by a booking committed after this
+# statement started are skipped by ON CONFLICT and stay staged for the next pass
+ALLOCATE_LAYER = f"""
+    WITH stays AS (
+        SELECT t.*, h.n AS held
+        FROM unnest(%(room_types)s::text[], %(check_ins)s::date[], %(check_outs)s::date[], %(wanted)s::int[])
+            AS t(room_type, check_in, check_out, wanted)
+        CROSS JOIN LATERAL (
+            SELECT COUNT(*) AS n FROM bookings u
+            WHERE u.room_id IS NULL
+            AND u.check_out > t.check_in
+            AND u.check_in < t.check_out
+            AND u.room_type = t.room_type
+            AND u.status = ANY(%(active)s)
+        ) h
+    ),
+    staged AS (
+        SELECT s.*, row_number() OVER (PARTITION BY s.room_type, s.check_in, s.check_out ORDER BY s.line) AS rank
+        FROM booking_import s
+        JOIN stays t USING (room_type, check_in, check_out)
+    ),
+    free AS (
+        SELECT t.room_type, t.check_in, t.check_out, f.room_id,
+               row_number() OVER (PARTITION BY t.room_type, t.check_in, t.check_out ORDER BY f.room_id) AS rank
+        FROM stays t
+        CROSS JOIN LATERAL (
+            -- rooms come in id order so the probe stops after the rooms it needs; without
+            -- the subquery the planner probes every room of the type and sorts them
+            SELECT r.id AS room_id
+            FROM (
+                SELECT id FROM rooms
+                WHERE room_type = t.room_type
+                AND status IS DISTINCT FROM 'maintenance'
+                ORDER BY id
+            ) r
+            WHERE NOT EXISTS (
+                SELECT 1 FROM bookings b
+                WHERE b.room_id = r.id
+                AND b.check_out > t.check_in
+                AND b.check_in < t.check_out
+                AND b.status = ANY(%(active)s)
+            )
+            ORDER BY r.id
+            LIMIT t.wanted + t.held
+        ) f
+    ),
+    matched AS (
+        SELECT s.*, f.room_id
+        FROM staged s
+        JOIN stays t USING (room_type, check_in, check_out)
+        LEFT JOIN free f ON f.room_type = s.room_type AND f.check_in = s.check_in
+            AND f.check_out = s.check_out AND f.rank = s.rank + t.held
+    ),
+    inserted AS (
+        INSERT INTO bookings ({', '.join(IMPORTED_COLUMNS)}, room_id)
+        SELECT {', '.join(IMPORTED_COLUMNS)}, room_id
+        FROM matched
+        WHERE room_id IS NOT NULL
+        ORDER BY line
+        ON CONFLICT DO NOTHING
+        RETURNING id, status
+    ),
+    {COUNT_INSERTED.replace('%', '%%')},
+    placed AS (
+        DELETE FROM booking_import s USING inserted i WHERE s.id = i.id
+    ),
+    no_room AS (
+        DELETE FROM booking_import s USING matched m
+        WHERE s.id = m.id AND m.room_id IS NULL
+        RETURNING s.line, s.room_type
+    )
+    SELECT line, room_type FROM no_room
+"""
+
+
+def read_csv_rows(stream):
+    reader = csv.DictReader(stream)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def read_ndjson_rows(stream):
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield line_number, row
+
+
+def _positive_int(value):
+    if isinstance(value, bool):
+        raise ValueError
+    number = int(value)
+    if number <= 0:
+        raise ValueError
+    return number
+
+
+def validate_row(row, default_user_email):
+    if not isinstance(row, dict):
+        return None, ["Row is not a JSON object"]
+    errors = []
+    values = {}
+    for field in REQUIRED_FIELDS:
+        value = row.get(field)
+        if isinstance(value, str):
+            value = value.strip()
+        if not value:
+            errors.append(f"{field} is required")
+        values[field] = value
+    if errors:
+        return None, errors
+
+    for field in ('people', 'duration'):
+        try:
+            values[field] = _positive_int(values[field])
+        except (TypeError, ValueError):
+            errors.append(f"{field} must be a positive integer")
+    try:
+        values['check_in'] = date.fromisoformat(str(values['check_in']))
+    except ValueError:
+        errors.append("check_in must be a YYYY-MM-DD date")
+
+    status = str(row.get('status') or 'pending').strip()
+    if status not in BOOKING_STATUSES:
+        errors.append("Invalid status provided")
+    if errors:
+        return None, errors
+
+    values['status'] = status
+    values['user_email'] = str(row.get('user_email') or '').strip() or default_user_email
+    values['external_ref'] = str(row.get('external_ref') or '').strip() or None
+    return values, []
+
+
+class _CopySource:
+    # file-like wrapper so COPY pulls rows from the generator as it goes
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self._buffer = b''
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        if size < 0:
+            data, self._buffer = self._buffer, b''
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+def _staging_chunks(rows, default_user_email, report):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for line, row in rows:
+        report['received'] += 1
+        values, errors = validate_row(row, default_user_email)
+        if errors:
+            report['rejected'] += 1
+            if len(report['errors']) < MAX_REPORTED_ERRORS:
+                report['errors'].append({"line": line, "errors": errors})
+            continue
+        values['line'] = line
+        writer.writerow([values[column] for column in STAGING_COLUMNS])
+        if buffer.tell() >= 64 * 1024:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def _layers(stays):
+    # interval partitioning per room type: stays in one layer never overlap, so all of a
+    # layer's rows can take rooms in one statement. There are as many layers as the most
+    # distinct stays of one type sharing a night, however many rows the file has
+    layers = []
+    ends = {}
+    # stays are (room_type, check_in, check_out, staged rows)
+    for stay in sorted(stays, key=lambda stay: (stay[1], stay[2])):
+        room_type, check_in, check_out = stay[:3]
+        heap = ends.setdefault(room_type, [])
+        if heap and heap[0][0] <= check_in:
+            _, index = heapq.heappop(heap)
+        else:
+            index = len(heap)
+        heapq.heappush(heap, (check_out, index))
+        if index == len(layers):
+            layers.append([])
+        layers[index].append(stay)
+    return layers
+
+
+def _allocate_rooms(db, report):
+    # each layer commits on its own, so concurrent bookings only ever wait on one statement
+    # for the rooms this import takes
+    active = list(ACTIVE_STATUSES)
+    conflicts = []
+    pending = None
+    while True:
+        with db.cursor() as cursor:
+            # lines inserted meanwhile by another import are duplicates, not competitors
+            cursor.execute("""
+                DELETE FROM booking_import s
+                USING bookings b
+                WHERE b.external_ref = s.external_ref
+                RETURNING s.line, s.external_ref
+            """)
+            conflicts += cursor.fetchall()
+            cursor.execute("""
+                SELECT room_type, check_in, check_out, COUNT(*)
+                FROM booking_import
+                GROUP BY room_type, check_in, check_out
+            """)
+            stays = cursor.fetchall()
+        db.commit()
+        remaining = sum(stay[3] for stay in stays)
+        if not remaining or remaining == pending:
+            break
+        pending = remaining
+        for layer in _layers(stays):
+            with db.cursor() as cursor:
+                cursor.execute(ALLOCATE_LAYER, {
+                    "room_types": [stay[0] for stay in layer],
+                    "check_ins": [stay[1] for stay in layer],
+                    "check_outs": [stay[2] for stay in layer],
+                    "wanted": [stay[3] for stay in layer],
+                    "active": active,
+                })
+                for line, room_type in cursor:
+                    _reject(report, line, f"No {room_type} room is free for those dates")
+            db.commit()
+
+    if remaining:
+        # rooms kept being taken under us; give up on these rather than loop
+        with db.cursor() as cursor:
+            cursor.execute("DELETE FROM booking_import RETURNING line, room_type")
+            for line, room_type in cursor:
+                _reject(report, line, f"No {room_type} room is free for those dates")
+        db.commit()
+    return conflicts
+
+
+def _reject(report, line, error):
+    report['rejected'] += 1
+    if len(report['errors']) < MAX_REPORTED_ERRORS:
+        report['errors'].append({"line": line, "errors": [error]})
+
+
+def import_bookings(db, rows, default_user_email):
+    # staging survives the per-layer commits and is dropped at the end; rows are committed
+    # in steps, so after a failure re-send the file with external_ref to pick up the rest
+    report = {"received": 0, "inserted": 0, "duplicates": 0, "rejected": 0, "errors": []}
+    try:
+        with db.cursor() as cursor:
+            cursor.execute("""
+                CREATE TEMP TABLE booking_import (
+                    first_name text, last_name text, email text, phone text, room_type text,
+                    people integer, check_in date, duration integer,
+                    status text, user_email text, external_ref text, line integer,
+                    id integer, check_out date
+                )
+            """)
+            source = _CopySource(_staging_chunks(rows, default_user_email, report))
+            cursor.copy_expert(
+                f"COPY booking_import ({', '.join(STAGING_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+                source,
+            )
+
+            # a repeated external_ref inside the same file keeps its first line
+            cursor.execute("""
+                DELETE FROM booking_import a
+                USING booking_import b
+                WHERE a.external_ref = b.external_ref AND a.line > b.line
+                RETURNING a.line, a.external_ref
+            """)
+            duplicates = cursor.fetchall()
+
+            cursor.execute("""
+                DELETE FROM booking_import s
+                WHERE NOT EXISTS (SELECT 1 FROM rooms r WHERE r.room_type = s.room_type)
+                RETURNING s.line, s.room_type
+            """)
+            for line, room_type in cursor:
+                _reject(report, line, f"Unknown room type {room_type}")
+
+            # take ids up front so every staged line maps to the booking it becomes
+            cursor.execute("""
+                UPDATE booking_import
+                SET id = nextval(pg_get_serial_sequence('bookings', 'id')),
+                    check_out = check_in + duration
+            """)
+            cursor.execute(INSERT_INACTIVE, {"active": list(ACTIVE_STATUSES)})
+            conflicts = cursor.fetchall()
+        db.commit()
+
+        conflicts += _allocate_rooms(db, report)
+    finally:
+        db.rollback()
+        with db.cursor() as cursor:
+            cursor.execute("DROP TABLE IF EXISTS booking_import")
+        db.commit()
+
+    report['duplicates'] = len(duplicates) + len(conflicts)
+    report['inserted'] = report['received'] - report['rejected'] - report['duplicates']
+    for line, external_ref in duplicates + conflicts:
+        if len(report['errors']) < MAX_REPORTED_ERRORS:
+            report['errors'].append({"line": line, "errors": [f"Duplicate external_ref {external_ref}"]})
+    report['errors'].sort(key=lambda error: error['line'])
+    return report
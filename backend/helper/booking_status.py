@@ -0,0 +1,77 @@
+from helper.bookings_query import BOOKING_STATUSES, build_where
+from helper.statements import register
+
+MAX_BATCH_SIZE = 1000
+# bookings.id is a serial (int4); anything outside it can't name a booking and would make
+# the batch's int[] cast fail
+MAX_BOOKING_ID = 2 ** 31 - 1
+
+UPDATE_STATUS = register('update_booking_status', """
+    UPDATE bookings b
+    SET status = %s
+    FROM (SELECT id, status FROM bookings WHERE id = %s FOR UPDATE) old
+    WHERE b.id = old.id
+    RETURNING b.id, b.status, old.status AS old_status, b.room_type, b.check_in, b.check_out, b.user_email
+""")
+
+
+def validate_status_updates(updates):
+    # returns ({id: status} for the valid entries, [invalid results]); a repeated id keeps its last status
+    valid = {}
+    invalid = []
+    for item in updates:
+        booking_id = item.get('id') if isinstance(item, dict) else None
+        status = item.get('status') if isinstance(item, dict) else None
+        if isinstance(booking_id, bool) or not isinstance(booking_id, int):
+            invalid.append({"id": booking_id, "result": "invalid", "reason": "id must be an integer"})
+        elif not -MAX_BOOKING_ID - 1 <= booking_id <= MAX_BOOKING_ID:
+            invalid.append({"id": booking_id, "result": "invalid", "reason": "id is out of range"})
+        elif status not in BOOKING_STATUSES:
+            invalid.append({"id": booking_id, "result": "invalid", "reason": "Invalid status provided"})
+        else:
+            valid[booking_id] = status
+    return valid, invalid
+
+
+def apply_status_updates(cursor, updates):
+    # one statement for the whole batch; rows are locked in id order so overlapping batches can't deadlock
+    ids = sorted(updates)
+    cursor.execute("""
+        WITH input AS (
+            SELECT * FROM unnest(%s::int[], %s::text[]) AS t(id, status)
+        ),
+        old AS (
+            SELECT b.id, b.status
+            FROM bookings b
+            JOIN input i ON i.id = b.id
+            ORDER BY b.id
+            FOR UPDATE OF b
+        )
+        UPDATE bookings b
+        SET status = i.status
+        FROM input i, old
+        WHERE b.id = i.id AND old.id = b.id
+        RETURNING b.id, b.status, old.status AS old_status, b.room_type, b.check_in, b.check_out, b.user_email
+    """, (ids, [updates[i] for i in ids]))
+    return cursor.fetchall()
+
+
+def apply_status_to_filter(cursor, filters, new_status, limit=MAX_BATCH_SIZE):
+    # locks at most limit + 1 rows; getting more than limit back means the filter is too broad
+    # and the caller rolls back
+    clauses, params = build_where(filters)
+    cursor.execute(f"""
+        UPDATE bookings b
+        SET status = %s
+        FROM (
+            SELECT b.id, b.status
+            FROM bookings b
+            WHERE {" AND ".join(clauses)}
+            ORDER BY b.id
+            LIMIT %s
+            FOR UPDATE
+        ) old
+        WHERE b.id = old.id
+        RETURNING b.id, b.status, old.status AS old_status, b.room_type, b.check_in, b.check_out, b.user_email
+    """, [new_status] + params + [limit + 1])
+    return cursor.fetchall()
@@ -0,0 +1,107 @@
+import csv
+import io
+import os
+import zlib
+from datetime import date, datetime
+
+from psycopg2.extras import RealDictCursor
+
+from helper.bookings_query import BOOKING_COLUMNS, build_where
+from helper.db_pool import db_connection
+from helper.json_encoder import dumps
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+EXPORT_FIELDS = ['id', 'guest_name', 'email', 'phone', 'room_type', 'people',
+                 'check_in', 'duration', 'check_out', 'status', 'created_at']
+
+# flush to the client roughly every 64KB instead of once per row
+CHUNK_SIZE = 64 * 1024
+
+
+MIN_FETCH_SIZE = 100
+MAX_FETCH_SIZE = 50000
+
+
+def export_fetch_size(value=None):
+    default = int(os.getenv("EXPORT_FETCH_SIZE", 2000))
+    if value is None:
+        return default
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"fetch_size must be an integer between {MIN_FETCH_SIZE} and {MAX_FETCH_SIZE}")
+    return max(MIN_FETCH_SIZE, min(value, MAX_FETCH_SIZE))
+
+
+def _plain(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def _csv_rows(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        writer.writerow([_plain(row[field]) for field in EXPORT_FIELDS])
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _ndjson_rows(rows):
+    # rows already carry exactly EXPORT_FIELDS (BOOKING_COLUMNS), so encode them as they come
+    parts = []
+    size = 0
+    for row in rows:
+        line = dumps(row) + b'\n'
+        parts.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield b''.join(parts)
+            parts = []
+            size = 0
+    if parts:
+        yield b''.join(parts)
+
+
+def _gzip(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _fetch_rows(filters, fetch_size):
+    clauses, params = build_where(filters)
+    where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+    with db_connection() as db:
+        # a named cursor keeps the result set on the server; we only ever hold fetch_size rows
+        with db.cursor(name='bookings_export', cursor_factory=RealDictCursor) as cursor:
+            cursor.itersize = fetch_size
+            cursor.execute(f"""
+                SELECT {BOOKING_COLUMNS}
+                FROM bookings b
+                {where}
+                ORDER BY b.created_at, b.id
+            """, params)
+            for row in cursor:
+                yield row
+
+
+def stream_bookings(filters, fmt='csv', fetch_size=None, compress=False):
+    rows = _fetch_rows(filters, fetch_size or export_fetch_size())
+    if fmt == 'csv':
+        encoded = (chunk.encode('utf-8') for chunk in _csv_rows(rows))
+    else:
+        encoded = _ndjson_rows(rows)
+    return _gzip(encoded) if compress else encoded
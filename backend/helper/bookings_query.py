@@ -0,0 +1,152 @@
+import base64
+import json
+from datetime import date, datetime
+
+BOOKING_STATUSES = ('pending', 'confirmed', 'cancelled', 'completed')
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+BOOKING_COLUMNS = """
+    b.id,
+    b.first_name || ' ' || b.last_name as guest_name,
+    b.email,
+    b.phone,
+    b.room_type,
+    b.people,
+    b.check_in,
+    b.duration,
+    b.check_out,
+    b.status,
+    b.created_at
+"""
+
+
+def _parse_date(value, field):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{field} must be a YYYY-MM-DD date")
+
+
+def _text(args, field):
+    # query strings are always text, a JSON filter body can hold anything
+    value = args.get(field)
+    if value is not None and not isinstance(value, str):
+        raise ValueError(f"{field} must be a string")
+    return value
+
+
+def parse_booking_filters(args):
+    filters = {}
+    status = _text(args, 'status')
+    if status:
+        statuses = [s.strip() for s in status.split(',') if s.strip()]
+        invalid = [s for s in statuses if s not in BOOKING_STATUSES]
+        if invalid:
+            raise ValueError("Invalid status filter: " + ", ".join(invalid))
+        filters['status'] = statuses
+    room_type = _text(args, 'room_type')
+    if room_type:
+        filters['room_type'] = room_type
+    email = _text(args, 'email')
+    if email:
+        filters['email'] = email.strip().lower()
+    check_in_from = _text(args, 'check_in_from')
+    if check_in_from:
+        filters['check_in_from'] = _parse_date(check_in_from, 'check_in_from')
+    check_in_to = _text(args, 'check_in_to')
+    if check_in_to:
+        filters['check_in_to'] = _parse_date(check_in_to, 'check_in_to')
+    return filters
+
+
+def build_where(filters):
+    clauses = []
+    params = []
+    if 'status' in filters:
+        clauses.append("b.status = ANY(%s)")
+        params.append(filters['status'])
+    if 'room_type' in filters:
+        clauses.append("b.room_type = %s")
+        params.append(filters['room_type'])
+    if 'email' in filters:
+        clauses.append("lower(b.email) = %s")
+        params.append(filters['email'])
+    if 'check_in_from' in filters:
+        clauses.append("b.check_in >= %s")
+        params.append(filters['check_in_from'])
+    if 'check_in_to' in filters:
+        clauses.append("b.check_in <= %s")
+        params.append(filters['check_in_to'])
+    return clauses, params
+
+
+def encode_cursor(row, key='created_at'):
+    raw = json.dumps([row[key].isoformat(), row['id']]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(value, parse=datetime.fromisoformat):
+    try:
+        raw = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+        position, booking_id = json.loads(raw)
+        return parse(position), int(booking_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+def parse_page_size(value):
+    if value is None:
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError("limit must be a number")
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def build_page_query(filters, limit, after=None, before=None):
+    # keyset pagination on (created_at, id), newest first; page depth doesn't change the cost
+    clauses, params = build_where(filters)
+    if after is not None:
+        clauses.append("(b.created_at, b.id) < (%s, %s)")
+        params.extend(after)
+    elif before is not None:
+        clauses.append("(b.created_at, b.id) > (%s, %s)")
+        params.extend(before)
+
+    where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+    order = "ASC" if before is not None else "DESC"
+    sql = f"""
+        SELECT {BOOKING_COLUMNS}
+        FROM bookings b
+        {where}
+        ORDER BY b.created_at {order}, b.id {order}
+        LIMIT %s
+    """
+    return sql, params + [limit + 1]
+
+
+def page_results(rows, limit, after=None, before=None):
+    backwards = before is not None
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backwards:
+        rows.reverse()
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if backwards:
+            next_cursor = encode_cursor(rows[-1])
+            prev_cursor = encode_cursor(rows[0]) if has_more else None
+        else:
+            next_cursor = encode_cursor(rows[-1]) if has_more else None
+            prev_cursor = encode_cursor(rows[0]) if after is not None else None
+    return rows, next_cursor, prev_cursor
+
+
+def fetch_bookings_page(cursor, filters, limit, after=None, before=None):
+    sql, params = build_page_query(filters, limit, after=after, before=before)
+    cursor.execute(sql, params)
+    return page_results(cursor.fetchall(), limit, after=after, before=before)
@@ -0,0 +1,116 @@
+import copy
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class MemoryBackend:
+    # in-process stand-in for the shared backend, also used for tests and single-worker setups
+    shared = False
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return copy.deepcopy(value)
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (copy.deepcopy(value), expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def incr(self, key, ttl=None):
+        # a counter keeps the expiry set by its first increment
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (entry[1] is not None and entry[1] <= now):
+                entry = (0, now + ttl if ttl else None)
+            value = entry[0] + 1
+            self._entries[key] = (value, entry[1])
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            return value
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisBackend:
+    shared = True
+
+    def __init__(self, url, prefix='hotel:'):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            return None
+        return json.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, json.dumps(value, default=str), ex=int(ttl) if ttl else None)
+
+    def incr(self, key, ttl=None):
+        pipe = self.client.pipeline()
+        pipe.incr(self.prefix + key)
+        if ttl:
+            pipe.expire(self.prefix + key, int(ttl))
+        return pipe.execute()[0]
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*[self.prefix + key for key in keys])
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+    def __len__(self):
+        return sum(1 for _ in self.client.scan_iter(self.prefix + '*'))
+
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend(name, maxsize=10000):
+    # CACHE_URL (e.g. redis://localhost:6379/0) makes every worker share the same entries
+    with _backends_lock:
+        backend = _backends.get(name)
+        if backend is None:
+            url = os.getenv("CACHE_URL")
+            if url:
+                backend = RedisBackend(url, prefix=f"hotel:{name}:")
+            else:
+                backend = MemoryBackend(maxsize=maxsize)
+            _backends[name] = backend
+        return backend
@@ -0,0 +1,155 @@
+import os
+import threading
+import time
+
+from psycopg2.extras import execute_values
+
+from helper.data_version import get_data_version
+from helper.db_pool import db_connection
+from helper.query_profiler import ProfilingDictCursor
+from helper.statements import execute, register
+
+# counters are spread over shards (booking id modulo COUNTER_SHARDS) so concurrent
+# bookings don't all queue on the same row lock (tables come from migrations/0001)
+COUNTER_SHARDS = 16
+
+BOOKING_CREATED = register('booking_created', """
+    INSERT INTO booking_counters (status, shard, n) VALUES (%s, %s, 1)
+    ON CONFLICT (status, shard) DO UPDATE SET n = booking_counters.n + 1
+""")
+
+STATS_QUERY = register('dashboard_stats', """
+    SELECT
+        c.total_bookings, c.confirmed_bookings, c.pending_bookings,
+        s.active_guests, s.available_rooms, s.total_rooms,
+        s.reconciled_at, now() AS as_of
+    FROM dashboard_snapshot s
+    CROSS JOIN (
+        SELECT COALESCE(SUM(n), 0)::bigint AS total_bookings,
+               COALESCE(SUM(n) FILTER (WHERE status = 'confirmed'), 0)::bigint AS confirmed_bookings,
+               COALESCE(SUM(n) FILTER (WHERE status = 'pending'), 0)::bigint AS pending_bookings
+        FROM booking_counters
+    ) c
+    WHERE s.id = 1
+""")
+
+
+def record_booking_created(cursor, booking_id, status='pending'):
+    execute(cursor, 'booking_created', (status, booking_id % COUNTER_SHARDS))
+
+
+def record_status_change(cursor, booking_id, old_status, new_status):
+    record_status_changes(cursor, [(booking_id, old_status, new_status)])
+
+
+def counter_deltas(changes):
+    deltas = {}
+    for booking_id, old_status, new_status in changes:
+        if old_status == new_status:
+            continue
+        shard = booking_id % COUNTER_SHARDS
+        deltas[(old_status, shard)] = deltas.get((old_status, shard), 0) - 1
+        deltas[(new_status, shard)] = deltas.get((new_status, shard), 0) + 1
+    # always touch the rows in the same order so opposite transitions can't deadlock
+    return sorted((status, shard, n) for (status, shard), n in deltas.items() if n)
+
+
+def record_status_changes(cursor, changes):
+    rows = counter_deltas(changes)
+    if not rows:
+        return
+    execute_values(cursor, """
+        INSERT INTO booking_counters (status, shard, n) VALUES %s
+        ON CONFLICT (status, shard) DO UPDATE SET n = booking_counters.n + EXCLUDED.n
+    """, rows, page_size=len(rows))
+
+
+def reconcile(db):
+    with db.cursor() as cursor:
+        # the recount and the counters it is compared with come from one statement, so they
+        # share a snapshot; the drift between them is added to the counters as a delta, which
+        # stays right whatever writers commit meanwhile. The scan takes no locks, only counter
+        # rows that actually drifted are updated (in key order, like the writers)
+        cursor.execute("""
+            INSERT INTO booking_counters (status, shard, n)
+            SELECT status, shard, drift
+            FROM (
+                SELECT COALESCE(actual.status, c.status) AS status,
+                       COALESCE(actual.shard, c.shard) AS shard,
+                       COALESCE(actual.n, 0) - COALESCE(c.n, 0) AS drift
+                FROM (
+                    SELECT status, (id %% %s)::smallint AS shard, COUNT(*) AS n
+                    FROM bookings
+                    GROUP BY status, id %% %s
+                ) actual
+                FULL JOIN booking_counters c ON c.status = actual.status AND c.shard = actual.shard
+            ) d
+            WHERE drift <> 0
+            ORDER BY status, shard
+            ON CONFLICT (status, shard) DO UPDATE SET n = booking_counters.n + EXCLUDED.n
+        """, (COUNTER_SHARDS, COUNTER_SHARDS))
+        cursor.execute("""
+            INSERT INTO dashboard_snapshot (id, active_guests, available_rooms, total_rooms, reconciled_at)
+            SELECT 1,
+                (SELECT COUNT(DISTINCT email) FROM bookings
+                 WHERE status = 'confirmed'
+                 AND check_in <= CURRENT_DATE
+                 AND check_out >= CURRENT_DATE),
+                (SELECT COUNT(*) FROM rooms WHERE status = 'available'),
+                (SELECT COUNT(*) FROM rooms),
+                now()
+            ON CONFLICT (id) DO UPDATE SET
+                active_guests = EXCLUDED.active_guests,
+                available_rooms = EXCLUDED.available_rooms,
+                total_rooms = EXCLUDED.total_rooms,
+                reconciled_at = EXCLUDED.reconciled_at
+        """)
+    db.commit()
+
+
+def read_stats(cursor):
+    execute(cursor, 'dashboard_stats')
+    return cursor.fetchone()
+
+
+def reconcile_once():
+    with db_connection() as db, db.cursor() as cursor:
+        # only one worker reconciles at a time, the others skip this round
+        cursor.execute("SELECT pg_try_advisory_xact_lock(hashtext('dashboard_stats_reconcile'))")
+        if not cursor.fetchone()[0]:
+            return False
+        reconcile(db)
+    # the snapshot feeds the dashboard, so cached copies of it are stale now
+    get_data_version().bump()
+    return True
+
+
+_reconciler = None
+_reconciler_lock = threading.Lock()
+
+
+def _reconcile_loop(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            reconcile_once()
+        except Exception as e:
+            print(f"Dashboard stats reconciliation failed: {e}")
+
+
+def start_reconciler(interval=None):
+    global _reconciler
+    interval = interval or float(os.getenv("STATS_RECONCILE_SECONDS", 300))
+    with _reconciler_lock:
+        if _reconciler is None or not _reconciler.is_alive():
+            _reconciler = threading.Thread(target=_reconcile_loop, args=(interval,),
+                                           name="dashboard-stats-reconciler", daemon=True)
+            _reconciler.start()
+
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+    load_dotenv()
+    reconcile_once()
+    with db_connection() as db, db.cursor(cursor_factory=ProfilingDictCursor) as cursor:
+        print(read_stats(cursor))
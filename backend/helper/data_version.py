@@ -0,0 +1,96 @@
+import hashlib
+import os
+import threading
+import time
+import uuid
+from email.utils import formatdate
+
+from helper.cache_backend import get_backend
+
+
+class DataVersion:
+    # an opaque token that changes whenever the underlying data may have changed;
+    # responses built from that data carry it in their ETag
+    def __init__(self, backend, name, local_ttl=5.0):
+        self.backend = backend
+        self.name = name
+        # with the in-process backend other workers' writes can't reach us, so a token
+        # only lives local_ttl seconds; that bounds how stale a 304 can be
+        self.ttl = None if backend.shared else local_ttl
+        self._lock = threading.Lock()
+        self.not_modified = 0
+        self.full = 0
+        self.bumps = 0
+
+    def _new(self):
+        value = {"token": uuid.uuid4().hex[:16], "modified_at": time.time()}
+        self.backend.set(self.name, value, ttl=self.ttl)
+        return value
+
+    def current(self):
+        try:
+            value = self.backend.get(self.name)
+        except Exception as e:
+            print(f"Data version read failed: {e}")
+            # a fresh token can only cause a full response, never a wrong 304
+            return {"token": uuid.uuid4().hex[:16], "modified_at": time.time()}
+        return value if value is not None else self._new()
+
+    def bump(self):
+        with self._lock:
+            self.bumps += 1
+        try:
+            self._new()
+        except Exception as e:
+            print(f"Data version bump failed: {e}")
+
+    def validators(self, key, weak=False):
+        # read the version before running the query: a write that lands in between then only
+        # costs the next request a full response, it can't be hidden behind a 304
+        value = self.current()
+        digest = hashlib.sha1(f"{value['token']}:{key}".encode('utf-8')).hexdigest()[:20]
+        etag = f'{"W/" if weak else ""}"{digest}"'
+        headers = {
+            "ETag": etag,
+            "Last-Modified": formatdate(value['modified_at'], usegmt=True),
+            "Cache-Control": "private, no-cache",
+        }
+        return etag, headers
+
+    def is_fresh(self, if_none_match, etag):
+        # If-None-Match uses the weak comparison, so W/ prefixes are ignored on both sides
+        fresh = False
+        if if_none_match:
+            wanted = etag[2:] if etag.startswith('W/') else etag
+            for candidate in if_none_match.split(','):
+                candidate = candidate.strip()
+                if candidate.startswith('W/'):
+                    candidate = candidate[2:]
+                if candidate == '*' or candidate == wanted:
+                    fresh = True
+                    break
+        with self._lock:
+            if fresh:
+                self.not_modified += 1
+            else:
+                self.full += 1
+        return fresh
+
+    def stats(self):
+        with self._lock:
+            return {"not_modified": self.not_modified, "full": self.full, "bumps": self.bumps,
+                    "shared": self.backend.shared}
+
+
+_versions = {}
+_versions_lock = threading.Lock()
+
+
+def get_data_version(name='bookings'):
+    with _versions_lock:
+        version = _versions.get(name)
+        if version is None:
+            version = DataVersion(get_backend('versions'), name,
+                                  local_ttl=float(os.getenv("DATA_VERSION_LOCAL_TTL", 5)))
+            _versions[name] = version
+        return version
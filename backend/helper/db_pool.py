@@ -0,0 +1,265 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.pool import PoolError
+
+from helper.metrics import add_db_time
+from helper.query_profiler import ProfilingCursor
+from helper.statements import PreparingConnection
+
+
+class PoolTimeout(PoolError):
+    pass
+
+
+def database_connection(connection_factory=None):
+    try:
+        return psycopg2.connect(
+            host = os.getenv('DB_HOST','localhost'),
+            user = os.getenv('DB_USER'),
+            password = os.getenv('DB_PASSWORD'),
+            database = os.getenv('DB_NAME'),
+            connection_factory = connection_factory
+        )
+    except psycopg2.Error as e:
+        print(f"Database connection failed: {e}")
+        raise
+
+
+def pooled_connection():
+    # plain cursors on pooled connections are profiled too; handlers ask for ProfilingDictCursor.
+    # Pooled connections keep the statements prepared on them (helper/statements.py)
+    conn = database_connection(connection_factory=PreparingConnection)
+    conn.cursor_factory = ProfilingCursor
+    return conn
+
+
+class ConnectionPool:
+    def __init__(self, connect=database_connection, minconn=1, maxconn=10, timeout=5.0,
+                 max_lifetime=1800.0, check_on_borrow=True):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("Invalid pool size")
+        self.connect = connect
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.check_on_borrow = check_on_borrow
+
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._born = {}
+        self._in_use = 0
+        self._opening = 0
+        self._waiters = 0
+        self._closed = False
+
+        self._checkouts = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._discarded = 0
+
+        for _ in range(minconn):
+            self._idle.append(self._open())
+
+    def _open(self):
+        conn = self.connect()
+        self._born[id(conn)] = time.monotonic()
+        return conn
+
+    def _discard(self, conn):
+        self._born.pop(id(conn), None)
+        self._discarded += 1
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def _expired(self, conn):
+        if not self.max_lifetime:
+            return False
+        born = self._born.get(id(conn), 0)
+        return time.monotonic() - born > self.max_lifetime
+
+    def _healthy(self, conn):
+        if conn.closed:
+            return False
+        if not self.check_on_borrow:
+            return True
+        try:
+            # outside a transaction the check is one round trip instead of BEGIN, SELECT 1, ROLLBACK
+            conn.autocommit = True
+            with conn.cursor(cursor_factory=extensions.cursor) as cursor:
+                cursor.execute("SELECT 1")
+            conn.autocommit = False
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        start = time.monotonic()
+        deadline = start + self.timeout
+        with self._cond:
+            self._waiters += 1
+            try:
+                while True:
+                    if self._closed:
+                        raise PoolError("connection pool is closed")
+                    if self._idle:
+                        conn = self._idle.pop()
+                        self._in_use += 1
+                        break
+                    if self._in_use + self._opening + len(self._idle) < self.maxconn:
+                        self._opening += 1
+                        conn = None
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeout(f"Timed out after {self.timeout}s waiting for a database connection")
+                    self._cond.wait(remaining)
+            finally:
+                self._waiters -= 1
+
+        if conn is None:
+            try:
+                conn = self._open()
+            finally:
+                with self._cond:
+                    self._opening -= 1
+                    if conn is not None:
+                        self._in_use += 1
+                    else:
+                        self._cond.notify()
+        elif self._expired(conn) or not self._healthy(conn):
+            with self._cond:
+                self._discard(conn)
+                self._in_use -= 1
+                self._opening += 1
+            conn = None
+            try:
+                conn = self._open()
+            finally:
+                with self._cond:
+                    self._opening -= 1
+                    if conn is not None:
+                        self._in_use += 1
+                    else:
+                        self._cond.notify()
+
+        waited = time.monotonic() - start
+        with self._cond:
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return conn
+
+    def putconn(self, conn, discard=False):
+        if not discard and not conn.closed:
+            try:
+                if conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                discard = True
+        with self._cond:
+            self._in_use -= 1
+            if discard or conn.closed or self._closed or self._expired(conn):
+                self._discard(conn)
+            else:
+                self._idle.append(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, autocommit=False):
+        # autocommit saves the BEGIN and COMMIT round trips of a single-statement read or write
+        conn = self.getconn()
+        borrowed = time.perf_counter()
+        discard = False
+        try:
+            if autocommit:
+                conn.autocommit = True
+            yield conn
+        except psycopg2.InterfaceError:
+            discard = True
+            raise
+        except psycopg2.OperationalError:
+            discard = conn.closed != 0
+            raise
+        finally:
+            if autocommit and not conn.closed and not discard:
+                try:
+                    conn.autocommit = False
+                except psycopg2.Error:
+                    discard = True
+            self.putconn(conn, discard=discard)
+            add_db_time(time.perf_counter() - borrowed)
+
+    def closeall(self):
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                self._discard(self._idle.pop())
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self._in_use + len(self._idle),
+                "min_size": self.minconn,
+                "max_size": self.maxconn,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "waiters": self._waiters,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "discarded": self._discarded,
+                "wait_avg_ms": round(self._wait_total / self._checkouts * 1000, 3) if self._checkouts else 0.0,
+                "wait_max_ms": round(self._wait_max * 1000, 3),
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_pool_pid = None
+
+
+def get_pool():
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is not None and _pool_pid == pid:
+        return _pool
+    with _pool_lock:
+        if _pool is None or _pool_pid != pid:
+            # a pool inherited across fork shares sockets with the parent, start fresh
+            _pool = ConnectionPool(
+                connect=pooled_connection,
+                minconn=int(os.getenv("DB_POOL_MIN", 1)),
+                maxconn=int(os.getenv("DB_POOL_MAX", 10)),
+                timeout=float(os.getenv("DB_POOL_TIMEOUT", 5)),
+                max_lifetime=float(os.getenv("DB_POOL_MAX_LIFETIME", 1800)),
+                check_on_borrow=os.getenv("DB_POOL_CHECK_ON_BORROW", "true").lower() in ("1", "true", "yes"),
+            )
+            _pool_pid = pid
+    return _pool
+
+
+def db_connection(autocommit=False):
+    return get_pool().connection(autocommit=autocommit)
+
+
+def pool_stats():
+    if _pool is None or _pool_pid != os.getpid():
+        return None
+    return _pool.stats()
+
+
+def close_pool():
+    # only this process's pool; one inherited across fork belongs to the parent
+    if _pool is not None and _pool_pid == os.getpid():
+        _pool.closeall()
@@ -0,0 +1,247 @@
+import asyncio
+import os
+import queue
+import select
+import threading
+import time
+import uuid
+from collections import deque
+
+from psycopg2 import extensions
+
+from helper.db_pool import database_connection, db_connection
+from helper.json_encoder import dumps, loads
+
+CHANNEL = 'booking_events'
+
+
+def booking_created_data(booking, fields, check_in, check_out):
+    # shaped like a row of GET /admin/bookings so dashboards can insert it as is
+    return {"id": booking['id'], "guest_name": f"{fields['first_name']} {fields['last_name']}",
+            "email": fields['email'], "phone": fields['phone'], "room_type": fields['room_type'],
+            "people": fields['people'], "check_in": check_in, "duration": (check_out - check_in).days,
+            "check_out": check_out, "status": 'pending', "created_at": booking.get('created_at'),
+            "room_id": booking['room_id']}
+
+
+def status_changed_data(row):
+    return {"id": row['id'], "status": row['status'], "old_status": row['old_status']}
+
+
+def format_event(event):
+    # one Server-Sent Events frame
+    return (f"id: {event['id']}\nevent: {event['event']}\ndata: ".encode('utf-8')
+            + dumps(event['data']) + b"\n\n")
+
+
+class Subscription:
+    # the broker pushes from whichever thread published; a subscriber that falls queue_size
+    # events behind is cut off and reconnects with Last-Event-ID instead of stalling the rest
+    def __init__(self, queue_size):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+    def push(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class AsyncSubscription(Subscription):
+    def __init__(self, queue_size):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    def push(self, event):
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # the loop is gone, the stream's finally unsubscribes us
+            self.overflowed = True
+
+    async def get(self, timeout):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class EventBroker:
+    def __init__(self, notify=False, history=1000, queue_size=256, max_subscribers=100):
+        # ids are "<epoch>-<seq>"; a Last-Event-ID from another process or an older one has a
+        # different epoch, and that client is told to resync instead of getting a partial replay
+        self.epoch = uuid.uuid4().hex[:8]
+        self.notify = notify
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._seq = 0
+        self._history = deque(maxlen=history)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._listener = None
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.rejected = 0
+
+    def deliver(self, event_type, data):
+        # local fan-out; in notify mode this runs on the listener thread for every worker's events
+        with self._lock:
+            self._seq += 1
+            event = {"id": f"{self.epoch}-{self._seq}", "event": event_type, "data": data}
+            self._history.append((self._seq, event))
+            subscribers = list(self._subscribers)
+            self.delivered += 1
+        for subscription in subscribers:
+            subscription.push(event)
+
+    def publish(self, event_type, data):
+        # call after the write has committed
+        with self._lock:
+            self.published += 1
+        if not self.notify:
+            self.deliver(event_type, data)
+            return
+        payload = dumps({"event": event_type, "data": data}).decode('utf-8')
+        try:
+            with db_connection() as db, db.cursor() as cursor:
+                cursor.execute("SELECT pg_notify(%s, %s)", (CHANNEL, payload))
+                db.commit()
+        except Exception as e:
+            print(f"Publishing {event_type} event failed: {e}")
+
+    def _backlog(self, last_event_id):
+        if not last_event_id:
+            return []
+        epoch, _, seq = last_event_id.partition('-')
+        oldest = self._history[0][0] if self._history else self._seq + 1
+        if epoch != self.epoch or not seq.isdigit() or int(seq) + 1 < oldest:
+            return [{"id": f"{self.epoch}-{self._seq}", "event": "resync", "data": {}}]
+        return [event for n, event in self._history if n > int(seq)]
+
+    def subscribe(self, subscription, last_event_id=None):
+        # registering and reading the backlog under one lock means nothing is missed or sent twice
+        if self.notify:
+            self._start_listener()
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                self.rejected += 1
+                return None
+            self._subscribers.add(subscription)
+            return self._backlog(last_event_id)
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+            if subscription.overflowed:
+                self.dropped += 1
+
+    def _start_listener(self):
+        with self._lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name="booking-events-listener", daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        # a dedicated connection, the pooled ones are never left idle in LISTEN
+        reconnecting = False
+        while True:
+            conn = None
+            try:
+                conn = database_connection()
+                conn.set_isolation_level(extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {CHANNEL}")
+                if reconnecting:
+                    # notifications sent while we were disconnected are gone
+                    self.deliver('resync', {})
+                reconnecting = True
+                while True:
+                    if select.select([conn], [], [], 5) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        message = loads(conn.notifies.pop(0).payload)
+                        self.deliver(message['event'], message['data'])
+            except Exception as e:
+                print(f"Booking events listener failed: {e}")
+                time.sleep(1)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+    def stats(self):
+        with self._lock:
+            return {"subscribers": len(self._subscribers), "published": self.published,
+                    "delivered": self.delivered, "dropped": self.dropped, "rejected": self.rejected,
+                    "notify": self.notify,
+                    "listening": self._listener is not None and self._listener.is_alive()}
+
+
+def stream(broker, subscription, backlog, until, heartbeat=15):
+    # ends when the subscriber overflows or its access token expires; EventSource then
+    # reconnects with Last-Event-ID (and a refreshed cookie)
+    try:
+        yield b"retry: 3000\n\n"
+        for event in backlog:
+            yield format_event(event)
+        while not subscription.overflowed and time.time() < until:
+            event = subscription.get(min(heartbeat, max(0.1, until - time.time())))
+            yield format_event(event) if event else b": ping\n\n"
+    finally:
+        broker.unsubscribe(subscription)
+
+
+async def stream_async(broker, subscription, backlog, until, heartbeat=15):
+    try:
+        yield b"retry: 3000\n\n"
+        for event in backlog:
+            yield format_event(event)
+        while not subscription.overflowed and time.time() < until:
+            event = await subscription.get(min(heartbeat, max(0.1, until - time.time())))
+            yield format_event(event) if event else b": ping\n\n"
+    finally:
+        broker.unsubscribe(subscription)
+
+
+_broker = None
+_broker_pid = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    # per process: a broker inherited through fork has no listener thread and no subscribers
+    global _broker, _broker_pid
+    pid = os.getpid()
+    if _broker is None or _broker_pid != pid:
+        with _broker_lock:
+            if _broker is None or _broker_pid != pid:
+                _broker = EventBroker(
+                    notify=os.getenv("EVENTS_NOTIFY", "false").lower() in ("1", "true", "yes"),
+                    history=int(os.getenv("EVENTS_HISTORY", 1000)),
+                    queue_size=int(os.getenv("EVENTS_QUEUE_SIZE", 256)),
+                    max_subscribers=int(os.getenv("EVENTS_MAX_SUBSCRIBERS", 100)))
+                _broker_pid = pid
+    return _broker
+
+
+def publish_event(event_type, data):
+    get_broker().publish(event_type, data)
+
+
+def events_stats():
+    return get_broker().stats()
@@ -1,6 +1,89 @@
 import jwt
 import datetime
 import os
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+_keys = None
+_keys_lock = threading.Lock()
+
+
+def load_keys():
+    global _keys
+    if _keys is None:
+        with _keys_lock:
+            if _keys is None:
+                _keys = {
+                    'access': os.getenv("JWT_KEY"),
+                    'refresh': os.getenv("JWT_REFRESH_KEY"),
+                }
+    return _keys
+
+
+def reload_keys():
+    global _keys
+    with _keys_lock:
+        _keys = None
+    get_token_cache().clear()
+    return load_keys()
+
+
+class TokenCache:
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            payload, expires_at = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(payload)
+
+    def put(self, key, payload, expires_at):
+        with self._lock:
+            self._entries[key] = (payload, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._entries), "maxsize": self.maxsize,
+                    "hits": self.hits, "misses": self.misses}
+
+
+_token_cache = None
+_token_cache_lock = threading.Lock()
+
+
+def get_token_cache():
+    # built on first use, after .env is loaded, so TOKEN_CACHE_SIZE set there applies
+    global _token_cache
+    if _token_cache is None:
+        with _token_cache_lock:
+            if _token_cache is None:
+                _token_cache = TokenCache(maxsize=int(os.getenv("TOKEN_CACHE_SIZE", 10000)))
+    return _token_cache
+
 
 def generate_access_token(email,role='user'):
     payload = {
@@ -9,7 +92,7 @@ def generate_access_token(email,role='user'):
         'exp': datetime.datetime.utcnow() + datetime.timedelta(minutes=int(os.getenv("ACCESS_TOKEN_EXPIRES_MINUTES", 15))),
         'iat': datetime.datetime.utcnow()
     }
-    token = jwt.encode(payload,os.getenv("JWT_KEY"),algorithm='HS256')
+    token = jwt.encode(payload,load_keys()['access'],algorithm='HS256')
     return token
 
 
@@ -20,16 +103,30 @@ def generate_refresh_token(email,role='user'):
         'exp': datetime.datetime.utcnow() + datetime.timedelta(days=int(os.getenv("REFRESH_TOKEN_EXPIRES_DAYS", 7))),
         'iat': datetime.datetime.utcnow()
     }
-    token = jwt.encode(payload,os.getenv("JWT_REFRESH_KEY"),algorithm='HS256')
+    token = jwt.encode(payload,load_keys()['refresh'],algorithm='HS256')
     return token
 
 
 def decode_token(token,is_refresh=False):
-    secret = os.getenv("JWT_REFRESH_KEY")if is_refresh else os.getenv("JWT_KEY")
+    kind = 'refresh' if is_refresh else 'access'
+    key = kind + ':' + hashlib.sha256(token.encode('utf-8')).hexdigest()
+    token_cache = get_token_cache()
+    payload = token_cache.get(key)
+    if payload is not None:
+        return payload
+
+    secret = load_keys()[kind]
     try:
         payload = jwt.decode(token, secret, algorithms=['HS256'])
-        return payload
     except jwt.ExpiredSignatureError:
         return None
     except jwt.InvalidTokenError:
-        return None
\ No newline at end of file
+        return None
+
+    if 'exp' in payload:
+        token_cache.put(key, dict(payload), payload['exp'])
+    return payload
+
+
+def token_cache_stats():
+    return get_token_cache().stats()
@@ -0,0 +1,115 @@
+import os
+import threading
+
+from helper.bookings_query import BOOKING_COLUMNS, encode_cursor
+from helper.cache_backend import get_backend
+from helper.json_encoder import dumps
+from helper.statements import execute, register
+
+# a guest's own bookings, latest check-in first; keyset pagination on (check_in, id) walks
+# bookings_user_email_check_in_idx (migrations/0008), so deep pages cost the same as the first
+GUEST_BOOKINGS = register('guest_bookings', f"""
+    SELECT {BOOKING_COLUMNS}
+    FROM bookings b
+    WHERE b.user_email = %s
+    ORDER BY b.check_in DESC, b.id DESC
+    LIMIT %s
+""")
+
+GUEST_BOOKINGS_AFTER = register('guest_bookings_after', f"""
+    SELECT {BOOKING_COLUMNS}
+    FROM bookings b
+    WHERE b.user_email = %s
+    AND (b.check_in, b.id) < (%s, %s)
+    ORDER BY b.check_in DESC, b.id DESC
+    LIMIT %s
+""")
+
+
+def guest_page_query(email, limit, after=None):
+    # (statement name, SQL, params); one extra row tells whether there is a next page
+    if after is None:
+        return 'guest_bookings', GUEST_BOOKINGS, (email, limit + 1)
+    return 'guest_bookings_after', GUEST_BOOKINGS_AFTER, (email, after[0], after[1], limit + 1)
+
+
+def page_body(rows, limit):
+    # the rendered JSON is what gets cached, so a hit skips the encoding too
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1], 'check_in') if has_more else None
+    return dumps({"bookings": rows, "next_cursor": next_cursor, "limit": limit}).decode('utf-8')
+
+
+def fetch_guest_bookings(cursor, email, limit, after=None):
+    name, _, params = guest_page_query(email, limit, after=after)
+    execute(cursor, name, params)
+    return page_body(cursor.fetchall(), limit)
+
+
+class GuestBookingsCache:
+    # one entry per guest holding the pages they looked at, so a booking or status change
+    # drops all of them with a single delete
+    def __init__(self, backend, ttl=30, max_pages=10):
+        self.backend = backend
+        self.ttl = ttl
+        self.max_pages = max_pages
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, email, page):
+        try:
+            pages = self.backend.get(email) or {}
+        except Exception as e:
+            print(f"Guest bookings cache read failed: {e}")
+            pages = {}
+        body = pages.get(page)
+        with self._lock:
+            if body is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return body
+
+    def set(self, email, page, body):
+        try:
+            pages = self.backend.get(email) or {}
+            if page not in pages and len(pages) >= self.max_pages:
+                pages.pop(next(iter(pages)))
+            pages[page] = body
+            self.backend.set(email, pages, ttl=self.ttl)
+        except Exception as e:
+            print(f"Guest bookings cache write failed: {e}")
+
+    def invalidate(self, *emails):
+        emails = [email for email in set(emails) if email]
+        if not emails:
+            return
+        with self._lock:
+            self.invalidations += len(emails)
+        try:
+            self.backend.delete(*emails)
+        except Exception as e:
+            print(f"Guest bookings cache invalidation failed: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "invalidations": self.invalidations,
+                    "ttl": self.ttl, "shared": self.backend.shared}
+
+
+_guest_bookings_cache = None
+_guest_bookings_cache_lock = threading.Lock()
+
+
+def get_guest_bookings_cache():
+    global _guest_bookings_cache
+    if _guest_bookings_cache is None:
+        with _guest_bookings_cache_lock:
+            if _guest_bookings_cache is None:
+                backend = get_backend('guest_bookings', maxsize=int(os.getenv("GUEST_BOOKINGS_CACHE_SIZE", 10000)))
+                _guest_bookings_cache = GuestBookingsCache(
+                    backend, ttl=float(os.getenv("GUEST_BOOKINGS_CACHE_TTL", 30)))
+    return _guest_bookings_cache
@@ -0,0 +1,196 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+import bcrypt
+
+from helper.metrics import get_metrics
+
+
+class HashingBusy(Exception):
+    pass
+
+
+def _hashpw(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _checkpw(password, hashed):
+    if isinstance(hashed, str):
+        hashed = hashed.encode('utf-8')
+    return bcrypt.checkpw(password.encode('utf-8'), hashed)
+
+
+def _mp_context():
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+class HashingExecutor:
+    def __init__(self, workers=None, max_queue=None, rounds=12, timeout=10.0):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = self.workers * 4 if max_queue is None else max_queue
+        self.rounds = rounds
+        self.timeout = timeout
+
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._pending = 0
+        self._submitted = 0
+        self._rejected = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+        self._completed = 0
+
+    def _get_executor(self):
+        pid = os.getpid()
+        if self._executor is None or self._pid != pid:
+            # forked workers would inherit the caller's threads, locks and sockets (the DB pool,
+            # the reconciler); the forkserver hands out clean processes instead
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=_mp_context())
+            self._pid = pid
+        return self._executor
+
+    def _submit(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                self._rejected += 1
+                raise HashingBusy("Password hashing queue is full")
+            self._pending += 1
+            self._submitted += 1
+            executor = self._get_executor()
+        start = time.perf_counter()
+        try:
+            future = executor.submit(fn, *args)
+        except Exception as e:
+            with self._lock:
+                self._pending -= 1
+            if isinstance(e, BrokenProcessPool):
+                self._discard(executor)
+                raise HashingBusy("Password hashing workers are restarting")
+            raise
+        # a job that timed out keeps its worker busy until it finishes, so it only leaves
+        # the queue count from here, not when the caller gives up on it
+        future.add_done_callback(lambda done: self._finish(start, executor, done))
+        return future
+
+    def _discard(self, executor):
+        # a worker died (OOM kill, crash) and the pool refuses all work from then on; the next
+        # call builds a fresh one
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+        print("Password hashing pool broke; starting a new one")
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _finish(self, start, executor, future):
+        if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+            self._discard(executor)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._pending -= 1
+            self._completed += 1
+            self._latency_total += elapsed
+            self._latency_max = max(self._latency_max, elapsed)
+        get_metrics().observe_hashing(elapsed)
+
+    def _run(self, fn, *args):
+        future = self._submit(fn, *args)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise HashingBusy("Password hashing timed out")
+        except BrokenProcessPool:
+            raise HashingBusy("Password hashing workers are restarting")
+
+    async def _run_async(self, fn, *args):
+        # same queue and limits as _run, but the event loop keeps serving while bcrypt runs
+        future = asyncio.wrap_future(self._submit(fn, *args))
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            raise HashingBusy("Password hashing timed out")
+        except BrokenProcessPool:
+            raise HashingBusy("Password hashing workers are restarting")
+
+    def hash_password(self, password):
+        return self._run(_hashpw, password, self.rounds)
+
+    def check_password(self, password, hashed):
+        return self._run(_checkpw, password, hashed)
+
+    async def hash_password_async(self, password):
+        return await self._run_async(_hashpw, password, self.rounds)
+
+    async def check_password_async(self, password, hashed):
+        return await self._run_async(_checkpw, password, hashed)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "rounds": self.rounds,
+                "max_queue": self.max_queue,
+                "in_flight": self._pending,
+                "queue_depth": max(0, self._pending - self.workers),
+                "submitted": self._submitted,
+                "rejected": self._rejected,
+                "latency_avg_ms": round(self._latency_total / self._completed * 1000, 3) if self._completed else 0.0,
+                "latency_max_ms": round(self._latency_max * 1000, 3),
+            }
+
+
+_hasher = None
+_hasher_lock = threading.Lock()
+
+
+def get_hasher():
+    global _hasher
+    if _hasher is None:
+        with _hasher_lock:
+            if _hasher is None:
+                max_queue = os.getenv("HASH_MAX_QUEUE")
+                _hasher = HashingExecutor(
+                    workers=int(os.getenv("HASH_WORKERS", 0)) or None,
+                    max_queue=int(max_queue) if max_queue else None,
+                    rounds=int(os.getenv("BCRYPT_ROUNDS", 12)),
+                    timeout=float(os.getenv("HASH_TIMEOUT", 10)),
+                )
+    return _hasher
+
+
+def hash_password(password):
+    return get_hasher().hash_password(password)
+
+
+def check_password(password, hashed):
+    return get_hasher().check_password(password, hashed)
+
+
+async def hash_password_async(password):
+    return await get_hasher().hash_password_async(password)
+
+
+async def check_password_async(password, hashed):
+    return await get_hasher().check_password_async(password, hashed)
+
+
+def hashing_stats():
+    return get_hasher().stats()
+
+
+def shutdown_hasher():
+    if _hasher is not None:
+        _hasher.shutdown()
@@ -0,0 +1,289 @@
+import contextvars
+import fcntl
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# seconds the current request has held pooled DB connections; None outside a request
+_request_db_time = contextvars.ContextVar('request_db_time', default=None)
+
+
+def start_request():
+    holder = [0.0]
+    _request_db_time.set(holder)
+    return holder
+
+
+def add_db_time(seconds):
+    holder = _request_db_time.get()
+    if holder is not None:
+        holder[0] += seconds
+
+
+def _observe(histogram, value):
+    # [bucket counts..., +Inf count, sum]; plain lists so snapshots are JSON as they are
+    histogram[bisect_left(LATENCY_BUCKETS, value)] += 1
+    histogram[-1] += value
+
+
+def _new_histogram():
+    return [0] * (len(LATENCY_BUCKETS) + 1) + [0.0]
+
+
+class Metrics:
+    def __init__(self, directory=None, flush_seconds=5.0):
+        self.directory = directory
+        self.flush_seconds = flush_seconds
+        self._lock = threading.Lock()
+        self._flusher = None
+        self._pid = os.getpid()
+        self.requests = {}
+        self.latency = {}
+        self.db_time = {}
+        self.hashing = _new_histogram()
+
+    def _reset_after_fork(self):
+        # a worker starts from zero; whatever the master counted stays the master's
+        self._pid = os.getpid()
+        self._flusher = None
+        self.requests, self.latency, self.db_time = {}, {}, {}
+        self.hashing = _new_histogram()
+
+    def observe_request(self, method, route, status, seconds, db_seconds):
+        key = f"{method} {route}"
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset_after_fork()
+            status_key = f"{key} {status}"
+            self.requests[status_key] = self.requests.get(status_key, 0) + 1
+            _observe(self.latency.setdefault(key, _new_histogram()), seconds)
+            if db_seconds:
+                _observe(self.db_time.setdefault(key, _new_histogram()), db_seconds)
+            if self.directory and self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name="metrics-flusher", daemon=True)
+                self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_seconds)
+            self.flush()
+
+    def observe_hashing(self, seconds):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset_after_fork()
+            _observe(self.hashing, seconds)
+
+    def snapshot(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset_after_fork()
+            return {"requests": dict(self.requests),
+                    "latency": {k: list(v) for k, v in self.latency.items()},
+                    "db_time": {k: list(v) for k, v in self.db_time.items()},
+                    "hashing": list(self.hashing)}
+
+    def flush(self):
+        # each worker leaves its counters in METRICS_DIR so any worker can answer a scrape
+        if not self.directory:
+            return
+        path = os.path.join(self.directory, f"{os.getpid()}.json")
+        try:
+            with open(path + '.tmp', 'w') as f:
+                json.dump({"counters": self.snapshot(), "gauges": gauges()}, f)
+            os.replace(path + '.tmp', path)
+        except OSError as e:
+            print(f"Metrics flush failed: {e}")
+
+    def collect(self):
+        # counters of every worker (live or retired) add up; gauges only count live workers
+        if not self.directory:
+            return self.snapshot(), gauges()
+        self.flush()
+        counters, live_gauges = [], {}
+        with _directory_lock(self.directory, fcntl.LOCK_SH):
+            for name in os.listdir(self.directory):
+                if not name.endswith('.json'):
+                    continue
+                data = _read(os.path.join(self.directory, name))
+                if data is None:
+                    continue
+                counters.append(data['counters'])
+                for gauge, value in data['gauges'].items():
+                    live_gauges[gauge] = live_gauges.get(gauge, 0) + value
+        return merge(counters), live_gauges
+
+
+@contextmanager
+def _directory_lock(directory, mode):
+    with open(os.path.join(directory, '.lock'), 'a') as lock:
+        fcntl.flock(lock, mode)
+        yield
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def retire_worker(directory, pid):
+    # run by the gunicorn master once a worker is gone (recycled, crashed or killed): its last
+    # flush is folded into _retired.json so the summed counters never go backwards
+    path = os.path.join(directory, f"{pid}.json")
+    retired = os.path.join(directory, '_retired.json')
+    with _directory_lock(directory, fcntl.LOCK_EX):
+        data = _read(path)
+        if data is None:
+            return
+        previous = _read(retired) or {"counters": {}}
+        with open(retired + '.tmp', 'w') as f:
+            json.dump({"counters": merge([previous['counters'], data['counters']]), "gauges": {}}, f)
+        os.replace(retired + '.tmp', retired)
+        os.remove(path)
+
+
+def merge(snapshots):
+    merged = {"requests": {}, "latency": {}, "db_time": {}, "hashing": _new_histogram()}
+    for snapshot in snapshots:
+        for key, count in snapshot.get('requests', {}).items():
+            merged['requests'][key] = merged['requests'].get(key, 0) + count
+        for family in ('latency', 'db_time'):
+            for key, histogram in snapshot.get(family, {}).items():
+                target = merged[family].setdefault(key, _new_histogram())
+                for i, value in enumerate(histogram):
+                    target[i] += value
+        for i, value in enumerate(snapshot.get('hashing', [])):
+            merged['hashing'][i] += value
+    return merged
+
+
+# extra gauge providers, e.g. the asyncpg pool in ASGI mode
+_gauge_sources = []
+
+
+def add_gauge_source(source):
+    _gauge_sources.append(source)
+
+
+def gauges():
+    from helper.db_pool import pool_stats
+    from helper.hashing import hashing_stats
+
+    values = {}
+    pool = pool_stats()
+    if pool:
+        for field in ('size', 'in_use', 'idle', 'waiters', 'timeouts'):
+            values[f"db_pool_{field}"] = pool[field]
+    hashing = hashing_stats()
+    values["hashing_in_flight"] = hashing['in_flight']
+    values["hashing_rejected"] = hashing['rejected']
+    for source in _gauge_sources:
+        values.update(source())
+    return values
+
+
+def _labels(**labels):
+    escaped = (f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+               for k, v in labels.items())
+    return '{' + ','.join(escaped) + '}'
+
+
+def _histogram_lines(name, histogram, **labels):
+    lines = []
+    cumulative = 0
+    for bound, count in zip(LATENCY_BUCKETS, histogram):
+        cumulative += count
+        lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {cumulative}")
+    cumulative += histogram[len(LATENCY_BUCKETS)]
+    lines.append(f"{name}_bucket{_labels(**labels, le='+Inf')} {cumulative}")
+    lines.append(f"{name}_sum{_labels(**labels) if labels else ''} {histogram[-1]}")
+    lines.append(f"{name}_count{_labels(**labels) if labels else ''} {cumulative}")
+    return lines
+
+
+GAUGE_HELP = {
+    "db_pool_size": "Open pooled database connections.",
+    "db_pool_in_use": "Pooled database connections checked out.",
+    "db_pool_idle": "Idle pooled database connections.",
+    "db_pool_waiters": "Requests waiting for a pooled database connection.",
+    "db_pool_timeouts": "Pool checkouts that timed out since the workers started.",
+    "async_db_pool_size": "Open asyncpg connections.",
+    "async_db_pool_in_use": "asyncpg connections checked out.",
+    "async_db_pool_idle": "Idle asyncpg connections.",
+    "async_db_pool_timeouts": "asyncpg acquires that timed out since the workers started.",
+    "hashing_in_flight": "Password hashing jobs running or queued.",
+    "hashing_rejected": "Password hashing jobs turned away since the workers started.",
+}
+
+
+def render(counters, live_gauges):
+    lines = ["# HELP hotel_http_requests_total Requests by method, route and status.",
+             "# TYPE hotel_http_requests_total counter"]
+    for key, count in sorted(counters['requests'].items()):
+        method, route, status = key.split(' ')
+        lines.append(f"hotel_http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+
+    for family, name, help_text in (
+            ('latency', 'hotel_http_request_duration_seconds', "Time to build the response."),
+            ('db_time', 'hotel_db_connection_seconds', "Time a request held pooled database connections.")):
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for key, histogram in sorted(counters[family].items()):
+            method, route = key.split(' ')
+            lines += _histogram_lines(name, histogram, method=method, route=route)
+
+    lines += ["# HELP hotel_password_hash_seconds bcrypt hash/check time including the queue wait.",
+              "# TYPE hotel_password_hash_seconds histogram"]
+    lines += _histogram_lines('hotel_password_hash_seconds', counters['hashing'])
+
+    for gauge, value in sorted(live_gauges.items()):
+        lines += [f"# HELP hotel_{gauge} {GAUGE_HELP.get(gauge, '')}", f"# TYPE hotel_{gauge} gauge",
+                  f"hotel_{gauge} {value}"]
+    return '\n'.join(lines) + '\n'
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics():
+    global _metrics
+    if _metrics is None:
+        with _metrics_lock:
+            if _metrics is None:
+                _metrics = Metrics(directory=os.getenv("METRICS_DIR") or None,
+                                   flush_seconds=float(os.getenv("METRICS_FLUSH_SECONDS", 5)))
+    return _metrics
+
+
+def metrics_text():
+    return render(*get_metrics().collect())
+
+
+def init_metrics(app):
+    # Flask request hooks; the route label is the URL rule, so ids don't blow up the series count
+    from flask import g, request
+
+    @app.before_request
+    def _start_timer():
+        # warm_up runs in the pre-fork master, which must not count requests or start the flusher
+        if request.environ.get('hotel.warm_up'):
+            return
+        g.metrics_started = time.perf_counter()
+        g.metrics_db_time = start_request()
+
+    @app.after_request
+    def _record(response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            get_metrics().observe_request(request.method, route, response.status_code,
+                                          time.perf_counter() - started, g.pop('metrics_db_time')[0])
+        return response
@@ -0,0 +1,149 @@
+import hashlib
+import os
+import re
+import sys
+
+from helper.db_pool import database_connection
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+MIGRATION_FILE = re.compile(r'^(\d{4})_([a-z0-9_]+)\.sql$')
+NO_TRANSACTION = '-- migrate: no-transaction'
+
+
+class MigrationError(Exception):
+    pass
+
+
+class Migration:
+    def __init__(self, version, name, path):
+        self.version = version
+        self.name = name
+        self.path = path
+        with open(path, encoding='utf-8') as f:
+            self.sql = f.read()
+        self.checksum = hashlib.sha256(self.sql.encode('utf-8')).hexdigest()
+        self.transactional = not self.sql.lstrip().startswith(NO_TRANSACTION)
+
+    def statements(self):
+        # only needed for no-transaction files, which hold plain DDL without functions or DO blocks
+        lines = [line for line in self.sql.splitlines() if not line.strip().startswith('--')]
+        for statement in '\n'.join(lines).split(';'):
+            statement = statement.strip()
+            if statement:
+                yield statement
+
+
+def discover(directory=MIGRATIONS_DIR):
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        match = MIGRATION_FILE.match(filename)
+        if match:
+            migrations.append(Migration(match.group(1), match.group(2), os.path.join(directory, filename)))
+    versions = [m.version for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise MigrationError("Duplicate migration version in " + directory)
+    return migrations
+
+
+def _ensure_table(db):
+    with db.cursor() as cursor:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version text PRIMARY KEY,
+                name text NOT NULL,
+                checksum text NOT NULL,
+                applied_at timestamptz NOT NULL DEFAULT now()
+            )
+        """)
+    db.commit()
+
+
+def applied_migrations(db):
+    _ensure_table(db)
+    with db.cursor() as cursor:
+        cursor.execute("SELECT version, checksum FROM schema_migrations")
+        return dict(cursor.fetchall())
+
+
+def pending_migrations(db, directory=MIGRATIONS_DIR):
+    applied = applied_migrations(db)
+    pending = []
+    for migration in discover(directory):
+        if migration.version in applied:
+            if applied[migration.version] != migration.checksum:
+                raise MigrationError(f"Migration {migration.version}_{migration.name} was edited after it was applied")
+            continue
+        pending.append(migration)
+    return pending
+
+
+def _apply(db, migration):
+    if migration.transactional:
+        with db.cursor() as cursor:
+            cursor.execute(migration.sql)
+            cursor.execute("INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                           (migration.version, migration.name, migration.checksum))
+        db.commit()
+        return
+
+    db.autocommit = True
+    try:
+        with db.cursor() as cursor:
+            for statement in migration.statements():
+                cursor.execute(statement)
+            cursor.execute("INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                           (migration.version, migration.name, migration.checksum))
+    finally:
+        db.autocommit = False
+
+
+def migrate(db, directory=MIGRATIONS_DIR, log=print):
+    with db.cursor() as cursor:
+        # session lock so two deploys can't run the same migration side by side
+        cursor.execute("SELECT pg_advisory_lock(hashtext('schema_migrations'))")
+    db.commit()
+    try:
+        applied = []
+        pending = pending_migrations(db, directory)
+        # end the read transaction; no-transaction files need the connection idle to switch to autocommit
+        db.commit()
+        for migration in pending:
+            log(f"Applying {migration.version}_{migration.name}")
+            try:
+                _apply(db, migration)
+            except Exception:
+                db.rollback()
+                raise
+            applied.append(migration)
+        return applied
+    finally:
+        with db.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(hashtext('schema_migrations'))")
+        db.commit()
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    command = argv[0] if argv else 'up'
+    db = database_connection()
+    try:
+        if command == 'status':
+            applied = applied_migrations(db)
+            for migration in discover():
+                state = 'applied' if migration.version in applied else 'pending'
+                print(f"{migration.version}_{migration.name}: {state}")
+        elif command == 'up':
+            applied = migrate(db)
+            print(f"{len(applied)} migration(s) applied")
+        else:
+            print("usage: python -m helper.migrate [up|status]")
+            return 2
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+    load_dotenv()
+    sys.exit(main())
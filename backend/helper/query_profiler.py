@@ -0,0 +1,280 @@
+import math
+import os
+import queue
+import random
+import re
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+
+from psycopg2 import extensions
+from psycopg2.extras import RealDictCursor
+
+_COMMENTS = re.compile(r'--[^\n]*|/\*.*?\*/', re.S)
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|%\(\w+\)s|%s|\$\d+")
+_LISTS = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_ROWS = re.compile(r'\(\?, \.\.\.\)(?:\s*,\s*\(\?, \.\.\.\))+')
+_SPACE = re.compile(r'\s+')
+_READ_ONLY = re.compile(r'^\s*(SELECT|WITH)\b', re.I)
+_LOCKING = re.compile(r'\bFOR\s+(NO\s+KEY\s+)?(UPDATE|SHARE|KEY\s+SHARE)\b', re.I)
+_ASYNCPG_PARAM = re.compile(r'\$(\d+)')
+
+OTHER = '<other>'
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(sql):
+    # the same statement with different values, IN lists or VALUES rows counts as one
+    sql = _COMMENTS.sub(' ', sql)
+    sql = _LITERALS.sub('?', sql)
+    sql = _SPACE.sub(' ', sql).strip()
+    sql = _LISTS.sub('(?, ...)', sql)
+    return _ROWS.sub('(?, ...), ...', sql)
+
+
+def _percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)] if ordered else 0.0
+
+
+class QueryProfiler:
+    def __init__(self, enabled=True, slow_ms=200, sample_rate=0.1, explain_interval=300,
+                 explain_timeout_ms=5000, log_interval=300, max_fingerprints=1000, samples=256):
+        self.enabled = enabled
+        self.slow = slow_ms / 1000
+        self.sample_rate = sample_rate
+        self.explain_interval = explain_interval
+        self.explain_timeout_ms = explain_timeout_ms
+        self.log_interval = log_interval
+        self.max_fingerprints = max_fingerprints
+        self.samples = samples
+        self._lock = threading.Lock()
+        self._queries = {}
+        self._interval = {}
+        self._jobs = queue.Queue(maxsize=16)
+        self._worker = None
+        self.explained = 0
+        self.explain_dropped = 0
+
+    def record(self, sql, elapsed, explain_sql=None):
+        # explain_sql: a callable giving the statement with its parameters inlined (or asyncpg's
+        # (query, args)), only called for the slow executions that are sampled
+        key = fingerprint(sql)
+        explain = False
+        with self._lock:
+            entry = self._queries.get(key)
+            if entry is None:
+                if len(self._queries) >= self.max_fingerprints:
+                    key = OTHER
+                    entry = self._queries.get(key)
+                if entry is None:
+                    entry = self._queries[key] = {"count": 0, "total": 0.0, "max": 0.0, "slow": 0,
+                                                  "samples": deque(maxlen=self.samples),
+                                                  "plan": None, "plan_at": 0.0, "analyzed": False}
+            entry["count"] += 1
+            entry["total"] += elapsed
+            entry["max"] = max(entry["max"], elapsed)
+            entry["samples"].append(elapsed)
+            window = self._interval.setdefault(key, [0, 0.0, 0.0])
+            window[0] += 1
+            window[1] += elapsed
+            window[2] = max(window[2], elapsed)
+            if elapsed >= self.slow:
+                entry["slow"] += 1
+                now = time.time()
+                if (key != OTHER and explain_sql is not None and now - entry["plan_at"] >= self.explain_interval
+                        and random.random() < self.sample_rate):
+                    # claimed now so concurrent slow runs of the same statement don't all queue one
+                    entry["plan_at"] = now
+                    explain = True
+            if self._worker is None:
+                self._start_worker()
+        if explain:
+            try:
+                self._jobs.put_nowait((key, explain_sql()))
+            except queue.Full:
+                with self._lock:
+                    self.explain_dropped += 1
+                    # give the claim back so a later slow run can try again
+                    entry["plan_at"] = 0.0
+            except Exception as e:
+                print(f"Preparing EXPLAIN for a slow query failed: {e}")
+
+    def _start_worker(self):
+        self._worker = threading.Thread(target=self._run, name="query-profiler", daemon=True)
+        self._worker.start()
+
+    def _run(self):
+        # one dedicated connection: plans are captured off the request path and outside the pool
+        from helper.db_pool import database_connection
+
+        conn = None
+        next_log = time.monotonic() + self.log_interval
+        while True:
+            timeout = max(0.0, next_log - time.monotonic()) if self.log_interval else None
+            try:
+                key, sql = self._jobs.get(timeout=timeout)
+            except queue.Empty:
+                key = None
+            if key is not None:
+                try:
+                    if conn is None or conn.closed:
+                        conn = database_connection()
+                    if isinstance(sql, tuple):
+                        sql = _inline_asyncpg_params(conn, *sql)
+                    self._store_plan(key, *self._explain(conn, sql))
+                except Exception as e:
+                    print(f"EXPLAIN for slow query failed: {e}")
+                    self._store_plan(key, f"EXPLAIN failed: {e}", False)
+                    if conn is not None:
+                        conn.close()
+                        conn = None
+                finally:
+                    self._jobs.task_done()
+            if self.log_interval and time.monotonic() >= next_log:
+                next_log = time.monotonic() + self.log_interval
+                self.log_summary()
+
+    def _explain(self, conn, sql):
+        # ANALYZE runs the statement again, so only plain reads get it, inside a read-only
+        # transaction that is rolled back; writes and locking reads get the estimated plan
+        analyze = bool(_READ_ONLY.match(sql)) and not _LOCKING.search(sql)
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SET TRANSACTION READ ONLY")
+                cursor.execute("SET LOCAL statement_timeout = %s", (self.explain_timeout_ms,))
+                cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {sql}" if analyze else f"EXPLAIN {sql}")
+                plan = '\n'.join(row[0] for row in cursor.fetchall())
+        finally:
+            conn.rollback()
+        return plan, analyze
+
+    def _store_plan(self, key, plan, analyzed):
+        with self._lock:
+            entry = self._queries.get(key)
+            if entry is not None:
+                entry["plan"] = plan
+                entry["plan_at"] = time.time()
+                entry["analyzed"] = analyzed
+            self.explained += 1
+
+    def wait_for_plans(self, timeout=30):
+        deadline = time.monotonic() + timeout
+        while self._jobs.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+    def reset(self):
+        with self._lock:
+            self._queries = {}
+            self._interval = {}
+
+    def log_summary(self, top=10):
+        with self._lock:
+            window, self._interval = self._interval, {}
+        if not window:
+            return
+        statements = sum(count for count, _, _ in window.values())
+        print(f"Query summary for the last {self.log_interval}s (pid {os.getpid()}): "
+              f"{statements} statements, {len(window)} distinct")
+        ranked = sorted(window.items(), key=lambda item: item[1][1], reverse=True)[:top]
+        for key, (count, total, longest) in ranked:
+            print(f"  {total * 1000:10.1f}ms total {count:7d}x avg {total / count * 1000:8.2f}ms "
+                  f"max {longest * 1000:8.2f}ms  {key[:200]}")
+
+    def report(self, limit=20, sort='total'):
+        with self._lock:
+            rows = []
+            for key, entry in self._queries.items():
+                rows.append({"fingerprint": key, "count": entry["count"],
+                             "total_ms": round(entry["total"] * 1000, 3),
+                             "avg_ms": round(entry["total"] / entry["count"] * 1000, 3),
+                             "max_ms": round(entry["max"] * 1000, 3),
+                             "p95_ms": round(_percentile(entry["samples"], 0.95) * 1000, 3),
+                             "slow": entry["slow"], "plan": entry["plan"],
+                             "plan_analyzed": entry["analyzed"] if entry["plan"] else None})
+            stats = {"fingerprints": len(self._queries), "slow_ms": self.slow * 1000,
+                     "explain_sample_rate": self.sample_rate, "explained": self.explained,
+                     "explain_dropped": self.explain_dropped, "pid": os.getpid()}
+        rows.sort(key=lambda row: row[f"{sort}_ms" if sort != 'count' else 'count'], reverse=True)
+        return rows[:limit], stats
+
+
+class _Profiled:
+    def execute(self, query, vars=None, profile_as=None):
+        # profile_as: the SQL to record instead, e.g. the text behind an EXECUTE of a prepared statement
+        profiler = get_profiler()
+        if not profiler.enabled or not isinstance(query, str):
+            return super().execute(query, vars)
+        sql = profile_as or query
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            profiler.record(sql, time.perf_counter() - started,
+                            lambda: self.mogrify(sql, vars).decode(extensions.encodings[self.connection.encoding]))
+
+    def executemany(self, query, vars_list):
+        profiler = get_profiler()
+        if not profiler.enabled or not isinstance(query, str):
+            return super().executemany(query, vars_list)
+        started = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            profiler.record(query, time.perf_counter() - started)
+
+
+class ProfilingCursor(_Profiled, extensions.cursor):
+    pass
+
+
+class ProfilingDictCursor(_Profiled, RealDictCursor):
+    pass
+
+
+def _inline_asyncpg_params(conn, sql, args):
+    # $1, $2 ... -> literals, via psycopg2's own quoting on the profiler's connection
+    params = {f"p{n}": value for n, value in enumerate(args, 1)}
+    template = _ASYNCPG_PARAM.sub(lambda m: f"%(p{m.group(1)})s", sql.replace('%', '%%'))
+    with conn.cursor() as cursor:
+        return cursor.mogrify(template, params).decode(extensions.encodings[conn.encoding])
+
+
+def record_asyncpg_query(record):
+    # asyncpg query logger; the worker inlines the $n parameters on its psycopg2 connection
+    profiler = get_profiler()
+    if not profiler.enabled or record.query is None or record.elapsed is None:
+        return
+    # asyncpg resets released connections with one multi-statement query; ours are single statements
+    if ';' in record.query.strip().rstrip(';'):
+        return
+    args = tuple(record.args or ())
+    profiler.record(record.query, record.elapsed, lambda: (record.query, args))
+
+
+_profiler = None
+_profiler_pid = None
+_profiler_lock = threading.Lock()
+
+
+def get_profiler():
+    # per process: the worker thread and its connection don't survive fork
+    global _profiler, _profiler_pid
+    pid = os.getpid()
+    if _profiler is None or _profiler_pid != pid:
+        with _profiler_lock:
+            if _profiler is None or _profiler_pid != pid:
+                _profiler = QueryProfiler(
+                    enabled=os.getenv("QUERY_PROFILE", "true").lower() in ("1", "true", "yes"),
+                    slow_ms=float(os.getenv("SLOW_QUERY_MS", 200)),
+                    sample_rate=float(os.getenv("EXPLAIN_SAMPLE_RATE", 0.1)),
+                    explain_interval=float(os.getenv("EXPLAIN_INTERVAL_SECONDS", 300)),
+                    explain_timeout_ms=int(os.getenv("EXPLAIN_TIMEOUT_MS", 5000)),
+                    log_interval=float(os.getenv("QUERY_LOG_SECONDS", 300)))
+                _profiler_pid = pid
+    return _profiler
+
+
+def query_report(limit=20, sort='total'):
+    return get_profiler().report(limit=limit, sort=sort)
@@ -0,0 +1,124 @@
+import math
+import os
+import threading
+import time
+
+from helper.cache_backend import get_backend
+
+
+class SlidingWindowLimiter:
+    # sliding window counter: a fixed-window count per identity, with the previous window
+    # weighted by how much of it still overlaps the sliding window
+    def __init__(self, backend, scope, limit, window):
+        self.backend = backend
+        self.scope = scope
+        self.limit = limit
+        self.window = window
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.throttled = 0
+
+    def _keys(self, identity, now):
+        index, elapsed = divmod(now, self.window)
+        prefix = f"{self.scope}:{identity}:"
+        return prefix + str(int(index)), prefix + str(int(index) - 1), elapsed
+
+    def _retry_after(self, previous, count, elapsed):
+        # the next attempt gets in once previous * (1 - elapsed / window) + count drops below limit
+        if count < self.limit and previous:
+            wait = (1 - (self.limit - count) / previous) * self.window - elapsed
+        else:
+            wait = self.window - elapsed + max(0.0, 1 - self.limit / count) * self.window
+        return max(1, math.ceil(wait))
+
+    def _decide(self, previous, count, elapsed):
+        estimate = previous * (1 - elapsed / self.window) + count
+        retry_after = None if estimate < self.limit else self._retry_after(previous, count, elapsed)
+        with self._lock:
+            if retry_after is None:
+                self.allowed += 1
+            else:
+                self.throttled += 1
+        return retry_after
+
+    def hit(self, identity):
+        # counts this attempt and returns None if it may go ahead, otherwise seconds to wait
+        current, previous, elapsed = self._keys(identity, time.time())
+        count = self.backend.incr(current, ttl=2 * self.window)
+        return self._decide(self.backend.get(previous) or 0, count - 1, elapsed)
+
+    def check(self, identity):
+        # counts nothing itself, for limits fed by add() once the outcome is known
+        current, previous, elapsed = self._keys(identity, time.time())
+        return self._decide(self.backend.get(previous) or 0, self.backend.get(current) or 0, elapsed)
+
+    def add(self, identity):
+        current, _, _ = self._keys(identity, time.time())
+        self.backend.incr(current, ttl=2 * self.window)
+
+    def reset(self, identity):
+        current, previous, _ = self._keys(identity, time.time())
+        self.backend.delete(current, previous)
+
+    def stats(self):
+        with self._lock:
+            return {"limit": self.limit, "window_seconds": self.window,
+                    "allowed": self.allowed, "throttled": self.throttled}
+
+
+def _account_key(account):
+    return str(account).strip().lower()
+
+
+class LoginThrottle:
+    # every attempt counts against the client's IP, only failed ones against the account,
+    # so a user who mistypes a password isn't locked out by their own successful login
+    def __init__(self, backend, ip_limit=30, ip_window=60, account_limit=5, account_window=300):
+        self.backend = backend
+        self.ip = SlidingWindowLimiter(backend, 'ip', ip_limit, ip_window)
+        self.account = SlidingWindowLimiter(backend, 'account', account_limit, account_window)
+
+    def check(self, ip, account):
+        try:
+            return self.ip.hit(ip or 'unknown') or self.account.check(_account_key(account))
+        except Exception as e:
+            # a broken shared backend must not lock everybody out
+            print(f"Login throttle check failed: {e}")
+            return None
+
+    def failed(self, account):
+        try:
+            self.account.add(_account_key(account))
+        except Exception as e:
+            print(f"Login throttle update failed: {e}")
+
+    def succeeded(self, account):
+        try:
+            self.account.reset(_account_key(account))
+        except Exception as e:
+            print(f"Login throttle update failed: {e}")
+
+    def stats(self):
+        return {"ip": self.ip.stats(), "account": self.account.stats(), "shared": self.backend.shared}
+
+
+_throttle = None
+_throttle_lock = threading.Lock()
+
+
+def get_login_throttle():
+    global _throttle
+    if _throttle is None:
+        with _throttle_lock:
+            if _throttle is None:
+                backend = get_backend('ratelimit', maxsize=int(os.getenv("LOGIN_THROTTLE_SIZE", 100000)))
+                _throttle = LoginThrottle(backend,
+                                          ip_limit=int(os.getenv("LOGIN_IP_LIMIT", 30)),
+                                          ip_window=int(os.getenv("LOGIN_IP_WINDOW", 60)),
+                                          account_limit=int(os.getenv("LOGIN_ACCOUNT_LIMIT", 5)),
+                                          account_window=int(os.getenv("LOGIN_ACCOUNT_WINDOW", 300)))
+    return _throttle
+
+
+def login_throttle_stats():
+    return get_login_throttle().stats()
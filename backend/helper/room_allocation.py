@@ -0,0 +1,111 @@
+from psycopg2 import errors
+
+from helper.availability import ACTIVE_STATUSES
+from helper.dashboard_stats import record_booking_created
+from helper.statements import execute, register
+
+MAX_ALLOCATION_ATTEMPTS = 5
+
+
+class NoRoomAvailable(Exception):
+    pass
+
+
+INSERT_BOOKING = register('insert_booking', """
+    INSERT INTO bookings
+    (first_name, last_name, email, phone, room_type, people, check_in, duration, status, user_email, room_id)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, 'pending', %s, %s)
+    RETURNING id, check_out, room_id, created_at
+""")
+
+
+def candidate_room_query(skip_locked):
+    # SKIP LOCKED lets parallel bookings of the same type each take a different free room
+    # instead of queueing behind one another. Active bookings that still have no room (left
+    # over from before migrations/0009) each hold one room of their type, so that many free
+    # rooms are skipped. Overlap is spelled as column bounds so both probes walk
+    # bookings_room_id_check_out_idx (migrations/0010)
+    return f"""
+        SELECT r.id
+        FROM rooms r
+        WHERE r.room_type = %s
+        AND r.status IS DISTINCT FROM 'maintenance'
+        AND r.id <> ALL(%s)
+        AND NOT EXISTS (
+            SELECT 1 FROM bookings b
+            WHERE b.room_id = r.id
+            AND b.check_out > %s
+            AND b.check_in < %s
+            AND b.status = ANY(%s)
+        )
+        ORDER BY r.id
+        OFFSET (
+            SELECT COUNT(*) FROM bookings u
+            WHERE u.room_id IS NULL
+            AND u.check_out > %s
+            AND u.check_in < %s
+            AND u.room_type = %s
+            AND u.status = ANY(%s)
+        )
+        LIMIT 1
+        FOR UPDATE OF r {"SKIP LOCKED" if skip_locked else ""}
+    """
+
+
+def candidate_room_params(room_type, tried, check_in, check_out):
+    statuses = list(ACTIVE_STATUSES)
+    return (room_type, list(tried), check_in, check_out, statuses,
+            check_in, check_out, room_type, statuses)
+
+
+register('candidate_room_skip_locked', candidate_room_query(True))
+register('candidate_room', candidate_room_query(False))
+
+
+def insert_params(booking, room_id, check_in, check_out):
+    return (
+        booking['first_name'], booking['last_name'], booking['email'], booking['phone'],
+        booking['room_type'], booking['people'], check_in, (check_out - check_in).days,
+        booking['user_email'], room_id
+    )
+
+
+def _candidate_room(cursor, room_type, check_in, check_out, skip_locked, tried):
+    execute(cursor, 'candidate_room_skip_locked' if skip_locked else 'candidate_room',
+            candidate_room_params(room_type, tried, check_in, check_out))
+    row = cursor.fetchone()
+    return row['id'] if row else None
+
+
+def allocate(cursor, room_type, check_in, check_out, insert):
+    # insert(room_id) adds the booking in that room and returns its row
+    tried = set()
+    for _ in range(MAX_ALLOCATION_ATTEMPTS):
+        room_id = _candidate_room(cursor, room_type, check_in, check_out, True, tried)
+        if room_id is None:
+            # every free room may just be locked by bookings still in flight; wait for them once
+            room_id = _candidate_room(cursor, room_type, check_in, check_out, False, tried)
+        if room_id is None:
+            raise NoRoomAvailable(room_type)
+
+        cursor.execute("SAVEPOINT allocate_room")
+        try:
+            row = insert(room_id)
+        except errors.ExclusionViolation:
+            # a booking for this room committed after our snapshot was taken; try the next one
+            cursor.execute("ROLLBACK TO SAVEPOINT allocate_room")
+            tried.add(room_id)
+            continue
+        cursor.execute("RELEASE SAVEPOINT allocate_room")
+        return row
+    raise NoRoomAvailable(room_type)
+
+
+def allocate_and_insert(cursor, booking, check_in, check_out):
+    def insert(room_id):
+        execute(cursor, 'insert_booking', insert_params(booking, room_id, check_in, check_out))
+        return cursor.fetchone()
+
+    row = allocate(cursor, booking['room_type'], check_in, check_out, insert)
+    record_booking_created(cursor, row['id'])
+    return row
@@ -0,0 +1,56 @@
+import re
+
+from psycopg2 import extensions
+
+from helper.query_profiler import ProfilingCursor, ProfilingDictCursor
+
+_PLACEHOLDER = re.compile(r'%%|%s')
+_NAME = re.compile(r'^[a-z_][a-z0-9_]*$')
+
+# name -> (sql with %s placeholders, PREPARE text, EXECUTE text)
+STATEMENTS = {}
+
+
+def numbered(sql):
+    # psycopg2's %s placeholders -> $1, $2 ... as PREPARE and asyncpg want them
+    numbers = iter(range(1, 1000))
+    return _PLACEHOLDER.sub(lambda m: '%' if m.group() == '%%' else f'${next(numbers)}', sql)
+
+
+def register(name, sql):
+    # hot statements are prepared once per pooled connection and then run by name, so the
+    # server skips parsing and (after a few runs) planning; returns the SQL for the async path
+    if not _NAME.match(name):
+        raise ValueError(f"Invalid statement name: {name}")
+    if name in STATEMENTS and STATEMENTS[name][0] != sql:
+        raise ValueError(f"Statement {name} is already registered with different SQL")
+    params = sum(1 for m in _PLACEHOLDER.finditer(sql) if m.group() == '%s')
+    call = f"EXECUTE {name}({', '.join(['%s'] * params)})" if params else f"EXECUTE {name}"
+    STATEMENTS[name] = (sql, f"PREPARE {name} AS {numbered(sql)}", call)
+    return sql
+
+
+class PreparingConnection(extensions.connection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # prepared statements live as long as the session and survive rollbacks
+        self.prepared = set()
+
+
+def execute(cursor, name, params=()):
+    sql, prepare, call = STATEMENTS[name]
+    conn = cursor.connection
+    prepared = getattr(conn, 'prepared', None)
+    if prepared is None:
+        # connections from outside the pool (scripts, migrations) run the SQL as it is
+        cursor.execute(sql, params)
+        return
+    if name not in prepared:
+        with conn.cursor(cursor_factory=extensions.cursor) as preparer:
+            preparer.execute(prepare)
+        prepared.add(name)
+    if isinstance(cursor, (ProfilingCursor, ProfilingDictCursor)):
+        # profiled under the statement's own SQL, which is also what EXPLAIN needs
+        cursor.execute(call, params, profile_as=sql)
+    else:
+        cursor.execute(call, params)
@@ -0,0 +1,89 @@
+import hashlib
+import os
+import threading
+import time
+
+from helper.cache_backend import get_backend
+from helper.generate_token import generate_access_token
+
+
+class RefreshCoalescer:
+    # a page firing N requests that all 401 sends N /refresh calls with the same refresh token;
+    # the first one mints the access token, the rest (concurrent or within `window` seconds) reuse it
+    def __init__(self, backend, window=10, wait_timeout=5):
+        self.backend = backend
+        self.window = window
+        self.wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.minted = 0
+        self.coalesced = 0
+
+    def _cached(self, key):
+        try:
+            entry = self.backend.get(key)
+        except Exception as e:
+            print(f"Refresh cache read failed: {e}")
+            return None
+        # a shared entry can outlive its usefulness if the access token is about to expire
+        if entry and entry['expires_at'] - time.time() > self.window:
+            return entry
+        return None
+
+    def access_token(self, refresh_token, payload):
+        # returns {"access_token", "expires_at"}; callers coalesced onto one mint get the same dict
+        key = hashlib.sha256(refresh_token.encode('utf-8')).hexdigest()
+        while True:
+            entry = self._cached(key)
+            if entry:
+                with self._lock:
+                    self.coalesced += 1
+                return entry
+            with self._lock:
+                event = self._inflight.get(key)
+                leader = event is None
+                if leader:
+                    event = self._inflight[key] = threading.Event()
+            if leader:
+                break
+            # if the leader failed there is nothing cached and we take over on the next pass
+            event.wait(self.wait_timeout)
+
+        try:
+            lifetime = int(os.getenv("ACCESS_TOKEN_EXPIRES_MINUTES", 15)) * 60
+            entry = {"access_token": generate_access_token(payload.get('email'), payload.get('role', 'guest')),
+                     "expires_at": int(time.time()) + lifetime}
+            try:
+                self.backend.set(key, entry, ttl=self.window)
+            except Exception as e:
+                print(f"Refresh cache write failed: {e}")
+            with self._lock:
+                self.minted += 1
+            return entry
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    def stats(self):
+        with self._lock:
+            return {"minted": self.minted, "coalesced": self.coalesced, "window_seconds": self.window,
+                    "shared": self.backend.shared}
+
+
+_coalescer = None
+_coalescer_lock = threading.Lock()
+
+
+def get_refresh_coalescer():
+    global _coalescer
+    if _coalescer is None:
+        with _coalescer_lock:
+            if _coalescer is None:
+                backend = get_backend('refresh', maxsize=int(os.getenv("TOKEN_CACHE_SIZE", 10000)))
+                _coalescer = RefreshCoalescer(backend, window=int(os.getenv("REFRESH_COALESCE_SECONDS", 10)))
+    return _coalescer
+
+
+def refresh_stats():
+    return get_refresh_coalescer().stats()
@@ -0,0 +1,64 @@
+import os
+import threading
+
+from helper.cache_backend import get_backend
+
+
+PROFILE_FIELDS = ('firstname', 'lastname', 'username', 'email', 'role')
+
+
+class UserCache:
+    def __init__(self, backend, ttl=300):
+        self.backend = backend
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, email):
+        try:
+            profile = self.backend.get(email)
+        except Exception as e:
+            print(f"User cache read failed: {e}")
+            profile = None
+        with self._lock:
+            if profile is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return profile
+
+    def set(self, email, user):
+        profile = {field: user.get(field) for field in PROFILE_FIELDS}
+        try:
+            self.backend.set(email, profile, ttl=self.ttl)
+        except Exception as e:
+            print(f"User cache write failed: {e}")
+
+    def invalidate(self, email):
+        with self._lock:
+            self.invalidations += 1
+        try:
+            self.backend.delete(email)
+        except Exception as e:
+            print(f"User cache invalidation failed: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "invalidations": self.invalidations,
+                    "ttl": self.ttl, "shared": self.backend.shared}
+
+
+_user_cache = None
+_user_cache_lock = threading.Lock()
+
+
+def get_user_cache():
+    global _user_cache
+    if _user_cache is None:
+        with _user_cache_lock:
+            if _user_cache is None:
+                backend = get_backend('users', maxsize=int(os.getenv("USER_CACHE_SIZE", 10000)))
+                _user_cache = UserCache(backend, ttl=int(os.getenv("USER_CACHE_TTL", 300)))
+    return _user_cache
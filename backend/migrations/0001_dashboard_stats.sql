@@ -0,0 +1,33 @@
+-- Counters behind /admin/dashboard/stats, see helper/dashboard_stats.py
+CREATE TABLE IF NOT EXISTS booking_counters (
+    status text NOT NULL,
+    shard smallint NOT NULL,
+    n bigint NOT NULL DEFAULT 0,
+    PRIMARY KEY (status, shard)
+);
+
+CREATE TABLE IF NOT EXISTS dashboard_snapshot (
+    id smallint PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    active_guests bigint NOT NULL DEFAULT 0,
+    available_rooms bigint NOT NULL DEFAULT 0,
+    total_rooms bigint NOT NULL DEFAULT 0,
+    reconciled_at timestamptz NOT NULL DEFAULT now()
+);
+
+-- seed both from the existing data, the reconciler keeps them honest afterwards
+DELETE FROM booking_counters;
+INSERT INTO booking_counters (status, shard, n)
+SELECT status, id % 16, COUNT(*)
+FROM bookings
+GROUP BY status, id % 16;
+
+INSERT INTO dashboard_snapshot (id, active_guests, available_rooms, total_rooms, reconciled_at)
+SELECT 1,
+    (SELECT COUNT(DISTINCT email) FROM bookings
+     WHERE check_in <= CURRENT_DATE
+     AND (check_in + (duration || ' days')::interval) >= CURRENT_DATE
+     AND status = 'confirmed'),
+    (SELECT COUNT(*) FROM rooms WHERE status = 'available'),
+    (SELECT COUNT(*) FROM rooms),
+    now()
+ON CONFLICT (id) DO NOTHING;
@@ -0,0 +1,5 @@
+-- Store the check-out date instead of computing check_in + (duration || ' days')::interval
+-- on every row. Rewrites the bookings table, so run it in a quiet window.
+ALTER TABLE bookings
+    ADD COLUMN IF NOT EXISTS check_out date
+    GENERATED ALWAYS AS (check_in + duration::integer) STORED;
@@ -0,0 +1,13 @@
+-- migrate: no-transaction
+-- CONCURRENTLY keeps bookings writable while the indexes build
+CREATE INDEX CONCURRENTLY IF NOT EXISTS bookings_status_check_in_check_out_idx
+    ON bookings (status, check_in, check_out);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS bookings_created_at_idx
+    ON bookings (created_at);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS bookings_user_email_idx
+    ON bookings (user_email);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS rooms_status_idx
+    ON rooms (status);
@@ -0,0 +1,13 @@
+-- migrate: no-transaction
+-- Keyset pagination for /admin/bookings walks (created_at, id); the single-column
+-- created_at index from 0003 becomes redundant once the composite one exists
+CREATE INDEX CONCURRENTLY IF NOT EXISTS bookings_created_at_id_idx
+    ON bookings (created_at, id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS bookings_status_created_at_id_idx
+    ON bookings (status, created_at, id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS bookings_lower_email_idx
+    ON bookings (lower(email));
+
+DROP INDEX CONCURRENTLY IF EXISTS bookings_created_at_idx;
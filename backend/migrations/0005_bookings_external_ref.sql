@@ -0,0 +1,6 @@
+-- migrate: no-transaction
+-- Partner reference for bulk-imported bookings, so re-sending the same file doesn't duplicate rows
+ALTER TABLE bookings ADD COLUMN IF NOT EXISTS external_ref text;
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS bookings_external_ref_key
+    ON bookings (external_ref);
@@ -0,0 +1,9 @@
+-- Bookings get a concrete room; the exclusion constraint is the last line of defence
+-- against two active bookings holding the same room on the same night.
+-- room_id is wrapped in a one-value range so the core gist range opclass covers both
+-- columns and the btree_gist extension isn't needed
+ALTER TABLE bookings ADD COLUMN IF NOT EXISTS room_id integer REFERENCES rooms(id);
+
+ALTER TABLE bookings ADD CONSTRAINT bookings_room_no_overlap
+    EXCLUDE USING gist (int4range(room_id, room_id, '[]') WITH =, daterange(check_in, check_out) WITH &&)
+    WHERE (room_id IS NOT NULL AND status IN ('pending', 'confirmed'));
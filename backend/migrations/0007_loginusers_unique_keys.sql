@@ -0,0 +1,9 @@
+-- migrate: no-transaction
+-- Signup is a single INSERT that relies on these to reject a taken email or username; the
+-- names match the constraints of the original schema, so databases that have them skip this.
+-- A build that fails on existing duplicates leaves an INVALID index: drop it, fix the rows, re-run
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS loginusers_email_key
+    ON loginusers (email);
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS loginusers_username_key
+    ON loginusers (username);
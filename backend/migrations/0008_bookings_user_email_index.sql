@@ -0,0 +1,4 @@
+-- migrate: no-transaction
+-- GET /me/bookings pages through one guest's bookings by (check_in, id), latest first
+CREATE INDEX CONCURRENTLY IF NOT EXISTS bookings_user_email_check_in_idx
+    ON bookings (user_email, check_in, id);
@@ -0,0 +1,33 @@
+-- Bookings made before 0006 have no room, so neither the allocator nor the exclusion
+-- constraint sees them. Give every active one that hasn't ended a free room of its type, in
+-- check-in order; any left without a room (the type was already overbooked) still count
+-- against the type's capacity in helper/room_allocation.py
+DO $$
+DECLARE
+    booking record;
+BEGIN
+    FOR booking IN
+        SELECT id, room_type, check_in, check_out
+        FROM bookings
+        WHERE room_id IS NULL
+        AND status IN ('pending', 'confirmed')
+        AND check_out > CURRENT_DATE
+        ORDER BY check_in, id
+    LOOP
+        UPDATE bookings SET room_id = (
+            SELECT r.id
+            FROM rooms r
+            WHERE r.room_type = booking.room_type
+            AND r.status IS DISTINCT FROM 'maintenance'
+            AND NOT EXISTS (
+                SELECT 1 FROM bookings b
+                WHERE b.room_id = r.id
+                AND b.status IN ('pending', 'confirmed')
+                AND daterange(b.check_in, b.check_out) && daterange(booking.check_in, booking.check_out)
+            )
+            ORDER BY r.id
+            LIMIT 1
+        )
+        WHERE id = booking.id;
+    END LOOP;
+END $$;
@@ -0,0 +1,98 @@
+"""Measure cold start of the Flask app and the pre-fork launcher.
+
+Run from backend/:
+
+    python scripts/bench_cold_start.py --runs 5 --workers 2
+
+Reports, as medians over --runs:
+  import      time to import app.py and build the app with create_app()
+  first 200   time from spawning `gunicorn -c gunicorn.conf.py` until GET /health answers,
+              with and without preload_app
+  shutdown    time from SIGTERM until the master has exited (graceful worker shutdown)
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = (
+    "import time; started = time.perf_counter(); "
+    "from app import create_app; create_app(); "
+    "print((time.perf_counter() - started) * 1000)"
+)
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def measure_import():
+    output = subprocess.run([sys.executable, '-c', IMPORT_SNIPPET], cwd=BACKEND_DIR,
+                            capture_output=True, text=True, check=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def measure_launch(workers, preload, timeout=30.0):
+    port = _free_port()
+    env = dict(os.environ, BIND=f"127.0.0.1:{port}", WEB_CONCURRENCY=str(workers),
+               GUNICORN_PRELOAD='true' if preload else 'false')
+    started = time.perf_counter()
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py'], cwd=BACKEND_DIR,
+                              env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        first_response = None
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                    if response.status == 200:
+                        first_response = (time.perf_counter() - started) * 1000
+                        break
+            except OSError:
+                time.sleep(0.01)
+        if first_response is None:
+            raise RuntimeError("server did not answer /health in time")
+
+        stopping = time.perf_counter()
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=timeout)
+        return first_response, (time.perf_counter() - stopping) * 1000
+    finally:
+        if server.poll() is None:
+            server.kill()
+            server.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cold start and time-to-first-request for the Flask app")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = {"import_ms": statistics.median(measure_import() for _ in range(args.runs))}
+    for preload in (True, False):
+        runs = [measure_launch(args.workers, preload) for _ in range(args.runs)]
+        label = 'preload' if preload else 'no_preload'
+        results[f"first_request_ms_{label}"] = statistics.median(r[0] for r in runs)
+        results[f"shutdown_ms_{label}"] = statistics.median(r[1] for r in runs)
+
+    for name, value in results.items():
+        print(f"{name}: {value:.1f}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""Micro-benchmark for JSON encoding of booking rows.
+
+Run from backend/:
+
+    python scripts/bench_json.py --rows 20 100 1000 --repeat 200
+
+Compares, per response:
+  legacy      the old path: strftime/isoformat every row, then Flask's default provider
+  fast        FastJSONProvider with orjson (skipped when orjson isn't installed)
+  fallback    FastJSONProvider on the stdlib json module
+and, per exported row, the old NDJSON line encoding against helper.json_encoder.dumps.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import timeit
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from psycopg2.extras import RealDictRow
+
+import helper.json_encoder as json_encoder
+from helper.bookings_export import EXPORT_FIELDS
+from helper.json_encoder import FastJSONProvider
+
+
+def make_rows(count):
+    rows = []
+    created = datetime(2025, 1, 1, 12, 0, 0, 123456)
+    for i in range(count):
+        check_in = date(2025, 6, 1) + timedelta(days=i % 300)
+        rows.append(RealDictRow([
+            ('id', 100000 + i), ('guest_name', f"Guest {i}"), ('email', f"guest{i}@example.com"),
+            ('phone', '+15550000000'), ('room_type', 'deluxe'), ('people', 2),
+            ('check_in', check_in), ('duration', 3), ('check_out', check_in + timedelta(days=3)),
+            ('status', 'confirmed'), ('created_at', created + timedelta(minutes=i)),
+        ]))
+    return rows
+
+
+def legacy_response(app, rows):
+    for booking in rows:
+        booking['check_in'] = booking['check_in'].strftime('%Y-%m-%d')
+        booking['check_out'] = booking['check_out'].strftime('%Y-%m-%d')
+        booking['created_at'] = booking['created_at'].isoformat()
+    return app.json.response({"bookings": rows, "next_cursor": None, "prev_cursor": None, "limit": len(rows)})
+
+
+def fast_response(app, rows):
+    return app.json.response({"bookings": rows, "next_cursor": None, "prev_cursor": None, "limit": len(rows)})
+
+
+def _plain(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def legacy_ndjson(rows):
+    return [json.dumps({field: _plain(row[field]) for field in EXPORT_FIELDS}, default=str) + '\n' for row in rows]
+
+
+def fast_ndjson(rows):
+    return [json_encoder.dumps(row) + b'\n' for row in rows]
+
+
+def time_per_call(fn, repeat):
+    return min(timeit.repeat(fn, number=repeat, repeat=3)) / repeat * 1000
+
+
+def time_legacy(app, rows, repeat):
+    # the legacy path rewrites the rows it is given, so every call gets a fresh copy made off the clock
+    total = 0.0
+    for _ in range(repeat):
+        copies = [RealDictRow(row) for row in rows]
+        started = time.perf_counter()
+        legacy_response(app, copies)
+        total += time.perf_counter() - started
+    return total / repeat * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="JSON encoding micro-benchmark")
+    parser.add_argument('--rows', type=int, nargs='+', default=[20, 100, 1000])
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--export-rows', type=int, default=10000)
+    args = parser.parse_args(argv)
+
+    legacy_app = Flask('legacy')
+    legacy_app.json = DefaultJSONProvider(legacy_app)
+    fast_app = Flask('fast')
+    fast_app.json = FastJSONProvider(fast_app)
+    orjson = json_encoder.orjson
+
+    print(f"orjson: {'available' if orjson else 'not installed'}")
+    for count in args.rows:
+        results = {}
+        rows = make_rows(count)
+        with legacy_app.app_context():
+            results['legacy'] = time_legacy(legacy_app, rows, args.repeat)
+        with fast_app.app_context():
+            if orjson:
+                results['fast'] = time_per_call(lambda: fast_response(fast_app, rows), args.repeat)
+            json_encoder.orjson = None
+            try:
+                results['fallback'] = time_per_call(lambda: fast_response(fast_app, rows), args.repeat)
+            finally:
+                json_encoder.orjson = orjson
+        print(f"{count:>6} rows: " + "  ".join(f"{name}={ms:.3f}ms" for name, ms in results.items()))
+
+    rows = make_rows(args.export_rows)
+    legacy = time_per_call(lambda: legacy_ndjson(rows), 3)
+    fast = time_per_call(lambda: fast_ndjson(rows), 3)
+    print(f"ndjson export of {args.export_rows} rows: legacy={legacy:.1f}ms fast={fast:.1f}ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,427 @@
+"""Load test the backend with realistic traffic and report latency percentiles per route.
+
+Run from backend/ after `python -m helper.migrate`. Against a server that is already up:
+
+    python scripts/bench_load.py --setup --url http://127.0.0.1:5000 --guests 50 --admins 5 \\
+        --duration 30 --json bench/$(git rev-parse --short HEAD).json
+
+or let the script serve app.py itself (threaded werkzeug server in this process, so the
+numbers include the load generator's own CPU; use it for quick comparisons, not capacity):
+
+    python scripts/bench_load.py --setup --in-process --duration 15 --json bench/head.json
+
+Traffic:
+  guests      log in (retrying after Retry-After on 429/503), then page views (GET /me) mixed
+              with bookings (POST /hotel_booking, random stays in the 2090s so they don't
+              collide with real ones)
+  admins      GET /admin/bookings and /admin/dashboard/stats, sending If-None-Match like a
+              browser would, and status updates on the bench bookings
+  bursts      every --burst-every seconds, --burst-size parallel logins on fresh connections,
+              --burst-bad-ratio of them with a wrong password
+
+--setup creates the bench-guest-N / bench-admin-N accounts straight in the database; --cleanup
+removes them with their bookings afterwards. The login throttle sees every virtual user as the
+same IP, so raise LOGIN_IP_LIMIT / LOGIN_ACCOUNT_LIMIT on the server under test (--in-process
+does that) or the bursts are mostly 429s; the report lists status codes per route either way.
+
+Compare two saved runs (exits 1 if any route's p95 or throughput regressed past --threshold):
+
+    python scripts/bench_load.py --compare bench/base.json bench/head.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BENCH_DOMAIN = 'bench.test'
+ROOM_TYPES = ('standard', 'deluxe', 'suite', 'executive')
+STATUSES = ('pending', 'confirmed', 'cancelled')
+
+
+class Connection:
+    # one keep-alive HTTP/1.1 connection with its own cookie jar, like a browser tab
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+        self.cookies = {}
+
+    async def request(self, method, path, body=None, headers=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}", "Connection: keep-alive"]
+        if self.cookies:
+            lines.append("Cookie: " + "; ".join(f"{k}={v}" for k, v in self.cookies.items()))
+        payload = b''
+        if body is not None:
+            payload = json.dumps(body).encode('utf-8')
+            lines += ["Content-Type: application/json", f"Content-Length: {len(payload)}"]
+        for name, value in (headers or {}).items():
+            lines.append(f"{name}: {value}")
+        try:
+            self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + payload)
+            return await self._read_response()
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            self.close()
+            raise
+
+    async def _read_response(self):
+        head = await self.reader.readuntil(b'\r\n\r\n')
+        lines = head.decode('latin-1').split('\r\n')
+        status = int(lines[0].split(' ', 2)[1])
+        headers = {}
+        for line in lines[1:]:
+            if ':' not in line:
+                continue
+            name, value = line.split(':', 1)
+            name, value = name.strip().lower(), value.strip()
+            if name == 'set-cookie':
+                cookie_name, _, rest = value.partition('=')
+                self.cookies[cookie_name] = rest.split(';', 1)[0]
+            headers[name] = value
+        if headers.get('transfer-encoding') == 'chunked':
+            chunks = []
+            while True:
+                size = int((await self.reader.readuntil(b'\r\n')).split(b';')[0], 16)
+                chunks.append(await self.reader.readexactly(size + 2))
+                if size == 0:
+                    break
+            body = b''.join(chunk[:-2] for chunk in chunks)
+        else:
+            body = await self.reader.readexactly(int(headers.get('content-length', 0)))
+        if headers.get('connection', '').lower() == 'close':
+            self.close()
+        return status, headers, body
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.statuses = {}
+
+    def add(self, route, status, seconds):
+        self.latencies.setdefault(route, []).append(seconds)
+        codes = self.statuses.setdefault(route, {})
+        codes[status] = codes.get(status, 0) + 1
+
+    async def call(self, conn, route, method, path, body=None, headers=None):
+        started = time.perf_counter()
+        try:
+            status, response_headers, response_body = await conn.request(method, path, body, headers)
+        except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+            self.add(route, type(e).__name__, time.perf_counter() - started)
+            await asyncio.sleep(0.05)
+            return None, {}, b''
+        self.add(route, status, time.perf_counter() - started)
+        return status, response_headers, response_body
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def summarize(recorder, elapsed):
+    routes = {}
+    everything = []
+    for route, latencies in sorted(recorder.latencies.items()):
+        latencies.sort()
+        everything.extend(latencies)
+        routes[route] = {
+            "requests": len(latencies),
+            "throughput_rps": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(_percentile(latencies, 0.50) * 1000, 2),
+            "p95_ms": round(_percentile(latencies, 0.95) * 1000, 2),
+            "p99_ms": round(_percentile(latencies, 0.99) * 1000, 2),
+            "statuses": {str(code): n for code, n in sorted(recorder.statuses[route].items(), key=str)},
+        }
+    everything.sort()
+    total = {
+        "requests": len(everything),
+        "throughput_rps": round(len(everything) / elapsed, 1),
+        "p50_ms": round(_percentile(everything, 0.50) * 1000, 2),
+        "p95_ms": round(_percentile(everything, 0.95) * 1000, 2),
+        "p99_ms": round(_percentile(everything, 0.99) * 1000, 2),
+    }
+    return total, routes
+
+
+def _stay():
+    check_in = date(2090, 1, 1) + timedelta(days=random.randrange(3650))
+    return check_in.isoformat(), random.randint(1, 4)
+
+
+async def log_in(conn, recorder, route, path, body, deadline):
+    # a user turned away with 503/429 tries again once told to, like the login page would
+    while time.perf_counter() < deadline:
+        status, headers, _ = await recorder.call(conn, route, 'POST', path, body)
+        if status == 200:
+            return True
+        if status not in (429, 503, None):
+            return False
+        await asyncio.sleep(min(float(headers.get('retry-after', 1)), max(0.0, deadline - time.perf_counter())))
+    return False
+
+
+async def guest(index, args, recorder, booking_ids, deadline):
+    await asyncio.sleep(random.uniform(0, args.ramp))
+    conn = Connection(args.host, args.port)
+    login = ('POST /login', '/login', {"username": f"bench_guest_{index}", "password": args.password})
+    if not await log_in(conn, recorder, *login, deadline):
+        return
+    while time.perf_counter() < deadline:
+        if random.random() < args.book_ratio:
+            check_in, nights = _stay()
+            status, _, body = await recorder.call(conn, 'POST /hotel_booking', 'POST', '/hotel_booking', {
+                "first_name": "Bench", "last_name": str(index), "email": f"bench-guest-{index}@{BENCH_DOMAIN}",
+                "phone": "000", "room_type": random.choice(ROOM_TYPES), "people": 2,
+                "check_in": check_in, "duration": nights})
+            if status == 201:
+                booking_ids.append(json.loads(body)['booking_id'])
+        else:
+            status, _, _ = await recorder.call(conn, 'GET /me', 'GET', '/me')
+            if status == 401:
+                status, _, _ = await recorder.call(conn, 'POST /refresh', 'POST', '/refresh')
+                if status == 401 and not await log_in(conn, recorder, *login, deadline):
+                    break
+        await asyncio.sleep(random.expovariate(1000 / args.think_ms) if args.think_ms else 0)
+    conn.close()
+
+
+async def admin(index, args, recorder, booking_ids, deadline):
+    await asyncio.sleep(random.uniform(0, args.ramp))
+    conn = Connection(args.host, args.port)
+    etags = {}
+    if not await log_in(conn, recorder, 'POST /adminlogin', '/adminlogin',
+                        {"email": f"bench-admin-{index}@{BENCH_DOMAIN}", "password": args.password}, deadline):
+        return
+    while time.perf_counter() < deadline:
+        roll = random.random()
+        if roll < 0.3 and booking_ids:
+            booking_id = random.choice(booking_ids)
+            await recorder.call(conn, 'PUT /admin/bookings/:id/status', 'PUT', f'/admin/bookings/{booking_id}/status',
+                                {"status": random.choice(STATUSES)})
+        else:
+            if roll < 0.65:
+                route, path = 'GET /admin/bookings', random.choice(['/admin/bookings', '/admin/bookings?status=pending'])
+            else:
+                route, path = 'GET /admin/dashboard/stats', '/admin/dashboard/stats'
+            headers = {"If-None-Match": etags[path]} if args.conditional and path in etags else None
+            status, response_headers, _ = await recorder.call(conn, route, 'GET', path, headers=headers)
+            if status == 200 and 'etag' in response_headers:
+                etags[path] = response_headers['etag']
+        await asyncio.sleep(random.expovariate(1000 / args.think_ms) if args.think_ms else 0)
+    conn.close()
+
+
+async def bursts(args, recorder, deadline):
+    async def attempt(index):
+        conn = Connection(args.host, args.port)
+        password = args.password if random.random() >= args.burst_bad_ratio else 'wrong-password'
+        await recorder.call(conn, 'POST /login (burst)', 'POST', '/login',
+                            {"username": f"bench_guest_{index % args.guests}", "password": password})
+        conn.close()
+
+    while time.perf_counter() + args.burst_every < deadline:
+        await asyncio.sleep(args.burst_every)
+        await asyncio.gather(*(attempt(i) for i in range(args.burst_size)))
+
+
+async def run(args):
+    recorder = Recorder()
+    booking_ids = []
+    deadline = time.perf_counter() + args.duration
+    tasks = [guest(i, args, recorder, booking_ids, deadline) for i in range(args.guests)]
+    tasks += [admin(i, args, recorder, booking_ids, deadline) for i in range(args.admins)]
+    if args.burst_size:
+        tasks.append(bursts(args, recorder, deadline))
+    started = time.perf_counter()
+    await asyncio.gather(*tasks)
+    return summarize(recorder, time.perf_counter() - started)
+
+
+def setup_accounts(guests, admins, password):
+    import bcrypt
+    from helper.db_pool import database_connection
+
+    # one hash for everybody; the server checks it at whatever cost it was made with
+    hashed = bcrypt.hashpw(password.encode('utf-8'),
+                           bcrypt.gensalt(int(os.getenv("BCRYPT_ROUNDS", 12)))).decode('utf-8')
+    accounts = [(f"bench-guest-{i}@{BENCH_DOMAIN}", f"bench_guest_{i}", 'guest') for i in range(guests)]
+    accounts += [(f"bench-admin-{i}@{BENCH_DOMAIN}", f"bench_admin_{i}", 'admin') for i in range(admins)]
+    db = database_connection()
+    with db.cursor() as cursor:
+        for email, username, role in accounts:
+            cursor.execute("""
+                INSERT INTO loginusers (firstname, lastname, email, username, passwords, role)
+                SELECT 'Bench', %s, %s, %s, %s, %s
+                WHERE NOT EXISTS (SELECT 1 FROM loginusers WHERE email = %s)
+            """, (username, email, username, hashed, role, email))
+            cursor.execute("UPDATE loginusers SET passwords = %s, role = %s WHERE email = %s", (hashed, role, email))
+    db.commit()
+    db.close()
+
+
+def cleanup_accounts():
+    from helper.dashboard_stats import COUNTER_SHARDS
+    from helper.db_pool import database_connection
+
+    pattern = f"bench-%@{BENCH_DOMAIN}"
+    db = database_connection()
+    with db.cursor() as cursor:
+        # keep the dashboard counters in step with the rows removed
+        cursor.execute("""
+            UPDATE booking_counters c SET n = c.n - d.removed
+            FROM (SELECT status, id %% %s AS shard, COUNT(*) AS removed
+                  FROM bookings WHERE user_email LIKE %s GROUP BY 1, 2) d
+            WHERE c.status = d.status AND c.shard = d.shard
+        """, (COUNTER_SHARDS, pattern))
+        cursor.execute("DELETE FROM bookings WHERE user_email LIKE %s", (pattern,))
+        removed = cursor.rowcount
+        cursor.execute("DELETE FROM loginusers WHERE email LIKE %s", (pattern,))
+    db.commit()
+    db.close()
+    return removed
+
+
+def serve_in_process():
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    # every virtual user shares one IP, keep the login throttle out of the measurement
+    os.environ.setdefault("LOGIN_IP_LIMIT", "1000000")
+    os.environ.setdefault("LOGIN_ACCOUNT_LIMIT", "1000000")
+    from app import create_app, warm_up
+
+    app = create_app()
+    warm_up(app)
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    server = make_server('127.0.0.1', port, app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{port}"
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(total, routes):
+    print(f"{'route':<34}{'req':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}  statuses")
+    for route, r in routes.items():
+        statuses = ' '.join(f"{code}:{n}" for code, n in r['statuses'].items())
+        print(f"{route:<34}{r['requests']:>8}{r['throughput_rps']:>9}{r['p50_ms']:>9}{r['p95_ms']:>9}"
+              f"{r['p99_ms']:>9}  {statuses}")
+    print(f"{'total':<34}{total['requests']:>8}{total['throughput_rps']:>9}{total['p50_ms']:>9}"
+          f"{total['p95_ms']:>9}{total['p99_ms']:>9}")
+
+
+def compare(base_path, head_path, threshold):
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(head_path) as f:
+        head = json.load(f)
+    print(f"{base['meta'].get('commit')} -> {head['meta'].get('commit')}")
+    regressed = False
+    for route in sorted(set(base['routes']) | set(head['routes'])):
+        if route not in base['routes'] or route not in head['routes']:
+            print(f"{route:<34} only in {'head' if route in head['routes'] else 'base'}")
+            continue
+        b, h = base['routes'][route], head['routes'][route]
+        cells = []
+        for key, worse_when_higher in (('throughput_rps', False), ('p50_ms', True), ('p95_ms', True), ('p99_ms', True)):
+            change = (h[key] - b[key]) / b[key] * 100 if b[key] else 0.0
+            flag = ''
+            if key in ('throughput_rps', 'p95_ms') and (change > threshold if worse_when_higher else change < -threshold):
+                flag = ' !'
+                regressed = True
+            cells.append(f"{key}={b[key]}->{h[key]} ({change:+.1f}%){flag}")
+        print(f"{route:<34} " + '  '.join(cells))
+    return 1 if regressed else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test with realistic traffic mixes")
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--in-process', action='store_true', help="serve app.py from this process instead of --url")
+    parser.add_argument('--guests', type=int, default=50)
+    parser.add_argument('--admins', type=int, default=5)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--ramp', type=float, default=2, help="seconds over which the users start")
+    parser.add_argument('--think-ms', type=float, default=50, help="mean pause between a user's requests")
+    parser.add_argument('--book-ratio', type=float, default=0.1, help="share of guest requests that book")
+    parser.add_argument('--burst-every', type=float, default=5)
+    parser.add_argument('--burst-size', type=int, default=20, help="0 disables login bursts")
+    parser.add_argument('--burst-bad-ratio', type=float, default=0.5)
+    parser.add_argument('--no-conditional', dest='conditional', action='store_false',
+                        help="don't send If-None-Match on admin reads")
+    parser.add_argument('--password', default='bench-password')
+    parser.add_argument('--setup', action='store_true', help="create the bench accounts first")
+    parser.add_argument('--cleanup', action='store_true', help="remove bench accounts and bookings afterwards")
+    parser.add_argument('--json', help="write the results to this file")
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'HEAD'), help="compare two --json results")
+    parser.add_argument('--threshold', type=float, default=10.0, help="percent change counted as a regression")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        return compare(*args.compare, args.threshold)
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    if args.setup:
+        setup_accounts(args.guests, args.admins, args.password)
+
+    server = None
+    if args.in_process:
+        server, args.url = serve_in_process()
+    parts = urlsplit(args.url)
+    args.host, args.port = parts.hostname, parts.port or 80
+
+    started_at = datetime.now(timezone.utc).isoformat()
+    try:
+        total, routes = asyncio.run(run(args))
+    finally:
+        if server is not None:
+            server.shutdown()
+        if args.cleanup:
+            print(f"removed {cleanup_accounts()} bench bookings")
+
+    print_report(total, routes)
+    if args.json:
+        options = {k: v for k, v in vars(args).items() if k not in ('password', 'compare', 'json')}
+        result = {"meta": {"commit": _git_commit(), "started_at": started_at, "options": options},
+                  "total": total, "routes": routes}
+        directory = os.path.dirname(args.json)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,380 @@
+"""Time every SQL statement the API runs against the data in the database, per scale.
+
+Run from backend/, typically after scripts/generate_data.py:
+
+    python scripts/bench_queries.py --json bench/queries-1m.json
+    python scripts/bench_queries.py --plans --json bench/queries-1m-indexed.json
+    python scripts/bench_queries.py --compare bench/queries-1m.json bench/queries-1m-indexed.json
+
+Each scenario is one thing a route does (a login lookup, a bookings page with a given filter,
+a booking allocation, a batch status update, ...). Scenarios call the same helpers and SQL as
+the routes: the inline statements are read out of app.py, the rest come from the helper
+modules, so the benchmark follows the code as it changes. Each iteration runs in its own
+transaction and is rolled back, so write scenarios leave the data as they found it.
+
+Statements are timed by the query profiler and grouped by fingerprint under the scenario
+that ran them. Parameters are sampled from the existing rows. --plans also captures one
+EXPLAIN (ANALYZE, BUFFERS) plan per statement into the --json output. The table sizes are
+recorded with the results, so runs at different scales can sit side by side.
+"""
+import argparse
+import ast
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_WHERE_EQ = re.compile(r'\bwhere\s+(\w+)\s*=\s*%s\s*$', re.I)
+_INSERT = re.compile(r'^\s*insert\s+into\s+(\w+)\s*\(([^)]*)\)', re.I)
+
+
+def app_statements():
+    # (route function, SQL) for every literal passed to cursor.execute in app.py
+    with open(os.path.join(BACKEND, 'app.py')) as f:
+        tree = ast.parse(f.read())
+    statements = []
+    for function in ast.walk(tree):
+        if not isinstance(function, ast.FunctionDef):
+            continue
+        for node in ast.walk(function):
+            if (isinstance(node, ast.Call) and getattr(node.func, 'attr', None) == 'execute' and node.args
+                    and isinstance(node.args[0], ast.Constant) and isinstance(node.args[0].value, str)):
+                statements.append((function.name, node.args[0].value))
+    return statements
+
+
+class Sample:
+    def __init__(self, cursor, rng, size=200):
+        self.rng = rng
+        cursor.execute("SELECT min(id) AS low, max(id) AS high FROM bookings")
+        bounds = cursor.fetchone()
+        self.bookings = []
+        if bounds['low'] is not None:
+            cursor.execute("""
+                SELECT id, email, user_email, status, room_type, check_in FROM bookings WHERE id = ANY(%s)
+            """, ([rng.randint(bounds['low'], bounds['high']) for _ in range(size * 2)],))
+            self.bookings = cursor.fetchall()[:size]
+        cursor.execute("SELECT min(id) AS low, max(id) AS high FROM loginusers")
+        bounds = cursor.fetchone()
+        cursor.execute("SELECT email, username, passwords FROM loginusers WHERE id = ANY(%s)",
+                       ([rng.randint(bounds['low'] or 0, bounds['high'] or 0) for _ in range(size * 2)],))
+        self.users = cursor.fetchall()[:size]
+        cursor.execute("SELECT DISTINCT room_type FROM rooms WHERE room_type IS NOT NULL")
+        self.room_types = [row['room_type'] for row in cursor.fetchall()]
+        self.unique = 0
+        if not self.bookings or not self.users or not self.room_types:
+            raise SystemExit("no data to sample, run scripts/generate_data.py first")
+
+    def booking(self):
+        return self.rng.choice(self.bookings)
+
+    def user(self):
+        return self.rng.choice(self.users)
+
+    def fresh(self):
+        self.unique += 1
+        return f"bench-{os.getpid()}-{self.unique}"
+
+
+def inline_params(sql, sample):
+    # parameters for the app.py statements, by their shape; None when the shape is unknown
+    if '%s' not in sql:
+        return lambda: None
+    match = _WHERE_EQ.search(sql.strip())
+    if match and match.group(1).lower() in ('email', 'username'):
+        column = match.group(1).lower()
+        return lambda: (sample.user()[column],)
+    match = _INSERT.match(sql)
+    if match and match.group(1).lower() == 'loginusers':
+        columns = [c.strip().lower() for c in match.group(2).split(',')]
+
+        def values():
+            name = sample.fresh()
+            known = {'email': f"{name}@bench.test", 'username': name, 'passwords': sample.user()['passwords'],
+                     'role': 'guest'}
+            return tuple(known.get(column, 'Bench') for column in columns)
+        return values
+    return None
+
+
+def scenarios(sample):
+    from helper.availability import ACTIVE_STATUSES, AvailabilityIndex
+    from helper import accounts
+    from helper.booking_status import apply_status_to_filter, apply_status_updates
+    from helper.bookings_export import stream_bookings
+    from helper.bookings_query import BOOKING_STATUSES, decode_cursor, fetch_bookings_page
+    from helper.dashboard_stats import read_stats, reconcile, record_status_change, record_status_changes
+    from helper.guest_bookings import fetch_guest_bookings
+    from helper.room_allocation import NoRoomAvailable, allocate_and_insert
+    from helper.statements import STATEMENTS, execute
+
+    rng = sample.rng
+    found = []
+    counts = {}
+    for function, sql in app_statements():
+        params = inline_params(sql, sample)
+        counts[function] = counts.get(function, 0) + 1
+        name = f"{function}[{counts[function] - 1}]"
+        if params is None:
+            print(f"skipped {name}: no parameters known for {' '.join(sql.split())[:80]}")
+            continue
+
+        def run(db, cursor, sql=sql, params=params):
+            cursor.execute(sql, params())
+            if cursor.description:
+                cursor.fetchall()
+        found.append((name, run, False))
+
+    # the account lookups and signup run as prepared statements, the way the routes call them
+    account_sql = {value for value in vars(accounts).values() if isinstance(value, str)}
+    for name, (sql, _, _) in STATEMENTS.items():
+        params = inline_params(sql, sample) if sql in account_sql else None
+        if params is None:
+            continue
+
+        def run(db, cursor, name=name, params=params):
+            execute(cursor, name, params())
+            if cursor.description:
+                cursor.fetchall()
+        found.append((name, run, False))
+
+    def page(filters_for, after=False):
+        def run(db, cursor):
+            filters = filters_for()
+            rows, next_cursor, _ = fetch_bookings_page(cursor, filters, 20)
+            if after and rows:
+                last = rows[-1]
+                fetch_bookings_page(cursor, filters, 20, after=(last['created_at'], last['id']))
+        return run
+
+    def month():
+        start = sample.booking()['check_in']
+        return {'check_in_from': start, 'check_in_to': start + timedelta(days=30)}
+
+    found += [
+        ("dashboard stats", lambda db, cursor: read_stats(cursor), False),
+        ("bookings page", page(lambda: {}), False),
+        ("bookings page 2", page(lambda: {}, after=True), False),
+        ("bookings page status=pending", page(lambda: {'status': ['pending']}), False),
+        ("bookings page status=pending,confirmed", page(lambda: {'status': ['pending', 'confirmed']}), False),
+        ("bookings page room_type", page(lambda: {'room_type': rng.choice(sample.room_types)}), False),
+        ("bookings page email", page(lambda: {'email': sample.booking()['email'].lower()}), False),
+        ("bookings page check_in month", page(month), False),
+    ]
+
+    def guest_page(deep):
+        def run(db, cursor):
+            email = sample.booking()['user_email']
+            after = None
+            for _ in range(3 if deep else 1):
+                body = json.loads(fetch_guest_bookings(cursor, email, 20, after=after))
+                if not body['next_cursor']:
+                    break
+                after = decode_cursor(body['next_cursor'], date.fromisoformat)
+        return run
+
+    found += [
+        ("guest bookings page", guest_page(False), False),
+        ("guest bookings pages 1-3", guest_page(True), False),
+    ]
+
+    def book(db, cursor):
+        check_in = date.today() + timedelta(days=rng.randint(1, 300))
+        user = sample.user()
+        booking = {"first_name": 'Bench', "last_name": 'Guest', "email": user['email'], "phone": '+15550000000',
+                   "room_type": rng.choice(sample.room_types), "people": 2, "user_email": user['email']}
+        try:
+            allocate_and_insert(cursor, booking, check_in, check_in + timedelta(days=rng.randint(1, 5)))
+        except NoRoomAvailable:
+            pass
+
+    def update_status(db, cursor):
+        booking = sample.booking()
+        execute(cursor, 'update_booking_status', (rng.choice(BOOKING_STATUSES), booking['id']))
+        row = cursor.fetchone()
+        if row:
+            record_status_change(cursor, row['id'], row['old_status'], row['status'])
+
+    def batch_status(db, cursor):
+        updates = {sample.booking()['id']: rng.choice(BOOKING_STATUSES) for _ in range(100)}
+        rows = apply_status_updates(cursor, updates)
+        record_status_changes(cursor, [(row['id'], row['old_status'], row['status']) for row in rows])
+
+    def filter_status(db, cursor):
+        rows = apply_status_to_filter(cursor, {'email': sample.booking()['email'].lower(),
+                                               'status': list(ACTIVE_STATUSES)}, 'cancelled')
+        record_status_changes(cursor, [(row['id'], row['old_status'], row['status']) for row in rows])
+
+    def export_month(db, cursor):
+        # the export streams from its own pooled connection through a named cursor
+        for _ in stream_bookings(month(), 'csv'):
+            pass
+
+    found += [
+        ("hotel_booking allocate", book, False),
+        ("status update", update_status, False),
+        ("batch status update x100", batch_status, False),
+        ("status update by guest filter", filter_status, False),
+        ("availability index load", lambda db, cursor: AvailabilityIndex().load(cursor), True),
+        ("export check_in month", export_month, True),
+        ("dashboard reconcile", lambda db, cursor: reconcile(db), True),
+    ]
+    return found
+
+
+def _summary(timings):
+    ordered = sorted(timings)
+    pick = lambda q: ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered))) - 1))]
+    return {"iterations": len(ordered), "avg_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+            "p50_ms": round(pick(0.5) * 1000, 3), "p95_ms": round(pick(0.95) * 1000, 3),
+            "max_ms": round(ordered[-1] * 1000, 3)}
+
+
+def _timed(db, scenario):
+    from helper.query_profiler import ProfilingDictCursor
+
+    started = time.perf_counter()
+    try:
+        with db.cursor(cursor_factory=ProfilingDictCursor) as cursor:
+            scenario(db, cursor)
+        return time.perf_counter() - started
+    finally:
+        db.rollback()
+
+
+def run(args):
+    from helper.db_pool import pooled_connection
+    from helper.query_profiler import ProfilingDictCursor, get_profiler
+
+    profiler = get_profiler()
+    db = pooled_connection()
+    rng = random.Random(args.seed)
+    with db.cursor(cursor_factory=ProfilingDictCursor) as cursor:
+        sample = Sample(cursor, rng)
+        cursor.execute("""
+            SELECT relname, reltuples::bigint AS estimate FROM pg_class
+            WHERE relname IN ('bookings', 'rooms', 'loginusers') AND relkind = 'r'
+        """)
+        scale = {row['relname']: row['estimate'] for row in cursor.fetchall()}
+        cursor.execute("SHOW server_version")
+        server_version = cursor.fetchone()['server_version']
+    db.rollback()
+
+    results = {}
+    for name, scenario, heavy in scenarios(sample):
+        if args.only and not any(part in name for part in args.only):
+            continue
+        iterations = args.heavy_iterations if heavy else args.iterations
+        timings = []
+        for i in range(args.warmup + iterations):
+            if i == args.warmup:
+                profiler.reset()
+            timings.append(_timed(db, scenario))
+        statements, _ = profiler.report(limit=50)
+        for statement in statements:
+            del statement['plan'], statement['plan_analyzed']
+        if args.plans:
+            # one more run with every statement counted as slow; the plans are captured
+            # afterwards, so EXPLAIN ANALYZE never overlaps the timed iterations
+            profiler.slow = 0
+            _timed(db, scenario)
+            profiler.wait_for_plans()
+            profiler.slow = float('inf')
+            plans = {row['fingerprint']: row['plan'] for row in profiler.report(limit=50)[0]}
+            for statement in statements:
+                statement['plan'] = plans.get(statement['fingerprint'])
+        results[name] = dict(_summary(timings[args.warmup:]), statements=statements,
+                             statements_per_iteration=round(sum(s['count'] for s in statements) / iterations, 2))
+        print(f"{name:<42}{results[name]['p50_ms']:>10}{results[name]['p95_ms']:>10}{results[name]['max_ms']:>10}"
+              f"{results[name]['statements_per_iteration']:>8}")
+        for statement in statements:
+            print(f"    {statement['count']:>5}x {statement['avg_ms']:>9} avg {statement['p95_ms']:>9} p95  "
+                  f"{statement['fingerprint'][:90]}")
+    db.close()
+    return scale, server_version, results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=BACKEND).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(base_path, head_path, threshold):
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(head_path) as f:
+        head = json.load(f)
+    print(f"{base['meta'].get('commit')} ({base['meta']['scale'].get('bookings')} bookings) -> "
+          f"{head['meta'].get('commit')} ({head['meta']['scale'].get('bookings')} bookings)")
+    regressed = False
+    for name in sorted(set(base['scenarios']) | set(head['scenarios'])):
+        if name not in base['scenarios'] or name not in head['scenarios']:
+            print(f"{name:<42} only in {'head' if name in head['scenarios'] else 'base'}")
+            continue
+        b, h = base['scenarios'][name], head['scenarios'][name]
+        cells = []
+        for key in ('p50_ms', 'p95_ms'):
+            change = (h[key] - b[key]) / b[key] * 100 if b[key] else 0.0
+            flag = ''
+            if key == 'p95_ms' and change > threshold:
+                flag = ' !'
+                regressed = True
+            cells.append(f"{key}={b[key]}->{h[key]} ({change:+.1f}%){flag}")
+        if b.get('statements_per_iteration') != h.get('statements_per_iteration'):
+            cells.append(f"statements={b.get('statements_per_iteration')}->{h.get('statements_per_iteration')}")
+        print(f"{name:<42} " + '  '.join(cells))
+    return 1 if regressed else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the API's SQL statements against the current data")
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--heavy-iterations', type=int, default=3,
+                        help="iterations for the whole-table scenarios (availability load, export, reconcile)")
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--only', nargs='*', help="run the scenarios whose name contains any of these")
+    parser.add_argument('--plans', action='store_true', help="capture an EXPLAIN (ANALYZE, BUFFERS) per statement")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help="write the results to this file")
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'HEAD'), help="compare two --json results")
+    parser.add_argument('--threshold', type=float, default=10.0, help="percent p95 increase counted as a regression")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        return compare(*args.compare, args.threshold)
+
+    load_dotenv()
+    # the profiler is configured from the environment on first use
+    os.environ.update({"QUERY_PROFILE": "true", "QUERY_LOG_SECONDS": "0", "SLOW_QUERY_MS": "inf",
+                       "EXPLAIN_SAMPLE_RATE": "1", "EXPLAIN_INTERVAL_SECONDS": "1e9"})
+    started_at = datetime.now(timezone.utc).isoformat()
+    print(f"{'scenario':<42}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'stmts':>8}")
+    scale, server_version, results = run(args)
+    if args.json:
+        options = {k: v for k, v in vars(args).items() if k not in ('compare', 'json')}
+        result = {"meta": {"commit": _git_commit(), "started_at": started_at, "scale": scale,
+                           "server_version": server_version, "options": options},
+                  "scenarios": results}
+        directory = os.path.dirname(args.json)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2, default=str)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""Compare the WSGI (app.py) and ASGI (asgi.py) serving modes under many keep-alive clients.
+
+Start the servers first, e.g. from backend/:
+
+    BIND=127.0.0.1:5000 WEB_CONCURRENCY=4 gunicorn -c gunicorn.conf.py
+    uvicorn asgi:app --workers 4 --port 8000
+
+then point the benchmark at both:
+
+    python scripts/bench_serving.py --target wsgi=http://127.0.0.1:5000 \\
+        --target asgi=http://127.0.0.1:8000 --path /me --cookie "access_token=..." \\
+        --clients 1000 --duration 20
+
+Each client holds one HTTP/1.1 keep-alive connection and sends requests back to back.
+Prints throughput, latency percentiles and error counts per target, and can write them as JSON.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from urllib.parse import urlsplit
+
+
+async def _read_response(reader):
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split(' ', 2)[1])
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+    if headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readuntil(b'\r\n')).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.readexactly(int(headers.get('content-length', 0)))
+    return status, headers.get('connection', '').lower() != 'close'
+
+
+async def _client(host, port, request, deadline, latencies, errors, start_gate):
+    await start_gate.wait()
+    writer = None
+    while time.perf_counter() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            started = time.perf_counter()
+            writer.write(request)
+            status, keep_alive = await _read_response(reader)
+            latencies.append(time.perf_counter() - started)
+            if status >= 400:
+                errors[status] = errors.get(status, 0) + 1
+            if not keep_alive:
+                writer.close()
+                writer = None
+        except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+            errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+            if writer is not None:
+                writer.close()
+            writer = None
+            await asyncio.sleep(0.05)
+    if writer is not None:
+        writer.close()
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * fraction))
+    return sorted_values[index]
+
+
+async def run_target(url, path, cookie, clients, duration):
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    headers = [f"GET {path} HTTP/1.1", f"Host: {parts.netloc}", "Connection: keep-alive"]
+    if cookie:
+        headers.append(f"Cookie: {cookie}")
+    request = ('\r\n'.join(headers) + '\r\n\r\n').encode('latin-1')
+
+    latencies = []
+    errors = {}
+    start_gate = asyncio.Event()
+    deadline = time.perf_counter() + duration + 1
+    tasks = [asyncio.create_task(_client(host, port, request, deadline, latencies, errors, start_gate))
+             for _ in range(clients)]
+    await asyncio.sleep(1)
+    start_gate.set()
+    started = time.perf_counter()
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "url": url + path,
+        "clients": clients,
+        "requests": len(latencies),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 2),
+        "errors": errors,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Keep-alive load test for the WSGI and ASGI serving modes")
+    parser.add_argument('--target', action='append', required=True, metavar='NAME=URL',
+                        help="server to test, repeatable")
+    parser.add_argument('--path', default='/health/live')
+    parser.add_argument('--cookie', help="Cookie header to send, e.g. access_token=...")
+    parser.add_argument('--clients', type=int, default=500)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for target in args.target:
+        name, _, url = target.partition('=')
+        result = asyncio.run(run_target(url.rstrip('/'), args.path, args.cookie, args.clients, args.duration))
+        results[name] = result
+        print(f"{name}: {result['throughput_rps']} req/s over {result['requests']} requests, "
+              f"p50={result['p50_ms']}ms p95={result['p95_ms']}ms p99={result['p99_ms']}ms "
+              f"errors={result['errors'] or 0}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
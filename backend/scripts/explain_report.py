@@ -0,0 +1,143 @@
+"""Compare query plans from before the booking migrations against the current ones.
+
+Run from backend/ after `python -m helper.migrate`:
+
+    python scripts/explain_report.py > ../docs/explain_report.md
+
+The before side is the SQL the app ran before these changes. It runs inside a transaction
+that drops the indexes added by migrations 0003, 0004 and 0008 first and is rolled back
+afterwards, so it is planned against the old schema. DROP INDEX locks bookings and rooms
+until that rollback, so point this at a copy of the database or run it when traffic is quiet.
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+
+from helper.bookings_query import build_page_query
+from helper.dashboard_stats import STATS_QUERY
+from helper.db_pool import database_connection
+from helper.guest_bookings import GUEST_BOOKINGS
+
+MIGRATION_INDEXES = [
+    'bookings_status_check_in_check_out_idx',
+    'bookings_created_at_idx',
+    'bookings_user_email_idx',
+    'rooms_status_idx',
+    'bookings_created_at_id_idx',
+    'bookings_status_created_at_id_idx',
+    'bookings_lower_email_idx',
+    'bookings_user_email_check_in_idx',
+]
+
+RECENT_BOOKINGS_SQL, RECENT_BOOKINGS_PARAMS = build_page_query({}, 10)
+
+
+def queries(guest_email):
+    # (name, before SQL, before params, after SQL, after params)
+    return [
+        ("Active guests",
+         """SELECT COUNT(DISTINCT email) as active_guests
+            FROM bookings
+            WHERE check_in <= CURRENT_DATE
+            AND (check_in + (duration || ' days')::interval) >= CURRENT_DATE
+            AND status = 'confirmed'""", (),
+         """SELECT COUNT(DISTINCT email) FROM bookings
+            WHERE status = 'confirmed'
+            AND check_in <= CURRENT_DATE
+            AND check_out >= CURRENT_DATE""", ()),
+        ("Recent bookings listing",
+         """SELECT
+                b.id,
+                b.first_name || ' ' || b.last_name as guest_name,
+                b.email,
+                b.phone,
+                b.room_type,
+                b.people,
+                b.check_in,
+                b.duration,
+                (b.check_in + (b.duration || ' days')::interval)::date as check_out,
+                b.status,
+                b.created_at
+            FROM bookings b
+            ORDER BY b.created_at DESC
+            LIMIT 10""", (),
+         RECENT_BOOKINGS_SQL, RECENT_BOOKINGS_PARAMS),
+        # there was no per-guest query before /me/bookings, so both sides run today's query and
+        # only the indexes differ
+        ("Guest bookings by email",
+         GUEST_BOOKINGS, (guest_email, 21),
+         GUEST_BOOKINGS, (guest_email, 21)),
+        # the dashboard counted rooms on every request, it now reads the reconciled snapshot
+        ("Dashboard room counts",
+         """SELECT
+                (SELECT COUNT(*) FROM rooms WHERE status = 'available') as available_rooms,
+                (SELECT COUNT(*) FROM rooms) as total_rooms""", (),
+         STATS_QUERY, ()),
+    ]
+
+
+def explain(cursor, sql, params=()):
+    cursor.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql, params)
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]
+
+
+def summarize(plan):
+    root = plan['Plan']
+    return {
+        "node": root['Node Type'],
+        "execution_ms": plan.get('Execution Time'),
+        "planning_ms": plan.get('Planning Time'),
+        "shared_hit": root.get('Shared Hit Blocks', 0),
+        "shared_read": root.get('Shared Read Blocks', 0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN ANALYZE the dashboard and listing queries before and after the migrations")
+    parser.add_argument('--guest-email', default='guest0@gen.test',
+                        help="account whose bookings are listed (default: the first one scripts/generate_data.py makes)")
+    args = parser.parse_args()
+    report = queries(args.guest_email)
+
+    load_dotenv()
+    db = database_connection()
+    try:
+        with db.cursor() as cursor:
+            cursor.execute("SELECT (SELECT COUNT(*) FROM bookings), (SELECT COUNT(*) FROM rooms)")
+            bookings, rooms = cursor.fetchone()
+        print("# EXPLAIN ANALYZE: before and after the booking migrations\n")
+        print(f"{bookings} bookings, {rooms} rooms.\n")
+        print("| Query | Before | After |")
+        print("| --- | --- | --- |")
+        with db.cursor() as cursor:
+            for index in MIGRATION_INDEXES:
+                cursor.execute(f"DROP INDEX IF EXISTS {index}")
+            befores = [explain(cursor, sql, params) for _, sql, params, _, _ in report]
+        db.rollback()
+        with db.cursor() as cursor:
+            afters = [explain(cursor, sql, params) for _, _, _, sql, params in report]
+        db.rollback()
+        details = []
+        for (name, *_), before, after in zip(report, befores, afters):
+            b, a = summarize(before), summarize(after)
+            print(f"| {name} | {b['node']}, {b['execution_ms']:.2f} ms, {b['shared_hit'] + b['shared_read']} buffers "
+                  f"| {a['node']}, {a['execution_ms']:.2f} ms, {a['shared_hit'] + a['shared_read']} buffers |")
+            details.append((name, before, after))
+        for name, before, after in details:
+            print(f"\n## {name}\n")
+            print("Before:\n\n```json\n" + json.dumps(before['Plan'], indent=2) + "\n```\n")
+            print("After:\n\n```json\n" + json.dumps(after['Plan'], indent=2) + "\n```")
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,313 @@
+"""Generate realistic loginusers, rooms and bookings at scale, bulk-loaded through COPY.
+
+Run from backend/ after `python -m helper.migrate`, against a database you don't mind filling:
+
+    python scripts/generate_data.py --bookings 100000
+    python scripts/generate_data.py --bookings 50000000 --seed 7   # expect a long load
+    python scripts/generate_data.py --clean                      # remove everything generated
+
+Every room gets its own timeline of stays, so bookings never overlap on a room and the
+allocation constraint holds. Gaps between stays shrink in high season (summer, December)
+and check-ins lean towards Fridays, so occupancy and check-in dates follow the calendar.
+Statuses depend on where the stay sits relative to today (past stays are mostly completed,
+future ones pending or confirmed, a share of each cancelled), created_at precedes check_in
+by a lead time, and a minority of guests make most of the bookings.
+
+Generated rows are marked (rooms `G-...`, users and booking owners `@gen.test`) so --clean
+can remove them. Bookings are committed every --commit-every rows; the dashboard counters
+are reconciled and the tables analyzed at the end. Running servers pick up the new rooms
+after AVAILABILITY_REFRESH_SECONDS.
+"""
+import argparse
+import heapq
+import math
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+
+from helper.booking_import import _CopySource
+from helper.dashboard_stats import reconcile
+from helper.db_pool import database_connection
+
+DOMAIN = 'gen.test'
+ROOM_PREFIX = 'G-'
+
+# share of rooms, and how many people a booking of that type brings
+ROOM_TYPES = {
+    'standard': (0.40, (1, 2)),
+    'deluxe': (0.30, (1, 3)),
+    'executive': (0.20, (1, 2)),
+    'suite': (0.10, (2, 5)),
+}
+MAINTENANCE_SHARE = 0.03
+
+# occupancy relative to the yearly average, by month
+SEASON = (0.70, 0.75, 0.85, 0.95, 1.00, 1.20, 1.35, 1.35, 1.00, 0.90, 0.75, 1.10)
+
+# length of stay in nights and its weight
+DURATIONS = ((1, 22), (2, 26), (3, 18), (4, 11), (5, 7), (6, 4), (7, 6), (10, 3), (14, 3))
+
+# (past, current, future) stays
+STATUS_MIX = {
+    'past': (('completed', 0.82), ('cancelled', 0.15), ('confirmed', 0.02), ('pending', 0.01)),
+    'current': (('confirmed', 0.92), ('cancelled', 0.05), ('pending', 0.03)),
+    'future': (('confirmed', 0.55), ('pending', 0.35), ('cancelled', 0.10)),
+}
+
+FIRST_NAMES = ('James', 'Mary', 'Kwame', 'Ama', 'Wei', 'Sofia', 'Liam', 'Amara', 'Noah', 'Yuki',
+               'Omar', 'Elena', 'Kofi', 'Priya', 'Lucas', 'Fatima', 'Mateo', 'Zara', 'Ethan', 'Nia')
+LAST_NAMES = ('Mensah', 'Smith', 'Garcia', 'Chen', 'Okafor', 'Muller', 'Silva', 'Kim', 'Boateng',
+              'Rossi', 'Nguyen', 'Ansah', 'Khan', 'Dubois', 'Owusu', 'Tanaka', 'Brown', 'Asante')
+
+
+def _weighted(options):
+    values = [value for value, _ in options]
+    cumulative = []
+    total = 0
+    for _, weight in options:
+        total += weight
+        cumulative.append(total)
+    return values, cumulative
+
+
+class Generator:
+    def __init__(self, args, today):
+        self.args = args
+        self.today = today
+        self.random = random.Random(args.seed)
+        self.start = today - timedelta(days=args.past_days)
+        self.end = today + timedelta(days=args.future_days)
+        self.durations, self.duration_weights = _weighted(DURATIONS)
+        self.mean_duration = sum(n * w for n, w in DURATIONS) / sum(w for _, w in DURATIONS)
+        self.statuses = {period: _weighted(mix) for period, mix in STATUS_MIX.items()}
+        self.now = datetime.now()
+
+    def stays_per_room(self, sample=200):
+        # measured on a sample of timelines with their own random stream, so seasons and
+        # weekend nudges are accounted for
+        rng = random.Random(self.args.seed + 1)
+        first, last = self.start.toordinal(), self.end.toordinal()
+        stays = 0
+        for _ in range(sample):
+            day = first + rng.randrange(0, 14)
+            while day < last:
+                day, nights = self._stay(day, rng)
+                stays += 1
+                day += nights + self._gap(day, rng)
+        return stays / sample
+
+    def room_count(self):
+        # 2% spare; the load stops at --bookings, trimming the far end of the future
+        return max(len(ROOM_TYPES), math.ceil(self.args.bookings / self.stays_per_room() * 1.02))
+
+    def rooms(self, count):
+        types = list(ROOM_TYPES)
+        shares = [ROOM_TYPES[t][0] for t in types]
+        for n in range(count):
+            room_type = self.random.choices(types, shares)[0]
+            status = 'maintenance' if self.random.random() < MAINTENANCE_SHARE else 'available'
+            yield f"{ROOM_PREFIX}{n}\t{room_type}\t{status}\n"
+
+    def user(self, n):
+        first = FIRST_NAMES[n % len(FIRST_NAMES)]
+        last = LAST_NAMES[(n // len(FIRST_NAMES)) % len(LAST_NAMES)]
+        return first, last, f"guest{n}@{DOMAIN}"
+
+    def users(self, count, password_hash):
+        for n in range(count):
+            first, last, email = self.user(n)
+            yield f"{first}\t{last}\t{email}\tgen_guest_{n}\t{password_hash}\tguest\n"
+        yield f"Gen\tAdmin\tadmin@{DOMAIN}\tgen_admin\t{password_hash}\tadmin\n"
+
+    def _stay(self, day, rng):
+        if date.fromordinal(day).weekday() < 4 and rng.random() < 0.3:
+            # weekend breaks: nudge a share of check-ins to the coming Friday
+            day += 4 - date.fromordinal(day).weekday()
+        return day, rng.choices(self.durations, cum_weights=self.duration_weights)[0]
+
+    def _gap(self, day, rng):
+        # mean idle nights after a stay, shorter when the season runs above average
+        occupancy = min(0.97, self.args.occupancy * SEASON[date.fromordinal(day).month - 1])
+        mean = self.mean_duration * (1 - occupancy) / occupancy
+        return int(rng.expovariate(1 / mean))
+
+    def _status(self, check_in, check_out):
+        if check_out <= self.today:
+            period = 'past'
+        elif check_in <= self.today:
+            period = 'current'
+        else:
+            period = 'future'
+        values, cumulative = self.statuses[period]
+        return self.random.choices(values, cum_weights=cumulative)[0]
+
+    def _created_at(self, check_in):
+        lead = min(365.0, self.random.expovariate(1 / 35))
+        created = datetime.combine(check_in, datetime.min.time()) - timedelta(days=lead)
+        if created > self.now:
+            created = self.now - timedelta(minutes=self.random.uniform(1, 60 * 24 * 30))
+        return created
+
+    def bookings(self, rooms, users, progress):
+        # every room's next free night sits in a heap, so rows come out in check-in order
+        # (ids then grow with time, as they do in production) without holding whole timelines
+        rng = self.random
+        last = self.end.toordinal()
+        heap = [(self.start.toordinal() + rng.randrange(0, 14), room_id, room_type) for room_id, room_type in rooms]
+        heapq.heapify(heap)
+        written = 0
+        while heap and written < self.args.bookings:
+            day, room_id, room_type = heap[0]
+            if day >= last:
+                heapq.heappop(heap)
+                continue
+            day, nights = self._stay(day, rng)
+            heapq.heapreplace(heap, (day + nights + self._gap(day, rng), room_id, room_type))
+            check_in = date.fromordinal(day)
+            people_low, people_high = ROOM_TYPES[room_type][1]
+            # a minority of repeat guests make most of the bookings
+            n = int(users * rng.random() ** 1.6)
+            first, last_name, user_email = self.user(n)
+            email = user_email if rng.random() < 0.85 else f"contact{n}@{DOMAIN}"
+            written += 1
+            progress(written)
+            yield (f"{first}\t{last_name}\t{email}\t+1555{rng.randrange(10 ** 7):07d}\t{room_type}\t"
+                   f"{rng.randint(people_low, people_high)}\t{check_in.isoformat()}\t{nights}\t"
+                   f"{self._status(check_in, check_in + timedelta(days=nights))}\t{user_email}\t"
+                   f"{self._created_at(check_in).isoformat(sep=' ')}\t{room_id}\n")
+
+
+def _chunks(lines, size=1 << 20):
+    parts, length = [], 0
+    for line in lines:
+        parts.append(line)
+        length += len(line)
+        if length >= size:
+            yield ''.join(parts).encode('utf-8')
+            parts, length = [], 0
+    if parts:
+        yield ''.join(parts).encode('utf-8')
+
+
+def _take(iterator, n):
+    for _ in range(n):
+        item = next(iterator, None)
+        if item is None:
+            return
+        yield item
+
+
+def clean(db):
+    with db.cursor() as cursor:
+        cursor.execute("DELETE FROM bookings WHERE user_email LIKE %s", (f"%@{DOMAIN}",))
+        bookings = cursor.rowcount
+        # bookings made through the API while the generated rooms existed may sit in one of them;
+        # they are kept, only without a room
+        cursor.execute("""
+            UPDATE bookings SET room_id = NULL
+            WHERE room_id IN (SELECT id FROM rooms WHERE room_number LIKE %s)
+        """, (f"{ROOM_PREFIX}%",))
+        cursor.execute("DELETE FROM rooms WHERE room_number LIKE %s", (f"{ROOM_PREFIX}%",))
+        rooms = cursor.rowcount
+        cursor.execute("DELETE FROM loginusers WHERE email LIKE %s", (f"%@{DOMAIN}",))
+        users = cursor.rowcount
+    reconcile(db)
+    db.commit()
+    return bookings, rooms, users
+
+
+def generate(db, args):
+    import bcrypt
+
+    generator = Generator(args, date.today())
+    users = args.users or max(100, args.bookings // 4)
+    room_count = args.rooms or generator.room_count()
+    started = time.monotonic()
+
+    with db.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM rooms WHERE room_number LIKE %s LIMIT 1", (f"{ROOM_PREFIX}%",))
+        if cursor.fetchone():
+            raise SystemExit("generated data already present, run with --clean first")
+
+        password_hash = bcrypt.hashpw(args.password.encode('utf-8'), bcrypt.gensalt(4)).decode('utf-8')
+        cursor.copy_expert("COPY loginusers (firstname, lastname, email, username, passwords, role) FROM STDIN",
+                           _CopySource(_chunks(generator.users(users, password_hash))))
+        cursor.copy_expert("COPY rooms (room_number, room_type, status) FROM STDIN",
+                           _CopySource(_chunks(generator.rooms(room_count))))
+        db.commit()
+        cursor.execute("SELECT id, room_type FROM rooms WHERE room_number LIKE %s ORDER BY id", (f"{ROOM_PREFIX}%",))
+        rooms = cursor.fetchall()
+    print(f"{users} users, {room_count} rooms ({generator.stays_per_room():.0f} stays per room over "
+          f"{args.past_days + args.future_days} days)")
+
+    last_report = [time.monotonic()]
+
+    def progress(written):
+        now = time.monotonic()
+        if now - last_report[0] >= 10:
+            last_report[0] = now
+            print(f"  {written} bookings, {written / (now - started):.0f} rows/s")
+
+    rows = generator.bookings(rooms, users, progress)
+    loaded = 0
+    while True:
+        batch = _CopySource(_chunks(_take(rows, args.commit_every)))
+        with db.cursor() as cursor:
+            cursor.copy_expert("""
+                COPY bookings (first_name, last_name, email, phone, room_type, people, check_in, duration,
+                               status, user_email, created_at, room_id) FROM STDIN
+            """, batch)
+            count = cursor.rowcount
+        db.commit()
+        if count <= 0:
+            break
+        loaded += count
+    if loaded < args.bookings:
+        print(f"the room timelines ran out at {loaded} bookings, pass a larger --rooms")
+
+    print(f"loaded {loaded} bookings in {time.monotonic() - started:.1f}s, reconciling counters")
+    reconcile(db)
+    db.commit()
+    db.autocommit = True
+    with db.cursor() as cursor:
+        cursor.execute("ANALYZE loginusers, rooms, bookings")
+    print(f"done in {time.monotonic() - started:.1f}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate users, rooms and bookings at scale")
+    parser.add_argument('--bookings', type=int, default=100000)
+    parser.add_argument('--users', type=int, help="guest accounts (default: bookings / 4, at least 100)")
+    parser.add_argument('--rooms', type=int, help="rooms (default: enough for --bookings at --occupancy)")
+    parser.add_argument('--occupancy', type=float, default=0.7, help="average share of nights booked")
+    parser.add_argument('--past-days', type=int, default=730)
+    parser.add_argument('--future-days', type=int, default=365)
+    parser.add_argument('--commit-every', type=int, default=1000000, help="bookings per COPY transaction")
+    parser.add_argument('--password', default='gen-password', help="password of every generated account")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--clean', action='store_true', help="remove the generated rows and exit")
+    args = parser.parse_args(argv)
+    if not 0 < args.occupancy < 1:
+        parser.error("--occupancy must be between 0 and 1")
+
+    load_dotenv()
+    db = database_connection()
+    try:
+        if args.clean:
+            bookings, rooms, users = clean(db)
+            print(f"removed {bookings} bookings, {rooms} rooms, {users} users")
+        else:
+            generate(db, args)
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
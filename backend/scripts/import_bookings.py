@@ -0,0 +1,49 @@
+"""Bulk-load bookings from a CSV or NDJSON file through COPY.
+
+Run from backend/:
+
+    python scripts/import_bookings.py allotments.csv --user-email partner@example.com
+    python scripts/import_bookings.py group.ndjson --format ndjson
+
+Columns: first_name, last_name, email, phone, room_type, people, check_in, duration,
+and optionally status, user_email, external_ref.
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+
+from helper.booking_import import import_bookings, read_csv_rows, read_ndjson_rows
+from helper.db_pool import database_connection
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-load bookings through COPY")
+    parser.add_argument('path', help="CSV or NDJSON file, '-' for stdin")
+    parser.add_argument('--format', choices=['csv', 'ndjson'],
+                        help="defaults to the file extension, csv otherwise")
+    parser.add_argument('--user-email', default='import@hotel.local',
+                        help="account the bookings belong to when a row has no user_email")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ('ndjson' if args.path.endswith(('.ndjson', '.jsonl')) else 'csv')
+    load_dotenv()
+    stream = sys.stdin if args.path == '-' else open(args.path, encoding='utf-8', newline='')
+    db = database_connection()
+    try:
+        rows = read_csv_rows(stream) if fmt == 'csv' else read_ndjson_rows(stream)
+        report = import_bookings(db, rows, args.user_email)
+    finally:
+        db.close()
+        if stream is not sys.stdin:
+            stream.close()
+    print(json.dumps(report, indent=2))
+    return 0 if not report['rejected'] and not report['duplicates'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""Concurrency stress test for room allocation against a local Postgres.
+
+Run from backend/ after `python -m helper.migrate`:
+
+    python scripts/stress_allocation.py --clients 150 --rooms 40
+
+Creates a throw-away room type, lets every client book the same stay in parallel
+(each on its own connection), then checks that no room was handed out twice and
+that exactly min(clients, rooms) bookings succeeded. The rows are removed afterwards.
+Keep --clients below the server's max_connections; Postgres ships with 100, so raise it
+(ALTER SYSTEM SET max_connections = 200, then restart) before the default run.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+import uuid
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+from psycopg2.extras import RealDictCursor
+
+from helper.dashboard_stats import COUNTER_SHARDS
+from helper.db_pool import database_connection
+from helper.room_allocation import NoRoomAvailable, allocate_and_insert
+
+
+def setup(room_type, rooms):
+    db = database_connection()
+    with db.cursor() as cursor:
+        for number in range(rooms):
+            cursor.execute("INSERT INTO rooms (room_number, room_type, status) VALUES (%s, %s, 'available')",
+                           (f"{room_type}-{number}", room_type))
+    db.commit()
+    db.close()
+
+
+def cleanup(room_type):
+    db = database_connection()
+    with db.cursor() as cursor:
+        cursor.execute("SELECT id, status FROM bookings WHERE room_type = %s", (room_type,))
+        booked = cursor.fetchall()
+        cursor.execute("DELETE FROM bookings WHERE room_type = %s", (room_type,))
+        cursor.execute("DELETE FROM rooms WHERE room_type = %s", (room_type,))
+        # keep the dashboard counters in step with the rows we just removed
+        for booking_id, status in booked:
+            cursor.execute("UPDATE booking_counters SET n = n - 1 WHERE status = %s AND shard = %s",
+                           (status, booking_id % COUNTER_SHARDS))
+    db.commit()
+    db.close()
+
+
+def client(room_type, check_in, check_out, barrier, results, index):
+    try:
+        db = database_connection()
+    except Exception as e:
+        # release everyone else from the barrier; the run is reported as failed
+        barrier.abort()
+        results[index] = ('error', repr(e), 0.0)
+        return
+    try:
+        barrier.wait()
+        start = time.perf_counter()
+        with db.cursor(cursor_factory=RealDictCursor) as cursor:
+            try:
+                row = allocate_and_insert(cursor, {
+                    "first_name": "Stress", "last_name": str(index), "email": f"stress{index}@example.com",
+                    "phone": "000", "room_type": room_type, "people": 1, "user_email": f"stress{index}@example.com",
+                }, check_in, check_out)
+                db.commit()
+                results[index] = ('booked', row['room_id'], time.perf_counter() - start)
+            except NoRoomAvailable:
+                db.rollback()
+                results[index] = ('full', None, time.perf_counter() - start)
+    except Exception as e:
+        results[index] = ('error', repr(e), 0.0)
+    finally:
+        db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parallel room allocation stress test")
+    parser.add_argument('--clients', type=int, default=120)
+    parser.add_argument('--rooms', type=int, default=40)
+    parser.add_argument('--nights', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    room_type = f"stress-{uuid.uuid4().hex[:8]}"
+    check_in = date.today() + timedelta(days=30)
+    check_out = check_in + timedelta(days=args.nights)
+    setup(room_type, args.rooms)
+    try:
+        results = [None] * args.clients
+        barrier = threading.Barrier(args.clients)
+        threads = [threading.Thread(target=client, args=(room_type, check_in, check_out, barrier, results, i))
+                   for i in range(args.clients)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        booked = [r for r in results if r[0] == 'booked']
+        full = [r for r in results if r[0] == 'full']
+        failed = [r for r in results if r[0] == 'error']
+        rooms = [r[1] for r in booked]
+        latencies = sorted(r[2] for r in booked + full)
+
+        print(f"clients={args.clients} rooms={args.rooms} elapsed={elapsed:.3f}s "
+              f"throughput={len(results) / elapsed:.1f} req/s")
+        print(f"booked={len(booked)} full={len(full)} errors={len(failed)}")
+        if latencies:
+            print(f"latency p50={latencies[len(latencies) // 2] * 1000:.1f}ms "
+                  f"p99={latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f}ms")
+        for error in failed[:5]:
+            print("error:", error[1])
+
+        ok = (len(rooms) == len(set(rooms))
+              and len(booked) == min(args.clients, args.rooms)
+              and not failed)
+        print("PASS: no room allocated twice" if ok else "FAIL")
+        return 0 if ok else 1
+    finally:
+        cleanup(room_type)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
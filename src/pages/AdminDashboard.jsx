@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { useAuth } from '../context/AuthContext';
 import api from '../services/api';
@@ -9,22 +9,85 @@ const AdminDashboard = () => {
   const navigate = useNavigate();
   const [stats, setStats] = useState(null);
   const [bookings, setBookings] = useState([]);
+  const [cursors, setCursors] = useState({ next: null, prev: null });
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
+  const onFirstPage = useRef(true);
 
   useEffect(() => {
     fetchDashboardData();
   }, []);
 
-  const fetchDashboardData = async () => {
+  useEffect(() => {
+    // Live changes from every admin tab; the server ends the stream when the access token expires
+    let source;
+    let retryTimer;
+    const connect = () => {
+      source = new EventSource(`${api.defaults.baseURL}/admin/events`, { withCredentials: true });
+      source.addEventListener('booking.created', (e) => applyBookingCreated(JSON.parse(e.data)));
+      source.addEventListener('booking.status_changed', (e) => applyStatusChanged(JSON.parse(e.data)));
+      // Bulk changes and missed events: too much to patch in, so reload
+      source.addEventListener('bookings.changed', () => fetchDashboardData(false));
+      source.addEventListener('resync', () => fetchDashboardData(false));
+      source.onerror = () => {
+        if (source.readyState === EventSource.CLOSED) {
+          retryTimer = setTimeout(async () => {
+            try {
+              await api.post('/refresh');
+            } catch (refreshError) {
+              return;
+            }
+            connect();
+          }, 3000);
+        }
+      };
+    };
+    connect();
+    return () => {
+      clearTimeout(retryTimer);
+      source.close();
+    };
+  }, []);
+
+  const applyBookingCreated = (booking) => {
+    // Only the first page shows the newest bookings
+    if (onFirstPage.current) {
+      setBookings((current) =>
+        current.some((b) => b.id === booking.id) ? current : [booking, ...current]
+      );
+    }
+    setStats((current) =>
+      current && {
+        ...current,
+        totalBookings: current.totalBookings + 1,
+        pendingBookings: current.pendingBookings + 1,
+      }
+    );
+  };
+
+  const applyStatusChanged = ({ id, status, old_status }) => {
+    setBookings((current) =>
+      current.map((booking) => (booking.id === id ? { ...booking, status } : booking))
+    );
+    const statKeys = { pending: 'pendingBookings', confirmed: 'confirmedBookings' };
+    setStats((current) => {
+      if (!current) return current;
+      const next = { ...current };
+      if (statKeys[old_status]) next[statKeys[old_status]] -= 1;
+      if (statKeys[status]) next[statKeys[status]] += 1;
+      return next;
+    });
+  };
+
+  const fetchDashboardData = async (showSpinner = true) => {
     try {
-      setLoading(true);
+      setLoading(showSpinner);
       const [statsRes, bookingsRes] = await Promise.all([
         api.get('/admin/dashboard/stats'),
         api.get('/admin/bookings'),
       ]);
       setStats(statsRes.data);
-      setBookings(bookingsRes.data);
+      applyBookingsPage(bookingsRes.data);
     } catch (error) {
       setError('Failed to load dashboard data');
       console.error('Error fetching dashboard data:', error);
@@ -33,12 +96,33 @@ const AdminDashboard = () => {
     }
   };
 
+  const applyBookingsPage = (page) => {
+    onFirstPage.current = !page.prev_cursor;
+    setBookings(page.bookings);
+    setCursors({ next: page.next_cursor, prev: page.prev_cursor });
+  };
+
+  const fetchBookingsPage = async (params) => {
+    try {
+      const response = await api.get('/admin/bookings', { params });
+      applyBookingsPage(response.data);
+    } catch (error) {
+      setError('Failed to load bookings');
+      console.error('Error fetching bookings:', error);
+    }
+  };
+
   const handleStatusUpdate = async (bookingId, newStatus) => {
     try {
-      await api.put(`/admin/bookings/${bookingId}/status`, { status: newStatus });
-      // Refresh bookings after update
-      const response = await api.get('/admin/bookings');
-      setBookings(response.data);
+      const response = await api.put(`/admin/bookings/${bookingId}/status`, { status: newStatus });
+      // Update the row in place instead of refetching the whole page
+      setBookings((current) =>
+        current.map((booking) =>
+          booking.id === bookingId
+            ? { ...booking, status: response.data.new_status }
+            : booking
+        )
+      );
     } catch (error) {
       alert('Failed to update booking status');
       console.error('Error updating status:', error);
@@ -143,7 +227,7 @@ const AdminDashboard = () => {
         <div className="bookings-section">
           <div className="section-header">
             <h2>Recent Bookings</h2>
-            <button onClick={fetchDashboardData} className="btn-refresh">
+            <button onClick={() => fetchDashboardData()} className="btn-refresh">
               🔄 Refresh
             </button>
           </div>
@@ -214,6 +298,23 @@ const AdminDashboard = () => {
               </table>
             </div>
           )}
+
+          <div className="pagination">
+            <button
+              onClick={() => fetchBookingsPage({ before: cursors.prev })}
+              disabled={!cursors.prev}
+              className="btn-secondary"
+            >
+              ← Newer
+            </button>
+            <button
+              onClick={() => fetchBookingsPage({ after: cursors.next })}
+              disabled={!cursors.next}
+              className="btn-secondary"
+            >
+              Older →
+            </button>
+          </div>
         </div>
       </div>
     </div>
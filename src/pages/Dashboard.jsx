@@ -1,11 +1,34 @@
-import React from 'react';
+import React, { useState, useEffect } from 'react';
 import { Link, useNavigate } from 'react-router-dom';
 import { useAuth } from '../context/AuthContext';
+import api from '../services/api';
 import './Dashboard.css';
 
 const Dashboard = () => {
   const { user, logout } = useAuth();
   const navigate = useNavigate();
+  const [bookings, setBookings] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingBookings, setLoadingBookings] = useState(true);
+  const [bookingsError, setBookingsError] = useState('');
+
+  useEffect(() => {
+    fetchMyBookings();
+  }, []);
+
+  const fetchMyBookings = async (after) => {
+    try {
+      setLoadingBookings(true);
+      const response = await api.get('/me/bookings', { params: after ? { after } : {} });
+      setBookings((current) => (after ? [...current, ...response.data.bookings] : response.data.bookings));
+      setNextCursor(response.data.next_cursor);
+    } catch (error) {
+      setBookingsError('Failed to load your bookings');
+      console.error('Error fetching bookings:', error);
+    } finally {
+      setLoadingBookings(false);
+    }
+  };
 
   const handleLogout = async () => {
     await logout();
@@ -42,9 +65,9 @@ const Dashboard = () => {
             <div className="card-icon">📋</div>
             <h3>My Bookings</h3>
             <p>View and manage your reservations</p>
-            <Link to="/booking" className="card-link">
+            <a href="#my-bookings" className="card-link">
               View Bookings →
-            </Link>
+            </a>
           </div>
 
           <div className="dashboard-card">
@@ -68,6 +91,52 @@ const Dashboard = () => {
           </div>
         </div>
 
+        <div className="my-bookings" id="my-bookings">
+          <h3>My Bookings</h3>
+          {bookingsError && <div className="error-message">{bookingsError}</div>}
+          {!loadingBookings && bookings.length === 0 && !bookingsError ? (
+            <p className="no-bookings">
+              No bookings yet. <Link to="/booking">Book a room</Link>
+            </p>
+          ) : (
+            <div className="my-bookings-table-container">
+              <table className="my-bookings-table">
+                <thead>
+                  <tr>
+                    <th>Room Type</th>
+                    <th>Check-in</th>
+                    <th>Check-out</th>
+                    <th>Guests</th>
+                    <th>Status</th>
+                  </tr>
+                </thead>
+                <tbody>
+                  {bookings.map((booking) => (
+                    <tr key={booking.id}>
+                      <td className="room-type">{booking.room_type}</td>
+                      <td>{booking.check_in}</td>
+                      <td>{booking.check_out}</td>
+                      <td>{booking.people}</td>
+                      <td>
+                        <span className={`status-badge status-${booking.status}`}>{booking.status}</span>
+                      </td>
+                    </tr>
+                  ))}
+                </tbody>
+              </table>
+            </div>
+          )}
+          {nextCursor && (
+            <button
+              className="btn-secondary load-more"
+              onClick={() => fetchMyBookings(nextCursor)}
+              disabled={loadingBookings}
+            >
+              {loadingBookings ? 'Loading...' : 'Load more'}
+            </button>
+          )}
+        </div>
+
         <div className="quick-actions">
           <h3>Quick Actions</h3>
           <div className="actions-grid">